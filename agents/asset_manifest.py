@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIR = "generated_images"
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class AssetManifest:
+    """
+    Append-only index of the images in one output directory.
+
+    Every line of `<directory>/manifest.jsonl` is one event:
+
+      {"id": 7, "event": "allocated", "ts": ...}
+      {"id": 7, "event": "ready", "file": "generated_images/7.jpg", "prompt": ...,
+       "location": ..., "turn": ..., "width": ..., "height": ..., "bytes": ...}
+      {"id": 8, "event": "failed", "ts": ...}
+
+    allocate() hands out the next id under a lock and writes it down before
+    returning, so concurrent generations (and a restart) never reuse a number.
+    Lookups by id / turn / location are served from memory; the directory is
+    never listed, except once to seed the counter when a folder predates the
+    manifest. If the file is moved away (new game archives the folder) the
+    instance notices on its next call and starts over.
+    """
+
+    _instances: Dict[str, "AssetManifest"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, directory: str = DEFAULT_IMAGE_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None     # manifest size when last read; None = never
+        self._next_id = 1
+        self._records: Dict[int, dict] = {}
+
+    @classmethod
+    def for_directory(cls, directory: str = DEFAULT_IMAGE_DIR) -> "AssetManifest":
+        """One manifest per directory per process, shared by every agent writing there."""
+        key = os.path.abspath(directory)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(directory)
+            return cls._instances[key]
+
+    # ─── File ──────────────────────────────────────────────────────────────
+    def _file_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return -1
+
+    def _refresh(self):
+        # caller holds self._lock; reload only if someone else touched the file
+        size = self._file_size()
+        if size == self._size:
+            return
+        self._records, self._next_id = {}, 1
+        if size < 0:
+            self._next_id = self._legacy_next_id()
+        else:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"[AssetManifest] Skipping bad line in {self.path}")
+        self._size = size
+
+    def _legacy_next_id(self) -> int:
+        # a folder of numbered images written before the manifest existed
+        if not os.path.isdir(self.directory):
+            return 1
+        numbers = [int(stem) for stem, _ in map(os.path.splitext, os.listdir(self.directory)) if stem.isdigit()]
+        return max(numbers, default=0) + 1
+
+    def _apply(self, event: dict):
+        asset_id = int(event["id"])
+        self._next_id = max(self._next_id, asset_id + 1)
+        if event["event"] == "ready":
+            self._records[asset_id] = event
+        elif event["event"] == "failed":
+            self._records.pop(asset_id, None)
+
+    def _append(self, event: dict):
+        # caller holds self._lock
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._apply(event)
+        self._size = self._file_size()
+
+    # ─── Writes ────────────────────────────────────────────────────────────
+    def allocate(self) -> int:
+        """Reserve and return the next image id."""
+        with self._lock:
+            self._refresh()
+            asset_id = self._next_id
+            self._append({"id": asset_id, "event": "allocated", "ts": time.time()})
+            return asset_id
+
+    def record(
+        self,
+        asset_id: int,
+        path: str,
+        prompt: Optional[str] = None,
+        location: Optional[str] = None,
+        turn: Optional[int] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        timings: Optional[dict] = None
+    ) -> dict:
+        """Mark `asset_id` as written to `path` along with what it depicts."""
+        entry = {
+            "id": asset_id,
+            "event": "ready",
+            "file": path,
+            "prompt": prompt,
+            "location": location,
+            "turn": turn,
+            "width": width,
+            "height": height,
+            "bytes": os.path.getsize(path),
+            "ts": time.time(),
+        }
+        if timings:
+            entry["timings"] = {k: round(v, 3) if isinstance(v, float) else v for k, v in timings.items()}
+        with self._lock:
+            self._refresh()
+            self._append(entry)
+        return entry
+
+    def release(self, asset_id: int):
+        """The image for `asset_id` was never written; its id stays used."""
+        with self._lock:
+            self._refresh()
+            self._append({"id": asset_id, "event": "failed", "ts": time.time()})
+
+    # ─── Lookups ───────────────────────────────────────────────────────────
+    def get(self, asset_id: int) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            return self._records.get(asset_id)
+
+    def entries(self) -> List[dict]:
+        """All written images, oldest first."""
+        with self._lock:
+            self._refresh()
+            return [self._records[i] for i in sorted(self._records)]
+
+    def by_turn(self, turn: int) -> List[dict]:
+        return [e for e in self.entries() if e.get("turn") == turn]
+
+    def by_location(self, location: str) -> List[dict]:
+        loc = (location or "").strip().lower()
+        return [e for e in self.entries() if (e.get("location") or "").strip().lower() == loc]
+
+    def latest(self, location: Optional[str] = None) -> Optional[dict]:
+        """Newest image overall, or for `location`."""
+        found = self.by_location(location) if location else self.entries()
+        return found[-1] if found else None
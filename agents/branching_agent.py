@@ -2,6 +2,8 @@ import logging
 import json
 import openai
 
+from game.scheduler import api_slot
+
 
 class BranchingAgent:
     def __init__(self, state, api_key=None, use_ai=True):
@@ -17,7 +19,12 @@ class BranchingAgent:
             self.state.current_story_point = "0"
             self.state.record_location("0")
 
-    def update_story_point(self, choice_index, choices, scene_text=None):
+    def update_story_point(self, choice_index, choices, scene_text=None, transition=None):
+        """
+        Advance the branch map for the chosen option. `transition` is an optional
+        pre-computed {"moved": bool, "new_location": str} result; when given the
+        GPT location check is skipped.
+        """
         current = self.state.current_story_point
         text = choices[choice_index]
         next_id = str(self.state.next_node_id)
@@ -29,7 +36,9 @@ class BranchingAgent:
         self.state.record_location(next_id)
         self.state.add_memory(text)
 
-        if self.use_ai and scene_text:
+        if transition is not None:
+            self.apply_map_transition(transition)
+        elif self.use_ai and scene_text:
             self.check_map_transition(scene_text, text)
             
         if scene_text:
@@ -75,36 +84,44 @@ or {{"moved": false}} otherwise.
 """.strip()
 
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You're a game continuity checker for a text-based adventure."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=50,
-                temperature=0
-            )
+            with api_slot("chat"):
+                response = openai.ChatCompletion.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You're a game continuity checker for a text-based adventure."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=50,
+                    temperature=0
+                )
             content = response.choices[0].message.content.strip()
             result = json.loads(content)
-
-            if result.get("moved"):
-                new_loc = result.get("new_location")
-                if new_loc in self.state.world_map_hierarchy:
-                    node = self.state.world_map_hierarchy[new_loc]
-                    if node.get("type") == "subarea":
-                        region = node["region"]
-                        desc = node.get("description", "")
-                        self.state.current_location = {
-                            "location_name": region,
-                            "subarea_name": new_loc,
-                            "subarea_description": desc
-                        }
-                        self.state.current_location_name = new_loc
-                        self.state.record_location(new_loc)
-                        print(f"[LOG] Player moved to: {new_loc} — {desc}")
+            self.apply_map_transition(result)
         except Exception as e:
             print(f"[ERROR] Location transition check failed: {e}")
 
+    def apply_map_transition(self, result):
+        """
+        Apply a {"moved": bool, "new_location": "Subarea Name"} decision, ignoring
+        anything that isn't a known subarea.
+        """
+        if not result.get("moved"):
+            return
+        new_loc = result.get("new_location")
+        if new_loc in self.state.world_map_hierarchy:
+            node = self.state.world_map_hierarchy[new_loc]
+            if node.get("type") == "subarea":
+                region = node["region"]
+                desc = node.get("description", "")
+                self.state.current_location = {
+                    "location_name": region,
+                    "subarea_name": new_loc,
+                    "subarea_description": desc
+                }
+                self.state.current_location_name = new_loc
+                self.state.record_location(new_loc)
+                print(f"[LOG] Player moved to: {new_loc} — {desc}")
+
     def check_backstory_visits(self):
         """
         Uses GPT-4 to estimate which locations the player has previously visited
@@ -128,21 +145,21 @@ Respond with a JSON array of location names taken from the list above. Do not in
 """.strip()
 
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You're a world-building assistant for a branching visual novel."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=150,
-                temperature=0.7
-            )
+            with api_slot("chat"):
+                response = openai.ChatCompletion.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You're a world-building assistant for a branching visual novel."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=150,
+                    temperature=0.7
+                )
             content = response.choices[0].message.content.strip()
             suggested = json.loads(content)
 
             for loc in suggested:
-                if loc in self.state.world_map_hierarchy and loc not in self.state.visited_by_backstory:
-                    self.state.visited_by_backstory.append(loc)
+                if loc in self.state.world_map_hierarchy and self.state.record_backstory_visit(loc):
                     print(f"[LOG] Backstory visit inferred: {loc}")
 
         except Exception as e:
@@ -1,9 +1,18 @@
 import os
 import openai
 import logging
-import requests
+import base64
+import shutil
 import time
-from typing import Optional
+from typing import Optional, Union
+
+from agents.downloader import Downloader
+from agents.image_pool import ImageProcessPool
+from agents.image_agent import rejects_response_format
+from agents.image_profiles import PORTRAIT_VARIANT_SIDES, render_portrait
+from agents.portrait_cache import PortraitCache
+from agents.procedural_images import ProceduralImageBackend
+from game.scheduler import api_slot
 
 class CharacterImageAgent:
     """
@@ -11,6 +20,9 @@ class CharacterImageAgent:
     Now also accepts a 'genre' parameter and 'artstyle' parameter to tailor prompts.
     For each character, crafts a succinct prompt to produce a head–and–shoulders bust with an anime/visual-novel aesthetic,
     consistent lighting, and expressive features.
+    Portraits are stored in the cross-session PortraitCache under a hash of
+    (visual description, genre, artstyle, size); with `reuse_cached` a hit
+    skips DALL·E entirely.
     """
 
     def __init__(
@@ -18,7 +30,11 @@ class CharacterImageAgent:
         api_key: Optional[str] = None,
         debug: bool = False,
         genre: Optional[str] = None,
-        artstyle: Optional[str] = None   # New parameter
+        artstyle: Optional[str] = None,  # New parameter
+        pool: Optional[ImageProcessPool] = None,
+        downloader: Optional[Downloader] = None,
+        cache: Optional[PortraitCache] = None,
+        reuse_cached: bool = False
     ):
         openai.api_key = api_key or os.getenv("OPENAI_API_KEY")
         # Portraits are typically square for visual novel interfaces.
@@ -26,6 +42,16 @@ class CharacterImageAgent:
         self.debug = debug
         self.genre = genre        # Store the genre for possible prompt adjustments
         self.artstyle = artstyle  # New: store global artstyle
+        # DALL·E 3 returns 1024×1024, kept as is unless PORTRAIT_MAX_SIZE asks for
+        # less (the UI draws from the smaller variants)
+        self.max_side = int(os.getenv("PORTRAIT_MAX_SIZE", "0"))
+        self.pool = pool or ImageProcessPool.shared()
+        self.downloader = downloader or Downloader.shared()
+        self.response_format = os.getenv("IMAGE_RESPONSE_FORMAT", "b64_json").lower()
+        self.backend = os.getenv("IMAGE_BACKEND", "dalle").lower()
+        self.procedural = ProceduralImageBackend()
+        self.cache = cache or PortraitCache.shared()
+        self.reuse_cached = reuse_cached
 
     def generate_character_image(
         self,
@@ -58,51 +84,113 @@ class CharacterImageAgent:
         if self.debug:
             logging.debug(f"[CharacterImageAgent] DALL·E prompt: {dalle_prompt}")
 
+        folder = "character_portraits"
+        os.makedirs(folder, exist_ok=True)
+        # the hash suffix keeps two characters that share a name apart
+        key = PortraitCache.key(safe_visual or safe_desc, self.genre, self.artstyle, size or self.image_size)
+        filename = f"{name.strip().lower().replace(' ', '_')}_{key[:8]}.png"
+        path = os.path.join(folder, filename)
+        if self.reuse_cached and self.cache.get(key):
+            if self.debug:
+                logging.debug(f"[CharacterImageAgent] Reusing cached portrait for {name}")
+            return self.cache.place(key, path)
+        if self.backend == "procedural":
+            return self._procedural_portrait(name, safe_visual or safe_desc, path)
+
         # — 1) DALL·E with retries —
         dalle_kwargs = {
             "prompt": dalle_prompt,
             "model": "dall-e-3",
             "size": size or self.image_size,
+            "response_format": self.response_format,
         }
-        url = ""
+        url, payload = "", ""
         for attempt in range(3):
+            started = time.perf_counter()
             try:
-                resp = openai.Image.create(**dalle_kwargs)
+                with api_slot("image"):
+                    resp = openai.Image.create(**dalle_kwargs)
+                item = resp["data"][0]
                 if self.debug:
-                    logging.debug(f"[CharacterImageAgent] DALL·E response (try {attempt+1}): {resp}")
-                candidate = resp["data"][0].get("url", "")
-                if candidate:
-                    url = candidate
+                    logging.debug(f"[CharacterImageAgent] DALL·E response (try {attempt+1}): "
+                                  f"{ {k: v for k, v in item.items() if k != 'b64_json'} }")
+                url, payload = item.get("url", "") or "", item.get("b64_json", "") or ""
+                if url or payload:
+                    break
+                logging.warning(f"[CharacterImageAgent] No image returned (try {attempt+1})")
+            except openai.error.InvalidRequestError as e:
+                if dalle_kwargs["response_format"] == "url" or not rejects_response_format(e):
+                    # the same request would be rejected again: stop retrying
+                    logging.exception(f"[CharacterImageAgent] DALL·E rejected the request on try {attempt+1}")
                     break
-                logging.warning(f"[CharacterImageAgent] No URL returned (try {attempt+1})")
+                else:
+                    # endpoint won't return inline images: ask for a URL instead, right away
+                    logging.warning("[CharacterImageAgent] Inline images rejected, falling back to URLs")
+                    dalle_kwargs["response_format"] = self.response_format = "url"
+                    continue
             except Exception:
                 logging.exception(f"[CharacterImageAgent] DALL·E error on try {attempt+1}")
             time.sleep(2 ** attempt)
+        generated = time.perf_counter() - started
 
-        # — 2) Download with retries —
-        if url:
-            folder = "character_portraits"
-            os.makedirs(folder, exist_ok=True)
-            filename = f"{name.strip().lower().replace(' ', '_')}.png"
-            path = os.path.join(folder, filename)
+        # — 2) Decode the inline image, or download it —
+        if url or payload:
+            # streamed to disk with retries / resume (see downloader.py)
+            download = path + ".download"
+            try:
+                mark = time.perf_counter()
+                if payload:
+                    source, fetch_step = base64.b64decode(payload), "decode"
+                else:
+                    source, fetch_step = self.downloader.fetch(url, download), "download"
+                fetched = time.perf_counter() - mark
+                self._save_portrait(source, path)
+                self._store(key, path)
+                logging.info(
+                    f"[CharacterImageAgent] {name} via {'b64_json' if payload else 'url'}: generate "
+                    f"{generated:.2f}s, {fetch_step} {fetched:.2f}s, "
+                    f"total {time.perf_counter() - started:.2f}s"
+                )
+                if self.debug:
+                    logging.debug(f"[CharacterImageAgent] Saved image to {path}")
+                return path
+            except Exception:
+                logging.exception(f"[CharacterImageAgent] Download failed for {name}")
+                return self._procedural_portrait(name, safe_visual or safe_desc, path)
+            finally:
+                if os.path.exists(download):
+                    os.remove(download)
+
+        # — Fallback: procedural silhouette with the name on it —
+        if self.debug:
+            logging.debug("[CharacterImageAgent] Fallback: procedural portrait")
+        return self._procedural_portrait(name, safe_visual or safe_desc, path)
 
-            for dl_try in range(3):
-                try:
-                    r = requests.get(url, timeout=10)
-                    r.raise_for_status()
-                    with open(path, "wb") as f:
-                        f.write(r.content)
-                    if self.debug:
-                        logging.debug(f"[CharacterImageAgent] Downloaded image to {path}")
-                    return path
-                except Exception:
-                    logging.exception(f"[CharacterImageAgent] Download error (try {dl_try+1})")
-                    time.sleep(2 ** dl_try)
+    def _store(self, key: str, path: str):
+        # stand-ins are never cached, only portraits that came from DALL·E
+        try:
+            self.cache.put(key, path)
+        except Exception:
+            logging.exception(f"[CharacterImageAgent] Could not cache {path}")
 
-            # if all downloads fail, return URL
-            return url
+    def _procedural_portrait(self, name: str, description: str, path: str) -> str:
+        """Instant stand-in portrait (see procedural_images.py); the silhouette path if even that fails."""
+        try:
+            return self.procedural.portrait_image(name, description, path, self.max_side, PORTRAIT_VARIANT_SIDES)
+        except Exception:
+            logging.exception(f"[CharacterImageAgent] Procedural portrait failed for {name}")
+            return "character_portraits/unknown_character.png"
 
-        # — Fallback silhouette —
-        if self.debug:
-            logging.debug("[CharacterImageAgent] Fallback: returning silhouette")
-        return "character_portraits/unknown_character.png"
+    def _save_portrait(self, source: Union[bytes, str], path: str):
+        """Resize + save on the image pool; keep the original (bytes or download) if that fails."""
+        try:
+            self.pool.submit(render_portrait, source, path, self.max_side, PORTRAIT_VARIANT_SIDES).result()
+        except Exception:
+            logging.exception("[CharacterImageAgent] Portrait resize failed, saving original")
+            if os.path.exists(path):
+                os.remove(path)      # may be a link into the portrait cache: don't write through it
+            if isinstance(source, str):
+                shutil.copyfile(source, path)
+            else:
+                with open(path, "wb") as f:
+                    f.write(source)
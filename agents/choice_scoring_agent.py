@@ -0,0 +1,119 @@
+import openai
+import json
+import logging
+import time
+
+from agents.profiling_agent import PlayerProfilingAgent
+from agents.trait_estimator import PLAYER_TRAITS, COMPANION_TRAITS
+from game.scheduler import api_slot
+
+
+class ChoiceScoringAgent:
+    """
+    Pre-scores every preset choice of a scene in ONE GPT call while the player is
+    still reading: player trait deltas, companion trait deltas and whether the
+    choice moves the player to another subarea. Results are keyed by choice text
+    so GameEngine.make_choice() can apply them without further model calls.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def score_choices(self, scene_text, choices, retries=2):
+        """
+        Returns {choice_text: {"player": {...}, "companion": {...},
+                               "transition": {"moved": bool, "new_location": str}}}
+        for every choice the model answered in full; an empty dict on failure.
+        """
+        if not choices:
+            return {}
+
+        place_list = list(self.state.world_map_hierarchy.keys())
+        numbered = "\n".join(f"{i}. {c}" for i, c in enumerate(choices, 1))
+        prompt = (
+            f"SCENE:\n{scene_text}\n\n"
+            f"CHOICES:\n{numbered}\n\n"
+            f"Valid locations: {json.dumps(place_list)}\n\n"
+            "For EACH choice, estimate what happens if the player picks it. Return strictly valid JSON:\n"
+            "a list with one object per choice, in order, each with:\n"
+            "  \"choice\": the choice number,\n"
+            "  \"player\": float deltas between -0.5 and +0.5 (one decimal) for "
+            "bravery, curiosity, empathy, communication, trust,\n"
+            "  \"companion\": float deltas between -0.5 and +0.5 (one decimal) for trust, fear, affection,\n"
+            "  \"moved\": true if the choice takes the player to a new location from the list, else false,\n"
+            "  \"new_location\": the location name when moved is true.\n"
+            "Output ONLY the JSON list."
+        )
+
+        parsed = None
+        for attempt in range(retries):
+            try:
+                with api_slot("chat"):
+                    resp = openai.ChatCompletion.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system",
+                             "content": "You score player choices for a visual novel and output only valid JSON."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=120 * len(choices),
+                        temperature=0.3,
+                        request_timeout=45
+                    )
+                raw = resp.choices[0].message.content.strip()
+                try:
+                    parsed = json.loads(raw)
+                except json.JSONDecodeError:
+                    start = raw.find('[')
+                    end   = raw.rfind(']')
+                    parsed = json.loads(raw[start:end+1])
+                if isinstance(parsed, list):
+                    break
+                parsed = None
+            except Exception as e:
+                logging.warning(f"[ChoiceScoringAgent] attempt {attempt+1} failed: {e}")
+                time.sleep(2 ** attempt)
+
+        scored = {}
+        for entry in parsed or []:
+            try:
+                idx = int(entry.get("choice")) - 1
+            except (TypeError, ValueError, AttributeError):
+                continue
+            if not 0 <= idx < len(choices):
+                continue
+            if not (isinstance(entry.get("player"), dict) and isinstance(entry.get("companion"), dict)):
+                # a missing field is no estimate at all: leave this choice to
+                # on-demand scoring instead of applying (and learning) zeros
+                continue
+
+            player = self._clean(entry.get("player"), PLAYER_TRAITS, PlayerProfilingAgent.CANONICAL)
+            companion = self._clean(entry.get("companion"), COMPANION_TRAITS)
+            scored[choices[idx]] = {
+                "player": player,
+                "companion": companion,
+                "transition": {
+                    "moved": bool(entry.get("moved")),
+                    "new_location": entry.get("new_location"),
+                },
+            }
+
+        return scored
+
+    @staticmethod
+    def _clean(raw, traits, canonical=None):
+        """Clamp to [-0.5, +0.5] with one decimal place, like the per-choice agents."""
+        raw = raw if isinstance(raw, dict) else {}
+        values = {}
+        for k, v in raw.items():
+            key = k.strip().lower()
+            values[(canonical or {}).get(key, key)] = v
+
+        clean = {}
+        for t in traits:
+            try:
+                val = float(values.get(t, 0.0))
+            except (ValueError, TypeError):
+                val = 0.0
+            clean[t] = round(max(min(val, 0.5), -0.5), 1)
+        return clean
@@ -2,10 +2,19 @@ import openai
 import json
 import logging
 import time
+import os
+
+from agents.trait_estimator import TraitEstimator, COMPANION_TRAITS, DEFAULT_MODEL_PATH, record_label
+from game.scheduler import api_slot
 
 class CompanionAgent:
     def __init__(self, state):
         self.state = state
+        # local trait-delta estimator; GPT is only asked when it isn't confident
+        self.estimator = TraitEstimator.load(
+            os.getenv("TRAIT_MODEL_PATH", DEFAULT_MODEL_PATH), "companion", COMPANION_TRAITS
+        )
+        self.min_confidence = float(os.getenv("TRAIT_ESTIMATOR_MIN_CONFIDENCE", "0.6"))
 
     def infer_traits_from_choice(self, choice_text, context, retries=2):
         """
@@ -15,7 +24,13 @@ class CompanionAgent:
           - affection
 
         Each delta is clamped to the range [-0.5, +0.5] and rounded to 1 decimal place.
+        The local estimator answers instead when it is confident enough.
         """
+        local, confidence = self.estimator.predict(choice_text, context)
+        if confidence >= self.min_confidence:
+            logging.debug(f"[CompanionAgent] local estimate (conf {confidence}): {local}")
+            return local
+
         prompt = (
             f"Context: {context}\n"
             f"Player choice: \"{choice_text}\"\n\n"
@@ -34,16 +49,17 @@ class CompanionAgent:
         changes = {}
         for attempt in range(retries):
             try:
-                resp = openai.ChatCompletion.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "You infer small emotional deltas and output only valid JSON."},
-                        {"role": "user",   "content": prompt}
-                    ],
-                    max_tokens=100,
-                    temperature=0.5,
-                    request_timeout=30
-                )
+                with api_slot("chat"):
+                    resp = openai.ChatCompletion.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system", "content": "You infer small emotional deltas and output only valid JSON."},
+                            {"role": "user",   "content": prompt}
+                        ],
+                        max_tokens=100,
+                        temperature=0.5,
+                        request_timeout=30
+                    )
                 raw = resp.choices[0].message.content.strip()
                 try:
                     parsed = json.loads(raw)
@@ -72,18 +88,22 @@ class CompanionAgent:
             # round to 1 decimal
             safe[k] = round(val, 1)
 
+        if changes:
+            record_label("companion", choice_text, context, safe)
         return safe
 
-    def update_companion_profile(self, choice_index, choices, context):
+    def update_companion_profile(self, choice_index, choices, context, deltas=None):
         """
         After the player picks a choice, infer how the companion's traits should shift,
         apply them (clamped to [0,10]) and return the float deltas.
+        Pass pre-computed `deltas` to skip the inference step.
         """
         if choice_index < 0 or choice_index >= len(choices):
             return {}
 
         choice_text = choices[choice_index]
-        deltas = self.infer_traits_from_choice(choice_text, context)
+        if deltas is None:
+            deltas = self.infer_traits_from_choice(choice_text, context)
 
         for trait, delta in deltas.items():
             # apply delta
@@ -2,6 +2,8 @@ import openai
 import json
 import logging
 
+from game.scheduler import api_slot
+
 # Try to import the v1+ client class
 try:
     from openai import OpenAI
@@ -48,28 +50,30 @@ class CompanionGenerator:
 
         try:
             if _USE_V0:
-                resp = self.client.ChatCompletion.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "You create vivid game companions with stats that fit the given world."},
-                        {"role": "user",   "content": prompt}
-                    ],
-                    max_tokens=400,
-                    temperature=0.8,
-                    request_timeout=30
-                )
+                with api_slot("chat"):
+                    resp = self.client.ChatCompletion.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system", "content": "You create vivid game companions with stats that fit the given world."},
+                            {"role": "user",   "content": prompt}
+                        ],
+                        max_tokens=400,
+                        temperature=0.8,
+                        request_timeout=30
+                    )
                 content = resp.choices[0].message.content.strip()
             else:
-                resp = self.client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "You create vivid game companions with stats that fit the given world."},
-                        {"role": "user",   "content": prompt}
-                    ],
-                    max_tokens=400,
-                    temperature=0.8,
-                    timeout=30
-                )
+                with api_slot("chat"):
+                    resp = self.client.chat.completions.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system", "content": "You create vivid game companions with stats that fit the given world."},
+                            {"role": "user",   "content": prompt}
+                        ],
+                        max_tokens=400,
+                        temperature=0.8,
+                        timeout=30
+                    )
                 content = resp.choices[0].message.content.strip()
 
             data = json.loads(content)
@@ -0,0 +1,167 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadError(Exception):
+    """Raised when a download still fails after every retry."""
+
+
+class Downloader:
+    """
+    Shared HTTP fetcher for generated images (scene backgrounds, portraits).
+
+    - one keep-alive requests.Session, so repeated downloads from the image
+      CDN reuse connections instead of paying a TLS handshake each time
+    - streams the body to `<dest>.part` in chunks and renames it into place,
+      so a large image is never held in memory and a half-written file is
+      never visible under its final name
+    - on retry, asks for the rest of the `.part` file with a Range request
+      (falls back to a full download if the server ignores it)
+    - at most `per_host` downloads per host at a time
+    - checks the byte count against Content-Length / Content-Range, an
+      optional sha256, and that the result decodes as an image
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, per_host: int = 4, retries: int = 3, timeout: float = 30.0, backoff: float = 0.5):
+        self.per_host = max(1, per_host)
+        self.retries = max(1, retries)
+        self.timeout = timeout
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.per_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._hosts_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "Downloader":
+        """Process-wide downloader configured from DOWNLOAD_PER_HOST / DOWNLOAD_RETRIES / DOWNLOAD_TIMEOUT."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    per_host=int(os.getenv("DOWNLOAD_PER_HOST", "4")),
+                    retries=int(os.getenv("DOWNLOAD_RETRIES", "3")),
+                    timeout=float(os.getenv("DOWNLOAD_TIMEOUT", "30")),
+                )
+            return cls._shared
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def fetch(self, url: str, dest: str, sha256: Optional[str] = None, verify_image: bool = True) -> str:
+        """
+        Download `url` to `dest` and return `dest`. Raises DownloadError when
+        every attempt failed; the partial file is removed in that case.
+        """
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        part = dest + ".part"
+        started = time.perf_counter()
+        last_error = None
+        _remove(part)      # leftovers from an earlier crash belong to some other image
+        try:
+            for attempt in range(self.retries):
+                try:
+                    with self._host_slot(url):
+                        self._stream(url, part)
+                    self._check(part, sha256, verify_image)
+                    os.replace(part, dest)
+                    logger.debug(f"[Downloader] {url} → {dest} ({os.path.getsize(dest) // 1024} KB) "
+                                 f"in {time.perf_counter() - started:.2f}s")
+                    return dest
+                except _CorruptDownload as e:
+                    # resuming would keep the bad bytes: start over
+                    last_error = e
+                    _remove(part)
+                except (requests.RequestException, OSError) as e:
+                    last_error = e
+                logger.warning(f"[Downloader] Attempt {attempt + 1} for {url} failed: {last_error}")
+                if attempt + 1 < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        except BaseException:
+            _remove(part)
+            raise
+        _remove(part)
+        raise DownloadError(f"Could not download {url}: {last_error}")
+
+    def _stream(self, url: str, part: str):
+        have = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={have}-"} if have else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=(5, self.timeout)) as resp:
+            if resp.status_code == 416 and have:
+                # we already have everything (or the .part is bogus); let _check decide
+                return
+            resp.raise_for_status()
+            if have and resp.status_code == 206 and _range_start(resp) == have:
+                mode, expected = "ab", _range_total(resp)
+            else:
+                mode = "wb"
+                expected = int(resp.headers["Content-Length"]) if "Content-Length" in resp.headers else None
+            with open(part, mode) as f:
+                for chunk in resp.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+        if expected is not None and os.path.getsize(part) != expected:
+            raise OSError(f"expected {expected} bytes, got {os.path.getsize(part)}")
+
+    @staticmethod
+    def _check(part: str, sha256: Optional[str], verify_image: bool):
+        if sha256:
+            digest = hashlib.sha256()
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            if digest.hexdigest() != sha256.lower():
+                raise _CorruptDownload("sha256 mismatch")
+        if verify_image:
+            try:
+                with Image.open(part) as img:
+                    img.verify()
+            except Exception as e:
+                raise _CorruptDownload(f"not a valid image: {e}")
+
+
+class _CorruptDownload(Exception):
+    pass
+
+
+def _range_start(resp) -> Optional[int]:
+    # "Content-Range: bytes 100-999/1000"
+    try:
+        return int(resp.headers["Content-Range"].split()[1].split("-")[0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def _range_total(resp) -> Optional[int]:
+    try:
+        total = resp.headers["Content-Range"].rsplit("/", 1)[1]
+        return None if total == "*" else int(total)
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from typing import Dict, Iterable
+
+from agents.image_profiles import variant_path, variant_paths
+
+logger = logging.getLogger(__name__)
+
+INDEX_SAVE_INTERVAL = 30.0    # seconds between index writes caused by lookups alone
+
+
+class FileCache:
+    """
+    Base for the on-disk image caches (ImageCache, PortraitCache): files under
+    `root` plus one `index.json` with an entry per key and hit/miss counters.
+
+    Subclasses say where an entry's file lives (_path) and build their own
+    lookups on top. Lookups only mark the index dirty (_touched); it is written
+    by stores, at most every INDEX_SAVE_INTERVAL seconds, and by flush(), which
+    shared() instances register at exit. Eviction is least-recently-used down
+    to `quota_bytes` and skips files still hard-linked from a session, since
+    deleting those would free nothing.
+    """
+
+    NAME = "FileCache"
+    STATS = ("hits", "misses")
+
+    def __init__(self, root: str, quota_mb: float):
+        self.root = root
+        self.quota_bytes = int(quota_mb * 2 ** 20)
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        self._entries: Dict[str, dict] = self._index.setdefault("entries", {})
+        self._stats: Dict[str, int] = self._index.setdefault("stats", {})
+        for name in self.STATS:
+            self._stats.setdefault(name, 0)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _path(self, key: str, entry: dict) -> str:
+        return os.path.join(self.root, entry["file"])
+
+    # ─── Index ─────────────────────────────────────────────────────────────
+    def _index_path(self) -> str:
+        return os.path.join(self.root, "index.json")
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"[{self.NAME}] Failed to read index: {e}")
+            return {}
+        # drop entries whose file went missing
+        index["entries"] = {
+            k: e for k, e in index.get("entries", {}).items() if os.path.isfile(self._path(k, e))
+        }
+        return index
+
+    def _save_index(self):
+        # caller holds self._lock
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self._index_path()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp, self._index_path())
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _touched(self):
+        # caller holds self._lock; lookups persist lazily
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL:
+            self._save_index()
+
+    def flush(self):
+        """Write pending hit/miss counters and last-use times."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    # ─── Eviction / metrics ────────────────────────────────────────────────
+    def _evict(self, keep: Iterable[str] = ()):
+        # caller holds self._lock
+        total = sum(e["bytes"] for e in self._entries.values())
+        if total <= self.quota_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total <= self.quota_bytes:
+                break
+            path = self._path(key, self._entries[key])
+            if key in keep or _linked(path):
+                continue
+            entry = self._entries.pop(key)
+            total -= entry["bytes"]
+            for victim in [path] + list(variant_paths(path).values()):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            logger.info(f"[{self.NAME}] Evicted {os.path.relpath(path, self.root)} ({entry['bytes'] // 1024} KB)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {name: self._stats[name] for name in self.STATS}
+            used = sum(e["bytes"] for e in self._entries.values())
+            count = len(self._entries)
+        return dict(counters, entries=count, bytes=used, quota_bytes=self.quota_bytes)
+
+
+def _linked(path: str) -> bool:
+    try:
+        return os.stat(path).st_nlink > 1
+    except OSError:
+        return False
+
+
+def place_file(src: str, dest: str) -> str:
+    """Link (or copy) a cached file and its variants to `dest`, for a session to own."""
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    link_or_copy(src, dest)
+    for width, src_variant in variant_paths(src).items():
+        link_or_copy(src_variant, variant_path(dest, width))
+    return dest
+
+
+def link_or_copy(src: str, dest: str) -> int:
+    """Hard-link `src` to `dest` (replacing it), copying where links aren't supported. Returns the size."""
+    if os.path.exists(dest):
+        if os.path.samefile(src, dest):
+            return os.path.getsize(dest)
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+    return os.path.getsize(dest)
@@ -3,44 +3,110 @@ import openai
 import logging
 import time
 import re
-from typing import Optional
-from io import BytesIO
-from PIL import Image, ImageFilter
-import requests
+import json
+import uuid
+import base64
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from concurrent.futures import Future
+
+from PIL import Image
+
+from agents.asset_manifest import AssetManifest
+from agents.downloader import Downloader
+from agents.image_cache import ImageCache
+from agents.image_pool import ImageProcessPool
+from agents.image_profiles import background_variant_widths, get_profile, render
+from agents.procedural_images import ProceduralImageBackend
+from agents.scene_prompt import ScenePromptExtractor
+from game.scheduler import api_slot
 
 # Configure module-level logger
 logger = logging.getLogger(__name__)
 
+def rejects_response_format(error: Exception) -> bool:
+    """True if an InvalidRequestError is about `response_format` (inline payloads unsupported)."""
+    return getattr(error, "param", None) == "response_format" or "response_format" in str(error)
+
+
 class ImageAgent:
     """
     Uses GPT-4 to craft a scenery-focused, environment-only prompt from your narrative snippet (and optional location context),
     then feeds that prompt to DALL·E-3 to generate the final image. After downloading, it applies a little sharpening/upsampling to boost quality.
     Now also supports a global 'artstyle' prefix that will be prepended to every scenery prompt and to the final DALL·E prompt itself.
 
-    This version defaults to a DALL·E-supported landscape size (1792×1024) and upsamples to 3584×2048.
+    This version defaults to a DALL·E-supported landscape size (1792×1024); how the download is
+    resized and encoded is set by an output profile (see image_profiles.py, IMAGE_OUTPUT_PROFILE).
     """
 
-    def __init__(self, api_key: Optional[str] = None, debug: bool = False, artstyle: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        debug: bool = False,
+        artstyle: Optional[str] = None,
+        output_profile: Optional[str] = None,
+        display_size: Optional[Tuple[int, int]] = None,
+        pool: Optional[ImageProcessPool] = None,
+        cache: Optional[ImageCache] = None,
+        premise: Optional[str] = None,
+        manifest: Optional[AssetManifest] = None,
+        downloader: Optional[Downloader] = None,
+        response_format: Optional[str] = None,
+        state=None,
+        backend: Optional[str] = None
+    ):
         openai.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.chat_model = "gpt-4"
         self.image_model = "dall-e-3"
 
         # ─── Use a supported landscape resolution ────────────────────────
         self.base_size   = "1792x1024"    # DALL·E supports 1792×1024 (landscape) or 1024×1792 (portrait)
-        self.upsample_to = (3584, 2048)    # Double it to keep ~16:9 aspect ratio when upscaling
+        self.profile      = get_profile(output_profile)
+        self.display_size = display_size   # (w, h) in device pixels, used by "display" profiles
+        self.variant_widths = background_variant_widths()   # pre-scaled copies for the UI
+        self.pool         = pool or ImageProcessPool.shared()
+        self.cache        = cache          # optional content-addressed ImageCache
+        self.premise      = premise        # cache namespace (see image_cache.premise_id)
+        self.manifest     = manifest or AssetManifest.for_directory("generated_images")
+        self.downloader   = downloader or Downloader.shared()
+        # "b64_json": image bytes inline in the response (no second request); "url": download it
+        self.response_format = (response_format or os.getenv("IMAGE_RESPONSE_FORMAT", "b64_json")).lower()
+        self.timings      = deque(maxlen=50)   # per-call generate/decode|download/postprocess seconds
+        self.state        = state          # GameState, for subarea descriptions and character names
+        self.prompt_extractor = ScenePromptExtractor()
+        # "dalle", or "procedural" for offline / benchmark runs (no API calls at all)
+        self.backend      = (backend or os.getenv("IMAGE_BACKEND", "dalle")).lower()
+        self.procedural   = ProceduralImageBackend()
 
         self.debug = debug
         self.artstyle = artstyle            # Optional “global artstyle” prefix
 
+    def _extract_prompt(self, scene_text: str, location: Optional[str] = None) -> dict:
+        """Local, model-free prompt (see scene_prompt.py) with its confidence."""
+        description, names = None, []
+        if self.state is not None:
+            node = self.state.world_map_hierarchy.get(location) if location else None
+            description = (node or {}).get("description")
+            names = [n.get("name") for n in (self.state.story_outline or {}).get("npcs", [])]
+            names.append(getattr(self.state, "companion_name", None))
+        return self.prompt_extractor.extract(scene_text, location, description, [n for n in names if n])
+
     def _generate_image_prompt(self, scene_text: str, location: Optional[str] = None) -> str:
         """
         Given the raw scene_text and an optional location name, return one
-        strict, under-450 character, single-line DALL·E prompt.
+        strict, under-450 character, single-line DALL·E prompt. Built locally
+        when the scene names enough scenery; otherwise GPT-4 writes it.
         """
 
         # Log received scene text
         logger.debug("_generate_image_prompt received scene_text: %s", scene_text)
 
+        extracted = self._extract_prompt(scene_text, location)
+        if extracted["confidence"] >= self.prompt_extractor.min_confidence:
+            logger.debug("Local DALL·E prompt (confidence %.2f): %s", extracted["confidence"], extracted["prompt"])
+            return extracted["prompt"]
+        logger.debug("Local prompt confidence %.2f too low, asking %s", extracted["confidence"], self.chat_model)
+
         style_prefix = f"(STYLE: {self.artstyle}) " if self.artstyle else ""
         loc_prefix = f"(LOCATION: {location}) " if location else ""
 
@@ -67,15 +133,16 @@ class ImageAgent:
                 f"       User message: {user_msg}\n"
             )
 
-        resp = openai.ChatCompletion.create(
-            model=self.chat_model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": user_msg}
-            ],
-            temperature=0.2,
-            max_tokens=200,
-        )
+        with api_slot("chat"):
+            resp = openai.ChatCompletion.create(
+                model=self.chat_model,
+                messages=[
+                    {"role": "system", "content": system_msg},
+                    {"role": "user", "content": user_msg}
+                ],
+                temperature=0.2,
+                max_tokens=200,
+            )
 
         prompt = resp.choices[0].message.content.strip()
         if self.debug:
@@ -95,28 +162,48 @@ class ImageAgent:
 
         return prompt
 
-    def _postprocess_image(self, raw_bytes: bytes, filename: str) -> Optional[str]:
-        """
-        Take the raw 1792x1024 image bytes, apply a mild sharpen filter,
-        upscale to 3584x2048, save locally, and return that local path.
-        """
-        try:
-            img = Image.open(BytesIO(raw_bytes)).convert("RGBA")
-
-            # Mildly sharpen
-            img = img.filter(ImageFilter.SHARPEN)
+    def set_display_size(self, width: int, height: int):
+        """Record the window/display size (device pixels) that "display" profiles target."""
+        if width > 0 and height > 0:
+            self.display_size = (int(width), int(height))
 
-            # Upscale to 3584×2048 using bicubic
-            img = img.resize(self.upsample_to, Image.Resampling.BICUBIC)
+    def _next_filename(self) -> str:
+        """Incremental numeric filenames like 1.png, 2.jpg, etc. (ids come from the manifest)."""
+        return str(self.manifest.allocate())
 
-            # Ensure output directory exists
-            out_dir = "generated_images"
-            os.makedirs(out_dir, exist_ok=True)
+    def postprocess_async(self, source: Union[bytes, str], filename: str) -> Future:
+        """
+        Convert / sharpen / resize / encode the download (raw bytes or the path
+        it was saved to) per the output profile on the image process pool.
+        The Future resolves to the saved path.
+        """
+        out_base = os.path.join(self.manifest.directory, filename)
+        return self.pool.submit(render, source, out_base, self.profile, self.display_size, self.variant_widths)
 
-            # Save to disk as PNG using provided filename
-            filepath = os.path.join(out_dir, f"{filename}.png")
-            img.save(filepath, format="PNG")
+    def _record_asset(self, filename: str, path: Optional[str], prompt: str,
+                      location: Optional[str], turn: Optional[int], timings: Optional[dict] = None):
+        """Write the finished image (or the failed attempt) to the manifest."""
+        try:
+            if not path:
+                self.manifest.release(int(filename))
+                return
+            with Image.open(path) as img:      # header only
+                width, height = img.size
+            self.manifest.record(int(filename), path, prompt=prompt, location=location,
+                                 turn=turn, width=width, height=height, timings=timings)
+        except Exception as e:
+            logger.warning(f"Could not record {path or filename} in the manifest: {e}")
 
+    def _postprocess_image(self, source: Union[bytes, str], filename: str) -> Optional[str]:
+        """
+        Take the raw 1792x1024 image (bytes or downloaded file), post-process it
+        per the output profile (in a worker process), save locally, and return that local path.
+        """
+        try:
+            started = time.perf_counter()
+            filepath = self.postprocess_async(source, filename).result()
+            logger.debug(f"Post-processed {filepath} ({self.profile['name']}) in "
+                         f"{time.perf_counter() - started:.2f}s")
             return filepath
         except Exception as e:
             logger.error(f"Post-processing image failed: {e}")
@@ -126,19 +213,41 @@ class ImageAgent:
         self,
         scene_text: str,
         location: Optional[str] = None,
-        size: Optional[str] = None
+        size: Optional[str] = None,
+        prompt: Optional[str] = None,
+        turn: Optional[int] = None,
+        fallback: bool = True,
+        accept_cached: Optional[Callable[[str], bool]] = None
     ) -> str:
         """
-        1) Generate an image prompt via GPT-4.
+        0) With a cache and `accept_cached`, reuse the newest cached background
+           for `location` if accept_cached(its prompt) approves — before any
+           prompt is generated.
+        1) Generate an image prompt via GPT-4 (unless `prompt` was already made,
+           e.g. by generate_location_prompts()).
         2) Prepend the artstyle to the DALL·E prompt itself.
         3) Send that prompt to DALL·E-3 (1792×1024 by default, quality=hd), download bytes,
-           post-process (sharpen + upscale), save to disk, and return the local path.
+           post-process (see the output profile), save to disk, and return the local path.
+        With a cache, step 3 is skipped when the same prompt was already drawn here.
+        Cache hits are linked (or copied) into the output directory, so saves
+        never point into the evictable cache.
+        Rendered images are recorded in the asset manifest with `turn` and `location`.
+        If DALL·E fails, a procedural background is returned instead (or, with
+        fallback=False, the placeholder URL).
         """
         # Log scene_text for debugging
         logger.debug("generate_scene_image called with scene_text: %s", scene_text)
 
+        if self.backend == "procedural":
+            return self.procedural_scene_image(scene_text, location, turn)
+
+        if accept_cached is not None and prompt is None:
+            reused = self.cached_location_image(location, turn, accept_cached)
+            if reused:
+                return reused
+
         # Create a fresh prompt from GPT
-        image_prompt = self._generate_image_prompt(scene_text, location)
+        image_prompt = prompt or self._generate_image_prompt(scene_text, location)
 
         # Prepend global artstyle to the final DALL·E prompt
         if self.artstyle:
@@ -147,64 +256,237 @@ class ImageAgent:
         # Log final image prompt
         logger.debug("Final DALL·E prompt: %s", image_prompt)
 
+        # Same premise + location + style + prompt → reuse the stored background
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.key(self.premise, location, self.artstyle, image_prompt)
+            cached = self.cache.get(cache_key)
+            if cached:
+                logger.debug("Image cache hit: %s", cached)
+                placed = self._place_cached(cached, image_prompt, location, turn)
+                if placed:
+                    return placed
+
         try:
             if self.debug:
                 print(
-                    f"[DEBUG] Calling openai.Image.create(model={self.image_model}, size={self.base_size}, quality='hd') with prompt:\n"
+                    f"[DEBUG] Calling openai.Image.create(model={self.image_model}, size={self.base_size}, quality='hd', "
+                    f"response_format={self.response_format}) with prompt:\n"
                     f"  \"{image_prompt}\"\n"
                 )
 
-            resp = openai.Image.create(
-                model=self.image_model,
-                prompt=image_prompt,
-                n=1,
-                size=size or self.base_size,
-                quality="hd"
-            )
-            url = resp["data"][0]["url"]
-
-            # Download the image bytes
-            img_resp = requests.get(url)
-            img_resp.raise_for_status()
-            raw_bytes = img_resp.content
-
-            # Post-process: sharpen + upscale → local PNG
-
-            # Always use incremental numeric filenames like 1.png, 2.png, etc.
-            out_dir = "generated_images"
-            os.makedirs(out_dir, exist_ok=True)
-
-            existing = [
-                f for f in os.listdir(out_dir)
-                if f.endswith(".png") and f[:-4].isdigit()
-            ]
-            existing_numbers = [int(f[:-4]) for f in existing]
-            next_number = max(existing_numbers) + 1 if existing_numbers else 1
-            filename = str(next_number)
-
-
-            final_path = self._postprocess_image(raw_bytes, filename)
+            started = time.perf_counter()
+            item, mode = self._create_image(image_prompt, size or self.base_size)
+            timings = {"mode": mode, "generate": time.perf_counter() - started}
+
+            # Post-process per output profile → local file
+            source, download = self._image_source(item, timings)
+            filename = self._next_filename()
+            try:
+                mark = time.perf_counter()
+                final_path = self._postprocess_image(source, filename)
+                timings["postprocess"] = time.perf_counter() - mark
+            finally:
+                if download:
+                    try:
+                        os.remove(download)
+                    except OSError:
+                        pass
+            timings["total"] = time.perf_counter() - started
+            self._log_timings(filename, timings)
+            self._record_asset(filename, final_path, image_prompt, location, turn, timings)
+            if final_path and cache_key:
+                try:
+                    self.cache.put(cache_key, final_path, self.premise, location, self.artstyle, image_prompt)
+                except Exception as e:
+                    logger.warning(f"Could not cache {final_path}: {e}")
             if final_path:
                 if self.debug:
                     print(f"[DEBUG] Image saved locally at {final_path}\n")
                 return final_path
-            else:
-                # If post-processing fails, return the original URL
-                return url
+            # If post-processing fails the URL is no use to the UI either
+            return self._fallback_image(scene_text, location, turn, fallback)
 
         except Exception as e:
             logger.error(f"DALL·E generation failed: {e}")
-            placeholder = "https://example.com/placeholder.png"
-            return placeholder
+            return self._fallback_image(scene_text, location, turn, fallback)
+
+    def _fallback_image(self, scene_text: str, location: Optional[str], turn: Optional[int], fallback: bool) -> str:
+        if fallback:
+            return self.procedural_scene_image(scene_text, location, turn)
+        return "https://example.com/placeholder.png"
+
+    def procedural_scene_image(
+        self,
+        scene_text: str,
+        location: Optional[str] = None,
+        turn: Optional[int] = None
+    ) -> str:
+        """
+        Instant model-free background (see procedural_images.py), rendered on
+        the calling thread. Recorded in the manifest but never cached, so a
+        later run still asks DALL·E for the real picture.
+        """
+        started = time.perf_counter()
+        filename = self._next_filename()
+        try:
+            path = self.procedural.scene_image(
+                scene_text, location, os.path.join(self.manifest.directory, filename),
+                self.profile, self.display_size, self.variant_widths
+            )
+        except Exception as e:
+            logger.error(f"Procedural image failed: {e}")
+            path = None
+        timings = {"mode": "procedural", "total": time.perf_counter() - started}
+        self._log_timings(filename, timings)
+        self._record_asset(filename, path, None, location, turn, timings)
+        return path or "https://example.com/placeholder.png"
+
+    def _create_image(self, image_prompt: str, size: str) -> Tuple[dict, str]:
+        """
+        Call DALL·E in the configured response format. If the endpoint rejects
+        inline base64, switch this agent to URL mode and ask again.
+        Returns (response item, mode used).
+        """
+        mode = self.response_format
+        try:
+            with api_slot("image"):
+                resp = openai.Image.create(
+                    model=self.image_model,
+                    prompt=image_prompt,
+                    n=1,
+                    size=size,
+                    quality="hd",
+                    response_format=mode
+                )
+        except openai.error.InvalidRequestError as e:
+            # content policy, bad size, ...: asking again for a URL won't help
+            if mode == "url" or not rejects_response_format(e):
+                raise
+            logger.warning(f"Inline image responses rejected, falling back to URLs: {e}")
+            self.response_format = mode = "url"
+            with api_slot("image"):
+                resp = openai.Image.create(
+                    model=self.image_model,
+                    prompt=image_prompt,
+                    n=1,
+                    size=size,
+                    quality="hd",
+                    response_format=mode
+                )
+        return resp["data"][0], mode
+
+    def _image_source(self, item: dict, timings: dict) -> Tuple[Union[bytes, str], Optional[str]]:
+        """
+        What to post-process: the decoded inline payload, or (when the response
+        only carries a URL) the file it was downloaded to. Returns (source,
+        temp file to delete afterwards or None).
+        """
+        mark = time.perf_counter()
+        if item.get("b64_json"):
+            raw = base64.b64decode(item["b64_json"])
+            timings["decode"] = time.perf_counter() - mark
+            return raw, None
+        timings["mode"] = "url"
+        # Stream the download to a hidden temp file, then post-process from disk
+        download = os.path.join(self.manifest.directory, f".{uuid.uuid4().hex}.download")
+        self.downloader.fetch(item["url"], download)
+        timings["download"] = time.perf_counter() - mark
+        return download, download
+
+    def cached_location_image(self, location: Optional[str], turn: Optional[int] = None,
+                              accept: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """
+        Newest cached background for `location` (in this premise and style)
+        whose prompt `accept` approves, placed into the output directory; None
+        without a cache, a location or a match.
+        """
+        if not (self.cache and location):
+            return None
+        found = self.cache.lookup_location(self.premise, location, self.artstyle, accept)
+        if not found:
+            return None
+        logger.debug("Image cache hit for %s: %s", location, found["path"])
+        return self._place_cached(found["path"], found["prompt"], location, turn)
+
+    def _place_cached(self, cached: str, prompt: str, location: Optional[str],
+                      turn: Optional[int]) -> Optional[str]:
+        """Session link/copy of a cached image under a fresh manifest id; None if that fails."""
+        filename = self._next_filename()
+        dest = os.path.join(self.manifest.directory, filename + os.path.splitext(cached)[1])
+        try:
+            self.cache.place(cached, dest)
+        except OSError as e:
+            logger.warning(f"Could not place cached image {cached}: {e}")
+            dest = None
+        self._record_asset(filename, dest, prompt, location, turn, {"mode": "cache"})
+        return dest
+
+    def _log_timings(self, filename: str, timings: dict):
+        self.timings.append(dict(timings, id=int(filename)))
+        logger.info("Image %s via %s: %s", filename, timings["mode"], ", ".join(
+            f"{k} {v:.2f}s" for k, v in timings.items() if k != "mode"
+        ))
 
     def generate_location_image(
         self,
         location_name: str,
         location_description: str,
-        size: Optional[str] = None
+        size: Optional[str] = None,
+        prompt: Optional[str] = None
     ) -> str:
         """
-        Pre-generate a “background” image specifically for a location.
+        Pre-generate a “background” image specifically for a location. No
+        procedural stand-in on failure: it would be kept as the real background.
         """
         scene_text = f"Location: {location_name}. {location_description}"
-        return self.generate_scene_image(scene_text, location=location_name, size=size)
+        return self.generate_scene_image(scene_text, location=location_name, size=size, prompt=prompt, fallback=False)
+
+    def generate_location_prompts(self, locations: List[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Batch version of _generate_image_prompt for pre-generating backgrounds:
+        one GPT-4 call for several (name, description) locations. Returns
+        {name: prompt}; names the model skipped or mangled are simply missing.
+        """
+        if not locations:
+            return {}
+        style_prefix = f"(STYLE: {self.artstyle}) " if self.artstyle else ""
+        numbered = "\n".join(f"{i}. {name}: {desc}" for i, (name, desc) in enumerate(locations, 1))
+        system_msg = (
+            "You are a professional prompt engineer. For each numbered location, write EXACTLY one line, "
+            "under 450 characters, describing only the environment—no people, no characters, no actions. "
+            "Use ONLY environment details from that location's description; do NOT invent new objects. "
+            "Include lighting, mood and composition, and end each prompt with --ar 16:9."
+        )
+        user_msg = (
+            f"{style_prefix}Locations:\n{numbered}\n\n"
+            "Return ONLY a JSON list with one object per location, in order: "
+            "{\"location\": <number>, \"prompt\": <DALL·E prompt>}."
+        )
+        try:
+            with api_slot("chat"):
+                resp = openai.ChatCompletion.create(
+                    model=self.chat_model,
+                    messages=[
+                        {"role": "system", "content": system_msg},
+                        {"role": "user", "content": user_msg}
+                    ],
+                    temperature=0.2,
+                    max_tokens=180 * len(locations),
+                )
+            raw = resp.choices[0].message.content.strip()
+            entries = json.loads(raw[raw.find("["):raw.rfind("]") + 1])
+        except Exception as e:
+            logger.warning(f"Batched location prompts failed: {e}")
+            return {}
+
+        prompts = {}
+        for entry in entries:
+            try:
+                name, desc = locations[int(entry["location"]) - 1]
+                prompt = " ".join(str(entry["prompt"]).split())
+            except (KeyError, TypeError, ValueError, IndexError):
+                continue
+            if prompt:
+                prompts[name] = prompt
+        return prompts
@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import atexit
+import shutil
+import hashlib
+import threading
+from typing import Callable, Optional
+
+from agents.file_cache import FileCache, place_file
+from agents.image_profiles import variant_path, variant_paths
+
+DEFAULT_CACHE_DIR = "image_cache"
+
+
+def premise_id(outline: Optional[dict]) -> str:
+    """Stable id for a premise: the world name plus its locations, hashed."""
+    world = (outline or {}).get("world_data", {})
+    ident = [world.get("world_name", "")] + [
+        kl.get("location_name", "") for kl in world.get("key_locations", [])
+    ]
+    return hashlib.sha1(json.dumps(ident).encode("utf-8")).hexdigest()[:12]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lower-case, drop DALL·E flags and punctuation, collapse whitespace."""
+    text = re.sub(r"--\w+\s+\S+", " ", prompt.lower())
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class ImageCache(FileCache):
+    """
+    Content-addressed store for generated scene/location backgrounds.
+
+    Entries are keyed by sha256(premise, location, artstyle, normalized prompt)
+    and live in `root/<premise>/<key><ext>`, so every session played on the same
+    premise shares them. One `index.json` at the root tracks size and last use
+    per entry; put() evicts least-recently-used entries until the cache fits
+    `quota_mb`. Hit/miss/reuse counters are kept for metrics and persisted
+    lazily (see FileCache).
+
+    Callers get their own link (or copy) of a hit through place(), so a
+    session never points into the cache.
+    """
+
+    NAME = "ImageCache"
+    STATS = ("hits", "misses", "reuses")
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, quota_mb: float = 512):
+        super().__init__(root, quota_mb)
+
+    @classmethod
+    def shared(cls) -> "ImageCache":
+        """Process-wide cache configured from IMAGE_CACHE_DIR / IMAGE_CACHE_MB."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    root=os.getenv("IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR),
+                    quota_mb=float(os.getenv("IMAGE_CACHE_MB", "512")),
+                )
+                atexit.register(cls._shared.flush)
+            return cls._shared
+
+    # ─── Keys ──────────────────────────────────────────────────────────────
+    @staticmethod
+    def key(premise: str, location: Optional[str], artstyle: Optional[str], prompt: str) -> str:
+        parts = [premise or "", (location or "").strip().lower(), (artstyle or "").strip().lower(),
+                 normalize_prompt(prompt)]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    # ─── Lookup / store ────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[str]:
+        """Cached path for `key` (counted as hit or miss), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            path = os.path.join(self.root, entry["file"]) if entry else None
+            if entry and not os.path.isfile(path):
+                del self._entries[key]
+                entry = None
+            if entry:
+                entry["last_used"] = time.time()
+                entry["hits"] = entry.get("hits", 0) + 1
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+            self._touched()
+        return path if entry else None
+
+    def find_location(self, premise: str, location: str, artstyle: Optional[str],
+                      accept: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """
+        Most recently used background for `location` in this premise and style,
+        whatever prompt made it — lets later sessions skip the prompt call too.
+        With `accept`, only a background whose (normalized) prompt it approves.
+        """
+        found = self.lookup_location(premise, location, artstyle, accept)
+        return found["path"] if found else None
+
+    def lookup_location(self, premise: str, location: str, artstyle: Optional[str],
+                        accept: Optional[Callable[[str], bool]] = None) -> Optional[dict]:
+        """find_location() as {"path", "prompt"}."""
+        loc, style = (location or "").strip().lower(), (artstyle or "").strip().lower()
+        with self._lock:
+            matches = [
+                (k, e) for k, e in self._entries.items()
+                if e.get("premise") == premise
+                and (e.get("location") or "").strip().lower() == loc
+                and (e.get("artstyle") or "").strip().lower() == style
+                and os.path.isfile(os.path.join(self.root, e["file"]))
+            ]
+            if not matches:
+                return None
+            key, entry = max(matches, key=lambda m: m[1]["last_used"])
+        if accept is not None and not accept(entry.get("prompt", "")):
+            return None
+        with self._lock:
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._stats["hits"] += 1
+            self._touched()
+        return {"path": os.path.join(self.root, entry["file"]), "prompt": entry.get("prompt", "")}
+
+    def place(self, cached_path: str, dest: str) -> str:
+        """Give a session its own link (or copy) of a cached background (and its variants) at `dest`."""
+        return place_file(cached_path, dest)
+
+    def put(self, key: str, src_path: str, premise: str, location: Optional[str] = None,
+            artstyle: Optional[str] = None, prompt: str = "") -> str:
+        """Copy `src_path` into the cache under `key`; returns the cached path."""
+        rel = os.path.join(premise or "_", key + os.path.splitext(src_path)[1])
+        dest = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(src_path, dest)
+        size = os.path.getsize(dest)
+        variants = []
+        for width, src_variant in variant_paths(src_path).items():
+            shutil.copyfile(src_variant, variant_path(dest, width))
+            size += os.path.getsize(src_variant)
+            variants.append(width)
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {
+                "file": rel,
+                "premise": premise,
+                "location": location,
+                "artstyle": artstyle,
+                "prompt": normalize_prompt(prompt),
+                "bytes": size,
+                "variants": variants,
+                "created": now,
+                "last_used": now,
+                "hits": 0,
+            }
+            self._evict(keep=(key,))
+            self._save_index()
+        return dest
+
+    def record_reuse(self):
+        """Count a background reused without even building a prompt."""
+        with self._lock:
+            self._stats["reuses"] += 1
+            self._touched()
+
+    # ─── Metrics ───────────────────────────────────────────────────────────
+    def stats(self) -> dict:
+        stats = super().stats()
+        lookups = stats["hits"] + stats["misses"] + stats["reuses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["reuses"]) / lookups, 3) if lookups else 0.0
+        return stats
+
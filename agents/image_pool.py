@@ -0,0 +1,116 @@
+import os
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ImageProcessPool:
+    """
+    Runs CPU-heavy image work (resize, sharpen, encode) in worker processes so
+    it neither blocks the thread that downloaded the image nor contends for the
+    GIL with the UI. submit() returns a Future; at most `max_pending` jobs are
+    queued or running at once and further submits wait for a free slot, so a
+    burst of pre-generation can't pile up decoded images in memory.
+
+    `fn` must be a picklable module-level function (see image_profiles.py).
+    With `workers=0`, or if worker processes can't be started, jobs run inline
+    on the calling thread and return an already-completed Future.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, workers: int = 2, max_pending: int = 4):
+        self.workers = max(0, workers)
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    @classmethod
+    def shared(cls) -> "ImageProcessPool":
+        """Process-wide pool configured from IMAGE_PROCESS_WORKERS / IMAGE_QUEUE_DEPTH."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                default_workers = str(min(2, os.cpu_count() or 1))
+                cls._shared = cls(
+                    workers=int(os.getenv("IMAGE_PROCESS_WORKERS", default_workers)),
+                    max_pending=int(os.getenv("IMAGE_QUEUE_DEPTH", "4")),
+                )
+            return cls._shared
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        # started lazily: spawning workers costs more than most single jobs
+        with self._lock:
+            if self._executor is None and self.workers:
+                try:
+                    # spawn, not fork: forking this multithreaded process can hand a
+                    # worker a lock some other thread held at fork time
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                except Exception as e:
+                    logger.warning(f"[ImageProcessPool] Worker processes unavailable, running inline: {e}")
+                    self.workers = 0
+            return self._executor
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def submit(self, fn: Callable, *args, timeout: Optional[float] = None) -> Future:
+        """
+        Queue fn(*args) on a worker process. Blocks while `max_pending` jobs are
+        in flight (up to `timeout`, then the job runs inline instead).
+        """
+        if not self._slots.acquire(timeout=timeout):
+            logger.warning("[ImageProcessPool] Queue full, processing inline.")
+            return self._run_inline(fn, *args)
+
+        with self._lock:
+            self._pending += 1
+        executor = self._get_executor()
+        try:
+            if executor is None:
+                future = self._run_inline(fn, *args)
+            else:
+                try:
+                    future = executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    # a worker died (e.g. killed for memory); restart on next submit
+                    logger.warning("[ImageProcessPool] Worker pool broke, processing inline.")
+                    with self._lock:
+                        if self._executor is executor:
+                            self._executor = None
+                    future = self._run_inline(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _run_inline(fn: Callable, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
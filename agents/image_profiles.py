@@ -0,0 +1,334 @@
+import os
+import io
+import sys
+import time
+import uuid
+import logging
+import argparse
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image, ImageFilter
+
+logger = logging.getLogger(__name__)
+
+# ─── Output profiles ───────────────────────────────────────────────────────
+# target:        "display" → cover the display size (like the UI's
+#                KeepAspectRatioByExpanding), "source" → keep the downloaded
+#                size, or a fixed (width, height).
+# allow_upscale: if False the image is never enlarged beyond its source size.
+PROFILES: Dict[str, dict] = {
+    # The original pipeline: RGBA, sharpen, 2x bicubic upscale, PNG.
+    "legacy": {
+        "mode": "RGBA", "format": "PNG", "quality": None, "sharpen": True,
+        "target": (3584, 2048), "allow_upscale": True,
+    },
+    # Sized for the current window/display, JPEG — the default.
+    "display": {
+        "mode": "RGB", "format": "JPEG", "quality": 90, "sharpen": True,
+        "target": "display", "allow_upscale": True,
+    },
+    # Same, but never enlarges the 1792x1024 download; WebP is much smaller.
+    "display-webp": {
+        "mode": "RGB", "format": "WEBP", "quality": 85, "sharpen": True,
+        "target": "display", "allow_upscale": False,
+    },
+    # Source resolution, lossless but without the alpha channel or upscale.
+    "source-png": {
+        "mode": "RGB", "format": "PNG", "quality": None, "sharpen": False,
+        "target": "source", "allow_upscale": False,
+    },
+    # Smallest files for slow disks / low-memory machines.
+    "compact": {
+        "mode": "RGB", "format": "JPEG", "quality": 78, "sharpen": False,
+        "target": (1280, 720), "allow_upscale": False,
+    },
+}
+
+DEFAULT_PROFILE = "display"
+
+EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+# ─── Pre-scaled variants ───────────────────────────────────────────────────
+# Written next to each image as `<stem>@<width>w<ext>` so the UI can load the
+# smallest one that still covers its label instead of decoding the full file.
+# Backgrounds: common window widths. Portraits: the 220/240 px labels at 1x and 2x.
+BACKGROUND_VARIANT_WIDTHS = (960, 1280, 1920, 2560)
+PORTRAIT_VARIANT_SIDES = (240, 480)
+
+
+def background_variant_widths() -> Tuple[int, ...]:
+    """Background variant widths, overridable with IMAGE_VARIANT_WIDTHS ("" = none)."""
+    raw = os.getenv("IMAGE_VARIANT_WIDTHS")
+    if raw is None:
+        return BACKGROUND_VARIANT_WIDTHS
+    return tuple(sorted(int(w) for w in raw.split(",") if w.strip()))
+
+
+def variant_path(path: str, width: int) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}@{width}w{ext}"
+
+
+def variant_paths(path: str) -> Dict[int, str]:
+    """{width: path} of the variants written for `path` (a few stat calls, no listing)."""
+    widths = set(background_variant_widths()) | set(PORTRAIT_VARIANT_SIDES)
+    found = {w: variant_path(path, w) for w in sorted(widths)}
+    return {w: p for w, p in found.items() if os.path.isfile(p)}
+
+
+def pick_variant(path: str, width: int, height: int, cover: bool = True) -> str:
+    """
+    Smallest variant of `path` that still fills `width` x `height` device
+    pixels — cover=True for KeepAspectRatioByExpanding, False for
+    KeepAspectRatio. Falls back to `path` itself.
+    """
+    variants = variant_paths(path)
+    if not variants or width <= 0 or height <= 0:
+        return path
+    try:
+        with Image.open(path) as img:      # header only
+            sw, sh = img.size
+    except Exception:
+        return path
+    scale = max(width / sw, height / sh) if cover else min(width / sw, height / sh)
+    needed = sw * scale
+    for w in sorted(variants):
+        if needed <= w < sw:
+            return variants[w]
+    return path
+
+
+def _write_variants(img: Image.Image, path: str, widths, save) -> Dict[int, str]:
+    # largest first, each resized from the previous one: cheaper than from the original
+    written, (sw, sh) = {}, img.size
+    for w in sorted((w for w in widths if w < sw), reverse=True):
+        img = img.resize((w, max(1, round(sh * w / sw))), Image.Resampling.LANCZOS)
+        written[w] = variant_path(path, w)
+        _replace_file(img, written[w], save)
+    return written
+
+
+def _replace_file(img: Image.Image, path: str, save):
+    """
+    Write `img` next to `path` and rename it into place. `path` may be a hard
+    link into a shared cache (see portrait_cache.py); writing through it would
+    change every other copy.
+    """
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        save(img, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def get_profile(name: Optional[str] = None, quality: Optional[int] = None) -> dict:
+    """
+    Resolve a profile by name (default IMAGE_OUTPUT_PROFILE), with an optional
+    quality override (default IMAGE_OUTPUT_QUALITY) for lossy formats.
+    """
+    name = name or os.getenv("IMAGE_OUTPUT_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        logger.warning(f"Unknown image output profile '{name}', using '{DEFAULT_PROFILE}'.")
+        name = DEFAULT_PROFILE
+    profile = dict(PROFILES[name], name=name)
+    if quality is None and os.getenv("IMAGE_OUTPUT_QUALITY"):
+        quality = int(os.getenv("IMAGE_OUTPUT_QUALITY"))
+    if quality is not None and profile["quality"] is not None:
+        profile["quality"] = max(1, min(int(quality), 100))
+    return profile
+
+
+def target_size(
+    source: Tuple[int, int],
+    profile: dict,
+    display_size: Optional[Tuple[int, int]] = None
+) -> Tuple[int, int]:
+    """Output (width, height) for a `source`-sized image under `profile`."""
+    sw, sh = source
+    target = profile["target"]
+    if target == "display" and display_size:
+        dw, dh = display_size
+        scale = max(dw / sw, dh / sh)
+    elif isinstance(target, (tuple, list)):
+        tw, th = target
+        scale = max(tw / sw, th / sh)
+    else:
+        scale = 1.0
+    if not profile["allow_upscale"]:
+        scale = min(scale, 1.0)
+    return max(1, round(sw * scale)), max(1, round(sh * scale))
+
+
+def _pixel_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+def transform(
+    img: Image.Image,
+    profile: dict,
+    display_size: Optional[Tuple[int, int]] = None,
+    stats: Optional[dict] = None
+) -> Image.Image:
+    """
+    Mode conversion, optional sharpen and resize for `profile`. If `stats` is
+    given, "peak_bytes" records the largest pixel-buffer footprint (input and
+    output of a step are alive together).
+    """
+    peak = _pixel_bytes(img)
+
+    def step(src, out):
+        nonlocal peak
+        peak = max(peak, _pixel_bytes(src) + _pixel_bytes(out))
+        return out
+
+    if img.mode != profile["mode"]:
+        img = step(img, img.convert(profile["mode"]))
+    if profile["sharpen"]:
+        img = step(img, img.filter(ImageFilter.SHARPEN))
+    size = target_size(img.size, profile, display_size)
+    if size != img.size:
+        img = step(img, img.resize(size, Image.Resampling.BICUBIC))
+
+    if stats is not None:
+        stats["peak_bytes"] = peak
+    return img
+
+
+def encode(img: Image.Image, profile: dict) -> bytes:
+    fmt = profile["format"]
+    kwargs = {}
+    if fmt == "JPEG":
+        kwargs = {"quality": profile["quality"], "optimize": True, "progressive": True}
+    elif fmt == "WEBP":
+        kwargs = {"quality": profile["quality"], "method": 4}
+    elif fmt == "PNG" and profile.get("quality") is None:
+        kwargs = {"compress_level": 6}
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _open(source: Union[bytes, str, Image.Image]) -> Image.Image:
+    # raw bytes, the path of a downloaded file (cheaper to hand to a worker),
+    # or an already-drawn image (procedural_images.py)
+    if isinstance(source, Image.Image):
+        return source
+    return Image.open(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _save_encoded(img: Image.Image, path: str, profile: dict):
+    with open(path, "wb") as f:
+        f.write(encode(img, profile))
+
+
+def render(
+    source: Union[bytes, str],
+    out_base: str,
+    profile: dict,
+    display_size: Optional[Tuple[int, int]] = None,
+    variant_widths: Tuple[int, ...] = ()
+) -> str:
+    """
+    Decode the downloaded image (bytes or file path), apply `profile` and write
+    it to `out_base` + the format's extension, plus a downscaled copy for each
+    of `variant_widths` narrower than the result. Returns the main path.
+    """
+    img = _open(source)
+    img = transform(img, profile, display_size)
+    path = out_base + EXTENSIONS[profile["format"]]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _replace_file(img, path, lambda im, p: _save_encoded(im, p, profile))
+    _write_variants(img, path, variant_widths, lambda im, p: _save_encoded(im, p, profile))
+    return path
+
+
+def render_portrait(
+    source: Union[bytes, str],
+    path: str,
+    max_side: int = 0,
+    variant_sides: Tuple[int, ...] = ()
+) -> str:
+    """
+    Shrink a downloaded portrait so its longer side is at most `max_side`
+    (0 = keep its size), saved as PNG, plus one smaller copy per entry of
+    `variant_sides`.
+    """
+    img = _open(source)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA")
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _replace_file(img, path, lambda im, p: im.save(p, format="PNG", compress_level=6))
+    _write_variants(img, path, variant_sides, lambda im, p: im.save(p, format="PNG", compress_level=6))
+    return path
+
+
+# ─── Benchmark ─────────────────────────────────────────────────────────────
+def _sample_image(size=(1792, 1024)) -> bytes:
+    """A DALL·E-sized stand-in: gradient plus noise so encoders do real work."""
+    w, h = size
+    noise = Image.effect_noise(size, 40).convert("L")
+    grad = Image.linear_gradient("L").resize(size)
+    img = Image.merge("RGB", (grad, noise, grad.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def benchmark(
+    raw_bytes: bytes,
+    display_size: Optional[Tuple[int, int]] = (1920, 1080),
+    runs: int = 3,
+    profiles=None
+) -> Dict[str, dict]:
+    """
+    {profile: {"size", "ms", "peak_mb", "file_kb"}} — median post-process +
+    encode time over `runs`, peak pixel-buffer memory and encoded file size.
+    """
+    results = {}
+    for name in profiles or PROFILES:
+        profile = get_profile(name)
+        times, stats, data, size = [], {}, b"", None
+        for _ in range(max(1, runs)):
+            started = time.perf_counter()
+            img = Image.open(io.BytesIO(raw_bytes))
+            img = transform(img, profile, display_size, stats)
+            data = encode(img, profile)
+            times.append(time.perf_counter() - started)
+            size = img.size
+        times.sort()
+        results[name] = {
+            "size": size,
+            "ms": round(times[len(times) // 2] * 1000, 1),
+            "peak_mb": round(stats["peak_bytes"] / 2 ** 20, 1),
+            "file_kb": round(len(data) / 1024, 1),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare scene image output profiles.")
+    parser.add_argument("image", nargs="?", help="downloaded scene image (default: synthetic 1792x1024)")
+    parser.add_argument("--display", default="1920x1080", help="display size WxH used by 'display' profiles")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            raw = f.read()
+    else:
+        raw = _sample_image()
+    display = tuple(int(v) for v in args.display.lower().split("x"))
+
+    print(f"{'profile':<14}{'output':>12}{'time ms':>10}{'peak MB':>10}{'file KB':>10}")
+    for name, r in benchmark(raw, display, args.runs).items():
+        print(f"{name:<14}{'%dx%d' % r['size']:>12}{r['ms']:>10}{r['peak_mb']:>10}{r['file_kb']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import os
+import time
+import atexit
+import hashlib
+import threading
+from typing import Optional
+
+from agents.file_cache import FileCache, link_or_copy, place_file
+from agents.image_profiles import variant_path, variant_paths
+
+DEFAULT_PORTRAIT_CACHE_DIR = "portrait_cache"
+
+
+class PortraitCache(FileCache):
+    """
+    Character portraits shared across sessions, keyed by
+    sha256(visual description, genre, artstyle, size).
+
+    Files live in `root/<key>.png` (plus their UI variants). A session gets
+    its copy through place(), which hard-links the cached file into
+    character_portraits/ where the filesystem allows it. The link count then
+    doubles as the reference count: archiving a run only moves its links, so
+    portraits it shares with the cache survive, and eviction skips entries
+    still linked from a run. Where links aren't possible the session gets a
+    plain copy, which never depends on the cache either. The index is
+    persisted lazily, like ImageCache's (see FileCache).
+    """
+
+    NAME = "PortraitCache"
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root: str = DEFAULT_PORTRAIT_CACHE_DIR, quota_mb: float = 256):
+        super().__init__(root, quota_mb)
+
+    @classmethod
+    def shared(cls) -> "PortraitCache":
+        """Process-wide cache configured from PORTRAIT_CACHE_DIR / PORTRAIT_CACHE_MB."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    root=os.getenv("PORTRAIT_CACHE_DIR", DEFAULT_PORTRAIT_CACHE_DIR),
+                    quota_mb=float(os.getenv("PORTRAIT_CACHE_MB", "256")),
+                )
+                atexit.register(cls._shared.flush)
+            return cls._shared
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, key + ".png")
+
+    def _path(self, key: str, entry: dict) -> str:
+        return self._file(key)
+
+    # ─── Keys ──────────────────────────────────────────────────────────────
+    @staticmethod
+    def key(description: str, genre: Optional[str], artstyle: Optional[str], size: Optional[str]) -> str:
+        parts = [" ".join((description or "").lower().split()), (genre or "").strip().lower(),
+                 (artstyle or "").strip().lower(), (size or "").strip().lower()]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    # ─── Lookup / store ────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[str]:
+        """Cached path for `key` (counted as hit or miss), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not os.path.isfile(self._file(key)):
+                del self._entries[key]
+                entry = None
+            if entry:
+                entry["last_used"] = time.time()
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+            self._touched()
+        return self._file(key) if entry else None
+
+    def put(self, key: str, src_path: str) -> str:
+        """Store the portrait at `src_path` (linked if possible) under `key`; returns the cached path."""
+        os.makedirs(self.root, exist_ok=True)
+        dest = self._file(key)
+        size = link_or_copy(src_path, dest)
+        for width, src_variant in variant_paths(src_path).items():
+            size += link_or_copy(src_variant, variant_path(dest, width))
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {"bytes": size, "created": now, "last_used": now}
+            self._evict(keep=(key,))
+            self._save_index()
+        return dest
+
+    def place(self, key: str, dest: str) -> str:
+        """Give a session its own link (or copy) of the cached portrait at `dest`."""
+        return place_file(self._file(key), dest)
+
+    def refcount(self, key: str) -> int:
+        """How many session files share the cached portrait (hard links beyond the cache's own)."""
+        try:
+            return os.stat(self._file(key)).st_nlink - 1
+        except OSError:
+            return 0
+
+    # ─── Metrics ───────────────────────────────────────────────────────────
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            keys = list(self._entries)
+        stats["shared"] = sum(1 for k in keys if self.refcount(k) > 0)
+        return stats
+
+
+def reuse_for_premise(premise_choice: Optional[str]) -> bool:
+    """
+    Whether a new game may take portraits from the cache instead of asking
+    DALL·E (PORTRAIT_CACHE_REUSE): "default" (the default) only for the
+    built-in default premise, whose NPCs are the same every game; "always";
+    or "never". New portraits are stored either way.
+    """
+    policy = os.getenv("PORTRAIT_CACHE_REUSE", "default").lower()
+    if policy == "always":
+        return True
+    if policy == "never":
+        return False
+    return bool(premise_choice) and premise_choice.lower().startswith("d")
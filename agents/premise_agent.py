@@ -3,8 +3,13 @@ import json
 import logging
 import time
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from jsonschema import validate, ValidationError
+from jsonschema.validators import validator_for
+
+from agents.procedural_premise import ProceduralPremiseGenerator
+from game.scheduler import api_slot, inherit_priority
 
 class PremiseAgent:
     def __init__(self, api_key, state):
@@ -24,7 +29,196 @@ class PremiseAgent:
         with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
 
-    def generate_premise(self, retries=4):
+    # ─── Validation & repair helpers ───────────────────────────────────────
+    _VALIDATOR = None
+
+    def _validator(self):
+        """Schema validator, compiled once per process and reused for every check."""
+        if PremiseAgent._VALIDATOR is None:
+            schema = self._load_schema()
+            vcls = validator_for(schema)
+            vcls.check_schema(schema)
+            PremiseAgent._VALIDATOR = vcls(schema)
+        return PremiseAgent._VALIDATOR
+
+    @staticmethod
+    def _path_str(path):
+        out = ""
+        for p in path:
+            out += f"[{p}]" if isinstance(p, int) else (f".{p}" if out else p)
+        return out or "<root>"
+
+    @staticmethod
+    def _get_at(obj, path):
+        for p in path:
+            obj = obj[p]
+        return obj
+
+    @staticmethod
+    def _set_at(obj, path, value):
+        for p in path[:-1]:
+            obj = obj[p]
+        obj[path[-1]] = value
+
+    @staticmethod
+    def _subschema(schema, path):
+        node = schema
+        for p in path:
+            node = node.get("items", {}) if isinstance(p, int) else node.get("properties", {}).get(p, {})
+        return node
+
+    @staticmethod
+    def _postprocess_outline(outline):
+        # Clamp traits
+        traits = outline.get("player_backstory", {}).get("starting_traits", {})
+        for t in ("bravery","curiosity","empathy","communication","trust"):
+            raw = traits.get(t, 1)
+            try:
+                traits[t] = max(1, min(int(raw), 10))
+            except:
+                traits[t] = 1
+
+        # Inject current_location
+        try:
+            kl0 = outline["world_data"]["key_locations"][0]
+            sa0 = kl0["subareas"][0]
+            outline["current_location"] = {
+                "location_name":       kl0["location_name"],
+                "subarea_name":        sa0["name"],
+                "subarea_description": sa0["description"]
+            }
+        except:
+            pass
+
+    def _local_fix(self, outline, errors, passes=3):
+        """
+        Fix errors that need no model (type coercion, clamping, id casing,
+        truncation), then return the errors that remain.
+        """
+        for _ in range(passes):
+            fixed = False
+            for err in errors:
+                path = list(err.absolute_path)
+                if not path:
+                    continue
+                val, kind, rule = err.instance, err.validator, err.validator_value
+                new = None
+                if kind == "type" and rule == "integer" and not isinstance(val, bool):
+                    try:
+                        new = int(round(float(val)))
+                    except (TypeError, ValueError):
+                        pass
+                elif kind == "type" and rule == "string" and isinstance(val, (int, float)):
+                    new = str(val)
+                elif kind in ("minimum", "maximum") and isinstance(val, (int, float)):
+                    new = rule
+                elif kind == "enum" and isinstance(val, str):
+                    new = next((opt for opt in rule if str(opt).lower() == val.strip().lower()), None)
+                elif kind == "pattern" and isinstance(val, str):
+                    cand = val.strip().lower().replace(" ", "").replace("_", "")
+                    new = cand if re.match(rule, cand) else None
+                elif kind == "maxItems" and isinstance(val, list):
+                    new = val[:rule]
+                if new is not None:
+                    self._set_at(outline, path, new)
+                    fixed = True
+
+            if not fixed:
+                break
+            errors = list(self._validator().iter_errors(outline))
+        return errors
+
+    @staticmethod
+    def _repair_targets(errors):
+        """
+        Map errors to the smallest subtrees worth regenerating: the array item
+        that contains the error (one NPC, one act, one location), a missing
+        property, or the failing value itself. Nested targets are merged.
+        """
+        targets = []
+        for err in errors:
+            path = list(err.absolute_path)
+            idx = [i for i, p in enumerate(path) if isinstance(p, int)]
+            if idx:
+                targets.append(path[:idx[-1] + 1])
+            elif err.validator == "required" and isinstance(err.instance, dict):
+                targets += [path + [k] for k in err.validator_value if k not in err.instance]
+            else:
+                targets.append(path)
+
+        targets.sort(key=len)
+        merged = []
+        for t in targets:
+            if not any(t[:len(m)] == m for m in merged):
+                merged.append(t)
+        return merged
+
+    def _repair_premise(self, outline, errors, schema, timeout=120):
+        """
+        Ask the model to regenerate only the failing subtrees in ONE function call
+        (each fragment gets its own sub-schema), then splice them back in place.
+        """
+        targets = self._repair_targets(errors)
+        if any(not t for t in targets):
+            raise ValueError("Premise root is invalid; needs a full regeneration")
+
+        properties, lines = {}, []
+        for i, path in enumerate(targets):
+            key = f"fix_{i}"
+            properties[key] = self._subschema(schema, path)
+            msgs = [e.message for e in errors if list(e.absolute_path)[:len(path)] == path
+                    or (e.validator == "required" and list(e.absolute_path) == path[:-1])]
+            try:
+                current = json.dumps(self._get_at(outline, path), ensure_ascii=False)
+            except (KeyError, IndexError, TypeError):
+                current = "(missing)"
+            lines.append(
+                f"- {key} replaces `{self._path_str(path)}`\n"
+                f"  errors: {'; '.join(msgs)[:400]}\n"
+                f"  current value: {current[:1500]}"
+            )
+
+        function_def = {
+            "name": "repair_story_premise",
+            "description": "Return corrected replacements for the listed fragments of a story premise.",
+            "parameters": {"type": "object", "required": list(properties), "properties": properties}
+        }
+        user_prompt = (
+            "This story premise failed schema validation:\n"
+            f"{json.dumps(outline, ensure_ascii=False)}\n\n"
+            "Regenerate ONLY these fragments so they satisfy the schema, staying consistent with "
+            "the rest of the premise (keep existing ids, names and references):\n"
+            + "\n".join(lines)
+        )
+
+        with api_slot("chat"):
+            resp = self.client.ChatCompletion.create(
+                model="gpt-4-0613",
+                messages=[
+                    {"role": "system", "content": "You are an expert story designer fixing a premise. "
+                                                  "Return exactly one function call and nothing else."},
+                    {"role": "user", "content": user_prompt}
+                ],
+                functions=[function_def],
+                function_call={"name": "repair_story_premise"},
+                temperature=0.4,
+                max_tokens=min(6000, 400 + 700 * len(targets)),
+                request_timeout=timeout
+            )
+        call = resp.choices[0].message.get("function_call")
+        if not call:
+            raise ValueError("No function_call returned for repair")
+        fixes = json.loads(call["arguments"])
+
+        for i, path in enumerate(targets):
+            key = f"fix_{i}"
+            if key in fixes:
+                self._set_at(outline, path, fixes[key])
+        logging.info(f"[PremiseAgent] Repaired {len(targets)} fragment(s): "
+                     + ", ".join(self._path_str(p) for p in targets))
+        return outline
+
+    def generate_premise(self, retries=4, fallback=True, repair=True, deadline=None):
         """
         1) Load and attach the JSON schema as a function parameter.
         2) Call GPT-4, asking it to generate exactly the required counts:
@@ -34,16 +228,26 @@ class PremiseAgent:
            - 5–6 npcs
            - 5 acts (12–35 scenes each)
            plus player_backstory and current_location.
-        3) Clamp traits, inject current_location, validate against schema.
-        4) Retry up to `retries` times if validation fails.
-        5) Otherwise fall back to your default JSON.
+        3) Clamp traits, inject current_location, validate against schema
+           (trivially coercible errors — "12" for 12, out-of-range numbers,
+           "NPC1" for npc1, extra list items — are fixed locally).
+        4) Retry up to `retries` times if validation fails; with `repair` the
+           retries regenerate only the failing subtrees (see _repair_premise).
+           `deadline` (seconds, default PREMISE_DEADLINE_SECONDS, 0 = none) caps
+           the whole loop: requests are cut short and no retry starts past it.
+        5) Otherwise fall back to a procedural premise (see procedural_premise.py),
+           then to your default JSON (or return None if `fallback` is False).
         """
+        if deadline is None:
+            deadline = float(os.getenv("PREMISE_DEADLINE_SECONDS", "0"))
+        give_up = time.monotonic() + deadline if deadline > 0 else None
+
         self.state.story_outline = {}
         genre = self.state.selected_genre
 
         # 1) Load schema
         try:
-            schema = self._load_schema()
+            schema = self._validator().schema
         except Exception as e:
             logging.error(f"[PremiseAgent] Failed to load schema: {e}")
             schema = None
@@ -81,66 +285,85 @@ class PremiseAgent:
                 {"role": "user",    "content": user_prompt}
             ]
 
-            # 2) Retry loop
+            # 2) Retry loop: one full generation, then targeted repairs of whatever
+            #    still fails validation; a failed repair falls back to a full call.
+            validator = self._validator()
+            outline, errors = None, []
             for attempt in range(1, retries + 1):
+                remaining = None if give_up is None else give_up - time.monotonic()
+                if remaining is not None and remaining <= 1:
+                    logging.warning(f"[PremiseAgent] Deadline of {deadline:.0f}s reached after {attempt - 1} attempt(s).")
+                    break
                 try:
-                    resp = self.client.ChatCompletion.create(
-                        model="gpt-4-0613",
-                        messages=messages,
-                        functions=[function_def],
-                        function_call={"name": "generate_story_premise"},
-                        temperature=0.8,
-                        max_tokens=6000,
-                        request_timeout=180
-                    )
+                    if outline is None or not repair:
+                        with api_slot("chat"):
+                            resp = self.client.ChatCompletion.create(
+                                model="gpt-4-0613",
+                                messages=messages,
+                                functions=[function_def],
+                                function_call={"name": "generate_story_premise"},
+                                temperature=0.8,
+                                max_tokens=6000,
+                                request_timeout=180 if remaining is None else min(180, remaining)
+                            )
 
-                    call = resp.choices[0].message.get("function_call")
-                    if not call:
-                        raise ValueError("No function_call returned")
+                        call = resp.choices[0].message.get("function_call")
+                        if not call:
+                            raise ValueError("No function_call returned")
 
-                    outline = json.loads(call["arguments"])
+                        outline = json.loads(call["arguments"])
+                    else:
+                        outline = self._repair_premise(
+                            outline, errors, schema, timeout=120 if remaining is None else min(120, remaining)
+                        )
 
-                    # 3a) Clamp traits
-                    traits = outline.get("player_backstory", {}).get("starting_traits", {})
-                    for t in ("bravery","curiosity","empathy","communication","trust"):
-                        raw = traits.get(t, 1)
-                        try:
-                            traits[t] = max(1, min(int(raw), 10))
-                        except:
-                            traits[t] = 1
+                    # 3a/3b) Clamp traits, inject current_location
+                    self._postprocess_outline(outline)
 
-                    # 3b) Inject current_location
-                    try:
-                        kl0 = outline["world_data"]["key_locations"][0]
-                        sa0 = kl0["subareas"][0]
-                        current = {
-                            "location_name":       kl0["location_name"],
-                            "subarea_name":        sa0["name"],
-                            "subarea_description": sa0["description"]
-                        }
-                        outline["current_location"] = current
-                    except:
-                        pass
-
-                    # 3c) Validate
-                    validate(instance=outline, schema=schema)
+                    # 3c) Validate, fixing trivially coercible errors locally
+                    errors = self._local_fix(outline, list(validator.iter_errors(outline)))
 
-                    # Success!
-                    self.state.story_outline    = outline
-                    self.state.current_location = outline.get("current_location", {})
-                    return outline
+                    if not errors:
+                        # Success!
+                        self.state.story_outline    = outline
+                        self.state.current_location = outline.get("current_location", {})
+                        return outline
 
-                except ValidationError as ve:
-                    logging.warning(f"[PremiseAgent] Attempt {attempt} schema error: {ve.message}")
+                    logging.warning(
+                        f"[PremiseAgent] Attempt {attempt}: {len(errors)} schema error(s): "
+                        + "; ".join(f"{self._path_str(e.absolute_path)}: {e.message}" for e in errors[:5])
+                    )
+                    # the repair works from the errors; only back off on API failures
+                    continue
                 except Exception as e:
                     logging.warning(f"[PremiseAgent] Attempt {attempt} failed: {e}")
+                    # start over with a full generation
+                    outline, errors = None, []
 
                 # exponential backoff
-                time.sleep(2 ** (attempt - 1))
+                backoff = 2 ** (attempt - 1)
+                if give_up is not None:
+                    backoff = max(0.0, min(backoff, give_up - time.monotonic()))
+                time.sleep(backoff)
 
             logging.error("[PremiseAgent] All attempts failed schema validation or API.")
 
-        # 4) Fallback to default
+        return self._fallback_premise(fallback)
+
+    def _fallback_premise(self, fallback=True):
+        """Procedural premise, else the default JSON (None if `fallback` is False)."""
+        if not fallback:
+            return None
+
+        # 4) Fallback to an offline procedural premise
+        try:
+            outline = self.generate_procedural()
+            logging.warning("[PremiseAgent] Using a procedural premise instead.")
+            return outline
+        except Exception as e:
+            logging.error(f"[PremiseAgent] Procedural premise failed: {e}")
+
+        # 5) Fallback to default
         logging.warning("[PremiseAgent] Loading default premise JSON.")
         try:
             default = self._load_default()
@@ -163,3 +386,223 @@ class PremiseAgent:
 
         self.state.story_outline = default
         return default
+
+    def generate_procedural(self, seed=None):
+        """
+        Build a premise offline from the weighted genre tables in
+        procedural_premise.py — milliseconds, no API calls. The result is
+        validated like a generated one and raises ValueError if it doesn't pass.
+        """
+        outline = ProceduralPremiseGenerator(self.state.selected_genre, seed).generate()
+        self._postprocess_outline(outline)
+        errors = list(self._validator().iter_errors(outline))
+        if errors:
+            raise ValueError(f"{len(errors)} schema error(s): {errors[0].message}")
+        self.state.story_outline    = outline
+        self.state.current_location = outline.get("current_location", {})
+        return outline
+
+    # ─── Sectioned generation ──────────────────────────────────────────────
+    SKELETON_SCHEMA = {
+        "type": "object",
+        "required": ["world_name", "world_overview", "locations", "factions", "mysteries", "npcs", "player_name"],
+        "properties": {
+            "world_name": {"type": "string"},
+            "world_overview": {"type": "string"},
+            "locations": {
+                "type": "array", "minItems": 5, "maxItems": 5,
+                "items": {
+                    "type": "object",
+                    "required": ["location_name", "subarea_names"],
+                    "properties": {
+                        "location_name": {"type": "string"},
+                        "subarea_names": {"type": "array", "minItems": 1, "maxItems": 4,
+                                          "items": {"type": "string"}}
+                    }
+                }
+            },
+            "factions": {"type": "array", "minItems": 3, "maxItems": 5, "items": {"type": "string"}},
+            "mysteries": {
+                "type": "array", "minItems": 4, "maxItems": 4,
+                "items": {
+                    "type": "object",
+                    "required": ["id", "summary"],
+                    "properties": {
+                        "id": {"type": "string", "enum": ["m1", "m2", "m3", "m4"]},
+                        "summary": {"type": "string"}
+                    }
+                }
+            },
+            "npcs": {
+                "type": "array", "minItems": 5, "maxItems": 6,
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name", "role"],
+                    "properties": {
+                        "id": {"type": "string", "pattern": "^npc[1-6]$"},
+                        "name": {"type": "string"},
+                        "role": {"type": "string"}
+                    }
+                }
+            },
+            "player_name": {"type": "string"}
+        }
+    }
+
+    # section name → (path in the premise, instructions)
+    SECTIONS = {
+        "key_locations": (["world_data", "key_locations"],
+                          "Write the 5 key_locations using EXACTLY the skeleton's location and subarea names; "
+                          "every subarea gets a multi-sentence, visually specific description."),
+        "factions": (["world_data", "factions"],
+                     "Write one entry per skeleton faction name, each with a multi-sentence description."),
+        "mysteries": (["mysteries"],
+                      "Expand the 4 skeleton mysteries (same ids m1-m4) into `prompt`, `answer` and `twist`."),
+        "npcs": (["npcs"],
+                 "Expand every skeleton NPC (same id, name and role) with a multi-sentence `description`, "
+                 "a `goal` and a 3-5 sentence `visual_description`."),
+        "player_backstory": (["player_backstory"],
+                             "Write the player's backstory for the skeleton's player_name: a ≥4-sentence "
+                             "`origin_story` referencing at least one NPC id and one mystery id, and "
+                             "`starting_traits` of five integers 1-5."),
+        "five_act_plan": (["plot_outline", "five_act_plan"],
+                          "Write EXACTLY 5 acts, each with `act_title`, `inciting_incident`, `tied_mystery` "
+                          "(a skeleton mystery id), `tie_npc` (a skeleton NPC id), `twist` and "
+                          "`scenes_count` (integer 12-35)."),
+    }
+
+    def _function_call(self, name, parameters, user_prompt, max_tokens, temperature=0.8, timeout=120):
+        with api_slot("chat"):
+            resp = self.client.ChatCompletion.create(
+                model="gpt-4-0613",
+                messages=[
+                    {"role": "system", "content": "You are an expert story designer. You MUST return exactly one "
+                                                  f"function call \"{name}\" with JSON that strictly matches its "
+                                                  "schema. Produce no other text."},
+                    {"role": "user", "content": user_prompt}
+                ],
+                functions=[{"name": name, "description": "Return the requested premise fragment.",
+                            "parameters": parameters}],
+                function_call={"name": name},
+                temperature=temperature,
+                max_tokens=max_tokens,
+                request_timeout=timeout
+            )
+        call = resp.choices[0].message.get("function_call")
+        if not call:
+            raise ValueError(f"No function_call returned for {name}")
+        return json.loads(call["arguments"])
+
+    @staticmethod
+    def _time_left(give_up, cap):
+        """Request timeout capped by the deadline; TimeoutError once it has (nearly) passed."""
+        if give_up is None:
+            return cap
+        remaining = give_up - time.monotonic()
+        if remaining <= 1:
+            raise TimeoutError("premise deadline reached")
+        return min(cap, remaining)
+
+    def _generate_section(self, name, skeleton, schema, retries=2, give_up=None):
+        path, instructions = self.SECTIONS[name]
+        parameters = {"type": "object", "required": [name],
+                      "properties": {name: self._subschema(schema, path)}}
+        prompt = (
+            f"We are building an immersive {self.state.selected_genre} world from this skeleton:\n"
+            f"{json.dumps(skeleton, ensure_ascii=False)}\n\n{instructions}"
+        )
+        for attempt in range(1, retries + 1):
+            timeout = self._time_left(give_up, 120)
+            try:
+                return self._function_call(f"write_{name}", parameters, prompt, max_tokens=2000,
+                                           timeout=timeout)[name]
+            except Exception as e:
+                logging.warning(f"[PremiseAgent] Section '{name}' attempt {attempt} failed: {e}")
+                backoff = 2 ** (attempt - 1)
+                if give_up is not None:
+                    backoff = max(0.0, min(backoff, give_up - time.monotonic()))
+                time.sleep(backoff)
+        raise RuntimeError(f"Section '{name}' could not be generated")
+
+    def generate_premise_sectioned(self, on_section=None, fallback=True, repairs=2, deadline=None):
+        """
+        Lower-latency alternative to generate_premise():
+          1) one small call for a skeleton (world name/overview, location, faction,
+             mystery and NPC names/ids, player name),
+          2) every section (locations, factions, mysteries, npcs, backstory, acts)
+             generated concurrently against its own schema fragment,
+          3) assembled, locally fixed, repaired and validated like generate_premise.
+        `on_section(name, data)` is called (from worker threads) as each piece
+        lands — "skeleton" first, so the world overview can be shown early.
+        Falls back to the monolithic generate_premise() if anything fails.
+        `deadline` (seconds, default PREMISE_DEADLINE_SECONDS, 0 = none) covers
+        the skeleton, sections, repairs and that fallback: requests and retries
+        are cut short, and once it has passed the procedural premise is used.
+        """
+        if deadline is None:
+            deadline = float(os.getenv("PREMISE_DEADLINE_SECONDS", "0"))
+        give_up = time.monotonic() + deadline if deadline > 0 else None
+
+        self.state.story_outline = {}
+        exe = None
+        try:
+            validator = self._validator()
+            schema = validator.schema
+
+            skeleton = self._function_call(
+                "generate_premise_skeleton", self.SKELETON_SCHEMA,
+                f"Sketch a richly detailed, immersive {self.state.selected_genre} world: name it, write a "
+                "vivid multi-sentence world_overview, and list the names/ids the full premise will use.",
+                max_tokens=1200, timeout=self._time_left(give_up, 120)
+            )
+            if on_section:
+                on_section("skeleton", skeleton)
+
+            outline = {
+                "world_data": {"world_name": skeleton["world_name"],
+                               "world_overview": skeleton["world_overview"]},
+                "plot_outline": {}
+            }
+            exe = ThreadPoolExecutor(max_workers=len(self.SECTIONS), thread_name_prefix="premise")
+            section = inherit_priority(self._generate_section)
+            futures = {exe.submit(section, name, skeleton, schema, give_up=give_up): name
+                       for name in self.SECTIONS}
+            wait = None if give_up is None else max(0.0, give_up - time.monotonic())
+            for fut in as_completed(futures, timeout=wait):
+                name = futures[fut]
+                data = fut.result()
+                self._set_path(outline, self.SECTIONS[name][0], data)
+                if on_section:
+                    on_section(name, data)
+
+            self._postprocess_outline(outline)
+            errors = self._local_fix(outline, list(validator.iter_errors(outline)))
+            for _ in range(repairs):
+                if not errors:
+                    break
+                outline = self._repair_premise(outline, errors, schema, timeout=self._time_left(give_up, 120))
+                self._postprocess_outline(outline)
+                errors = self._local_fix(outline, list(validator.iter_errors(outline)))
+            if errors:
+                raise ValueError(f"{len(errors)} schema error(s) left after repair")
+
+            self.state.story_outline    = outline
+            self.state.current_location = outline.get("current_location", {})
+            return outline
+        except Exception as e:
+            remaining = None if give_up is None else give_up - time.monotonic()
+            if remaining is not None and remaining <= 1:
+                logging.warning(f"[PremiseAgent] Deadline of {deadline:.0f}s reached during sectioned generation.")
+                return self._fallback_premise(fallback)
+            logging.warning(f"[PremiseAgent] Sectioned generation failed ({e}); using full generation.")
+            return self.generate_premise(fallback=fallback, deadline=remaining or 0)
+        finally:
+            if exe is not None:
+                # late sections are cut short by their own timeouts; don't wait for them
+                exe.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _set_path(obj, path, value):
+        for p in path[:-1]:
+            obj = obj.setdefault(p, {})
+        obj[path[-1]] = value
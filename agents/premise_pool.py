@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from agents.premise_agent import PremiseAgent
+from game.scheduler import BACKGROUND, JobScheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIBRARY_DIR = "premise_library"
+
+
+class PremisePool:
+    """
+    Keeps a few schema-validated custom premises per genre ready on disk so
+    "New game" with a custom premise doesn't wait on a multi-minute generation.
+
+    Premises live in `library_dir/<genre>/<id>.json` with an `index.json` listing
+    them; take() hands one out instantly (and removes it), refill() tops every
+    genre back up to `size` on daemon threads, at most `concurrency` at a time.
+    Only the genre shapes a premise, so artstyle is recorded but not matched.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        library_dir: str = DEFAULT_LIBRARY_DIR,
+        size: int = 2,
+        concurrency: int = 1
+    ):
+        self.api_key = api_key
+        self.library_dir = library_dir
+        self.size = size
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max(1, concurrency))
+        self._inflight: Dict[str, int] = {}
+        self._index = self._load_index()
+
+    @classmethod
+    def shared(cls, api_key: Optional[str] = None) -> "PremisePool":
+        """
+        Process-wide pool configured from PREMISE_POOL_DIR / PREMISE_POOL_SIZE /
+        PREMISE_POOL_CONCURRENCY, so refills outlive individual GameEngines.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    api_key=api_key,
+                    library_dir=os.getenv("PREMISE_POOL_DIR", DEFAULT_LIBRARY_DIR),
+                    size=int(os.getenv("PREMISE_POOL_SIZE", "0")),
+                    concurrency=int(os.getenv("PREMISE_POOL_CONCURRENCY", "1")),
+                )
+            return cls._shared
+
+    @staticmethod
+    def normalize_genre(genre: Optional[str]) -> str:
+        return " ".join((genre or "").lower().split()) or "any"
+
+    @staticmethod
+    def _dir_name(genre: str) -> str:
+        """Genre as a single safe path component (no separators, `..` or drive colons)."""
+        return re.sub(r"[^A-Za-z0-9_-]", "_", genre)
+
+    # ─── Index ─────────────────────────────────────────────────────────────
+    def _index_path(self) -> str:
+        return os.path.join(self.library_dir, "index.json")
+
+    def _load_index(self) -> Dict[str, List[dict]]:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"[PremisePool] Failed to read index: {e}")
+            return {}
+        # drop entries whose file went missing
+        return {
+            g: [e for e in entries if os.path.isfile(os.path.join(self.library_dir, e["file"]))]
+            for g, entries in index.items()
+        }
+
+    def _write_json(self, path: str, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _save_index(self):
+        # caller holds self._lock
+        self._write_json(self._index_path(), self._index)
+
+    # ─── Public API ────────────────────────────────────────────────────────
+    def available(self, genre: Optional[str]) -> int:
+        with self._lock:
+            return len(self._index.get(self.normalize_genre(genre), []))
+
+    def take(self, genre: Optional[str]) -> Optional[dict]:
+        """Pop the oldest stored premise for `genre`, or None if the pool is dry."""
+        key = self.normalize_genre(genre)
+        with self._lock:
+            entries = self._index.get(key, [])
+            while entries:
+                entry = entries.pop(0)
+                self._save_index()
+                path = os.path.join(self.library_dir, entry["file"])
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        premise = json.load(f)
+                    os.remove(path)
+                except Exception as e:
+                    logger.warning(f"[PremisePool] Dropping unreadable premise {entry['file']}: {e}")
+                    continue
+                logger.info(f"[PremisePool] Served premise {entry['id']} for '{key}' "
+                            f"({len(entries)} left)")
+                return premise
+        return None
+
+    def refill(self, genres, artstyle: Optional[str] = None):
+        """Asynchronously top each genre back up to `size` stored premises."""
+        if isinstance(genres, str):
+            genres = [genres]
+        for genre in genres:
+            key = self.normalize_genre(genre)
+            with self._lock:
+                missing = self.size - len(self._index.get(key, [])) - self._inflight.get(key, 0)
+                if missing > 0:
+                    self._inflight[key] = self._inflight.get(key, 0) + missing
+            for _ in range(max(0, missing)):
+                threading.Thread(
+                    target=self._generate_one, args=(key, artstyle),
+                    name=f"premise-pool-{key}", daemon=True
+                ).start()
+
+    def _generate_one(self, genre: str, artstyle: Optional[str]):
+        try:
+            with self._slots, JobScheduler.shared().priority(BACKGROUND):
+                started = time.perf_counter()
+                scratch = SimpleNamespace(selected_genre=genre, story_outline=None)
+                premise = PremiseAgent(api_key=self.api_key, state=scratch).generate_premise(fallback=False)
+                if not premise:
+                    logger.warning(f"[PremisePool] Generation for '{genre}' failed; not pooled.")
+                    return
+                pid = uuid.uuid4().hex[:12]
+                rel = os.path.join(self._dir_name(genre), f"{pid}.json")
+                self._write_json(os.path.join(self.library_dir, rel), premise)
+                with self._lock:
+                    self._index.setdefault(genre, []).append({
+                        "id": pid,
+                        "file": rel,
+                        "genre": genre,
+                        "artstyle": artstyle,
+                        "created": time.time(),
+                    })
+                    self._save_index()
+                logger.info(f"[PremisePool] Stored premise {pid} for '{genre}' "
+                            f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"[PremisePool] Refill for '{genre}' crashed: {e}")
+        finally:
+            with self._lock:
+                self._inflight[genre] = max(0, self._inflight.get(genre, 0) - 1)
@@ -0,0 +1,178 @@
+import io
+import sys
+import time
+import colorsys
+import hashlib
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from agents.image_profiles import render, render_portrait, target_size
+
+SCENE_SIZE = (1792, 1024)      # same as a DALL·E landscape download
+PORTRAIT_SIZE = 512
+
+# Words that pull the palette towards a hue (0-1 on the colour wheel) or darken it.
+HUE_HINTS = {
+    "forest": 0.30, "woods": 0.30, "grove": 0.30, "meadow": 0.25, "garden": 0.28, "swamp": 0.22, "marsh": 0.22,
+    "sea": 0.56, "ocean": 0.56, "harbor": 0.55, "harbour": 0.55, "river": 0.53, "lake": 0.55, "docks": 0.57,
+    "fire": 0.04, "forge": 0.05, "ember": 0.05, "lava": 0.02, "tavern": 0.08, "inn": 0.08, "hearth": 0.07,
+    "desert": 0.11, "sand": 0.11, "dunes": 0.11, "ice": 0.52, "snow": 0.52, "frozen": 0.52,
+    "neon": 0.85, "crypt": 0.75, "tomb": 0.75, "temple": 0.13, "shrine": 0.13, "reactor": 0.45, "station": 0.60,
+}
+DARK_HINTS = ("night", "midnight", "dark", "darkness", "shadow", "shadows", "moonlit", "moonlight", "crypt",
+              "dungeon", "cellar", "cave", "cavern", "tomb", "storm")
+
+
+def _digest(*parts: Optional[str]) -> bytes:
+    return hashlib.sha256("\x1f".join((p or "").strip().lower() for p in parts).encode("utf-8")).digest()
+
+
+def palette(text: str, *parts: Optional[str], n: int = 4) -> List[Tuple[int, int, int]]:
+    """
+    `n` RGB colours derived from a hash of `text` (+ `parts`), nudged towards
+    the hue / darkness its words suggest. Same input, same colours.
+    """
+    d = _digest(text, *parts)
+    words = set((text or "").lower().replace(",", " ").replace(".", " ").split())
+    hints = [HUE_HINTS[w] for w in words if w in HUE_HINTS]
+    hue = sum(hints) / len(hints) if hints else d[0] / 255
+    hue = (hue + (d[1] / 255 - 0.5) * 0.08) % 1.0
+    dark = any(w in words for w in DARK_HINTS)
+    colours = []
+    for i in range(n):
+        h = (hue + (i - n / 2) * 0.05 * (1 + d[2 + i] / 255)) % 1.0
+        s = 0.35 + 0.4 * d[6 + i] / 255
+        v = (0.85 - 0.15 * i) * (0.5 if dark else 1.0) * (0.8 + 0.2 * d[10 + i] / 255)
+        colours.append(tuple(int(c * 255) for c in colorsys.hsv_to_rgb(h, s, v)))
+    return colours
+
+
+def _lerp(a, b, t: np.ndarray) -> np.ndarray:
+    a, b = np.asarray(a, np.float32), np.asarray(b, np.float32)
+    return a + (b - a) * t[..., None]
+
+
+def background(text: str, location: Optional[str] = None, size: Tuple[int, int] = SCENE_SIZE) -> Image.Image:
+    """
+    Stylised landscape: sky gradient, a hashed ridge line, a ground gradient
+    and a vignette — all from the palette of `location` + `text`. Drawn at a
+    quarter of `size` and upscaled: nothing in it has detail to lose.
+    """
+    full = size
+    w, h = max(2, size[0] // 4), max(2, size[1] // 4)
+    d = _digest(location, text)
+    sky_top, sky_low, ridge_c, ground = palette(f"{location or ''} {text}", location)
+    horizon = 0.45 + 0.2 * d[20] / 255
+
+    y = np.linspace(0.0, 1.0, h, dtype=np.float32)
+    rows = np.where(
+        (y < horizon)[:, None],
+        _lerp(sky_top, sky_low, np.clip(y / horizon, 0, 1)),
+        _lerp(ridge_c, ground, np.clip((y - horizon) / (1 - horizon), 0, 1)),
+    )
+    img = np.broadcast_to(rows[:, None, :], (h, w, 3)).copy()
+
+    # ridge silhouette: a few hashed sine waves above the horizon
+    x = np.linspace(0.0, 2 * np.pi, w, dtype=np.float32)
+    ridge = np.zeros(w, np.float32)
+    for k in range(3):
+        ridge += (d[21 + k] / 255) * np.sin(x * (k + 1) * (1 + d[24 + k] / 128) + d[27 + k] / 40) / (k + 1)
+    ridge_y = (horizon - 0.06 - 0.07 * ridge / 1.8) * h
+    mask = np.arange(h, dtype=np.float32)[:, None] > ridge_y[None, :]
+    mask &= (np.arange(h) < horizon * h)[:, None]
+    img[mask] = np.asarray(ridge_c, np.float32) * 0.75
+
+    # vignette
+    vy, vx = np.meshgrid(np.linspace(-1, 1, h, dtype=np.float32), np.linspace(-1, 1, w, dtype=np.float32),
+                         indexing="ij")
+    img *= (1.0 - 0.35 * np.clip(vx ** 2 + vy ** 2, 0, 1.5) / 1.5)[..., None]
+    small = Image.fromarray(np.clip(img, 0, 255).astype(np.uint8), "RGB")
+    return small.resize(full, Image.Resampling.BILINEAR)
+
+
+def _font(px: int):
+    try:
+        return ImageFont.load_default(size=px)
+    except TypeError:          # Pillow < 10.1: fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def portrait(name: str, description: Optional[str] = None, size: int = PORTRAIT_SIZE) -> Image.Image:
+    """Radial-gradient bust silhouette with the character's name across the bottom."""
+    bg_in, bg_out, figure, accent = palette(description or name, name)
+    r = np.hypot(*np.meshgrid(np.linspace(-1, 1, size), np.linspace(-1, 1, size), indexing="ij"))
+    img = Image.fromarray(_lerp(bg_in, bg_out, np.clip(r / 1.4, 0, 1)).astype(np.uint8), "RGB")
+
+    draw = ImageDraw.Draw(img)
+    dark = tuple(int(c * 0.45) for c in figure)
+    s = size
+    draw.ellipse((0.14 * s, 0.62 * s, 0.86 * s, 1.25 * s), fill=dark)           # shoulders
+    draw.ellipse((0.33 * s, 0.2 * s, 0.67 * s, 0.62 * s), fill=dark)             # head
+    draw.rectangle((0, 0.84 * s, s, s), fill=tuple(int(c * 0.3) for c in accent))
+    font = _font(max(10, s // 14))
+    label = name.strip() or "?"
+    box = draw.textbbox((0, 0), label, font=font)
+    draw.text(((s - (box[2] - box[0])) / 2, 0.92 * s - (box[3] - box[1]) / 2 - box[1]), label,
+              fill=(240, 240, 240), font=font)
+    return img
+
+
+class ProceduralImageBackend:
+    """
+    Model-free image provider. Renders in milliseconds, needs no network and
+    always returns the same picture for the same input, so it stands in for
+    DALL·E when a request fails or misses its deadline, and serves every
+    image in offline runs (IMAGE_BACKEND=procedural).
+    """
+
+    def scene_image(
+        self,
+        scene_text: str,
+        location: Optional[str],
+        out_base: str,
+        profile: dict,
+        display_size: Optional[Tuple[int, int]] = None,
+        variant_widths: Tuple[int, ...] = ()
+    ) -> str:
+        # drawn straight at the output size, so the profile never resizes it
+        size = target_size(SCENE_SIZE, profile, display_size)
+        return render(background(scene_text, location, size), out_base, profile, display_size, variant_widths)
+
+    def portrait_image(
+        self,
+        name: str,
+        description: Optional[str],
+        path: str,
+        max_side: int = PORTRAIT_SIZE,
+        variant_sides: Tuple[int, ...] = ()
+    ) -> str:
+        side = max_side or PORTRAIT_SIZE   # 0 = "no limit", but it has to be drawn at some size
+        return render_portrait(portrait(name, description, side), path, side, variant_sides)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time procedural scene/portrait rendering.")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    timings = {}
+    for label, fn in (("background 1792x1024", lambda i: background(f"scene {i}", "Harbor")),
+                      ("portrait 512", lambda i: portrait(f"Npc {i}", "a sailor"))):
+        times = []
+        for i in range(max(1, args.runs)):
+            started = time.perf_counter()
+            img = fn(i)
+            img.save(io.BytesIO(), format="PNG", compress_level=1)
+            times.append(time.perf_counter() - started)
+        times.sort()
+        timings[label] = times[len(times) // 2] * 1000
+    for label, ms in timings.items():
+        print(f"{label:<22} {ms:7.1f} ms (median, incl. PNG encode)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
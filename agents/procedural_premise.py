@@ -0,0 +1,435 @@
+import random
+import time
+import logging
+from typing import Optional
+
+# ─── Template tables ───────────────────────────────────────────────────────
+# Every table entry is (weight, value). Strings may use {placeholders} that are
+# filled from the premise being built (world, location, npc names, ...).
+
+GENRE_TABLES = {
+    "fantasy": {
+        "aliases": ("fantasy", "magic", "medieval", "myth", "fairy", "sword", "dragon"),
+        "world_prefix": [(3, "Aur"), (2, "Vel"), (2, "Eld"), (2, "Thal"), (1, "Myr"), (1, "Bryn")],
+        "world_suffix": [(3, "ion"), (2, "oria"), (2, "mere"), (1, "gard"), (1, "wyn"), (1, "ath")],
+        "overview": [
+            (2, "{world} is an old realm of crumbling keeps and living forests, where the magic that once "
+                "bound its kingdoms together is fading. {faction0} and {faction1} now vie for what remains, "
+                "while rumours spread of a power stirring beneath {location0}."),
+            (1, "For a thousand years {world} has been sheltered by the wards of a vanished order. Now the "
+                "wards flicker, the roads grow dangerous, and every village whispers a different story about "
+                "what waits in {location2}."),
+        ],
+        "location_adj": [(2, "Starfall"), (2, "Thornwood"), (1, "Ashen"), (1, "Silverbrook"), (1, "Gloam"),
+                         (1, "Highmoor"), (1, "Emberfall"), (1, "Mistveil")],
+        "locations": [
+            (2, ("Citadel", ["Outer Gate", "Great Hall", "Archive Tower", "Ramparts"])),
+            (2, ("Forest", ["Old Grove", "Hunter's Camp", "Moonlit Pool", "Overgrown Shrine"])),
+            (2, ("Village", ["Market Square", "Wayfarer's Inn", "Mill Bridge"])),
+            (1, ("Ruins", ["Broken Colonnade", "Sunken Crypt", "Collapsed Observatory"])),
+            (1, ("Harbor", ["Fish Market", "Lighthouse", "Smugglers' Dock"])),
+            (1, ("Mountains", ["Mountain Pass", "Dwarven Hall", "Frozen Summit"])),
+            (1, ("Marsh", ["Stilt Houses", "Drowned Chapel"])),
+        ],
+        "lighting": [(2, "Torchlight flickers across the {surface}"), (2, "Pale moonlight silvers the {surface}"),
+                     (1, "Shafts of dusty sunlight fall across the {surface}"),
+                     (1, "Lantern glow pools on the {surface}")],
+        "surface": [(2, "weathered stone"), (1, "moss-covered flagstones"), (1, "carved oak beams"),
+                    (1, "wet cobblestones"), (1, "tangled roots")],
+        "detail": [(2, "Faded banners hang above iron-bound doors."), (1, "Ivy climbs the cracked walls."),
+                   (1, "Old runes glow faintly in the mortar."), (1, "Woodsmoke drifts between the rafters."),
+                   (1, "Ravens watch from the eaves.")],
+        "factions": [
+            (2, ("The Silver Wardens", "An aging order of knights sworn to guard the realm's wards. Their numbers "
+                                       "dwindle, and their oaths grow harder to keep.")),
+            (2, ("The Ember Covenant", "Mages who believe fading magic can be rekindled by any means. They trade in "
+                                       "forbidden lore and unanswered questions.")),
+            (1, ("The Merchant Concord", "A league of guild houses that controls the roads and harbors. Its loyalty "
+                                         "goes to whoever keeps trade flowing.")),
+            (1, ("The Thornbound", "Forest clans who reject the crown's authority. They know the old paths and "
+                                   "guard them jealously.")),
+            (1, ("The Pale Choir", "A secretive temple whose hymns are said to quiet restless spirits. Few outsiders "
+                                   "have seen its rites.")),
+        ],
+        "first_names": [(1, n) for n in ("Alaric", "Seraphine", "Elarion", "Lyssandra", "Varric", "Isolde",
+                                         "Corwin", "Maelis", "Torren", "Ysolde", "Bram", "Nerys")],
+        "last_names": [(1, n) for n in ("Stormwind", "Ashdown", "Frostheart", "Willowshade", "Blackscale",
+                                        "Thornvale", "Brightwater", "Greymantle")],
+        "player_names": [(1, n) for n in ("Aren Vale", "Kaela Dawnmere", "Rowan Ashby", "Lira Sunfield")],
+        "roles": [
+            (2, ("Wandering Knight", "protect the last of the wards", "a tall figure in dented plate armor with a tattered blue cloak")),
+            (2, ("Court Mage", "uncover the source of the fading magic", "a slender figure in embroidered violet robes, ink-stained fingers and a silver circlet")),
+            (1, ("Innkeeper", "keep the village safe and fed", "a broad-shouldered figure with a flour-dusted apron and a warm, lined face")),
+            (1, ("Thief", "pay off an old and dangerous debt", "a wiry figure in a hooded leather jerkin with quick, watchful eyes")),
+            (1, ("Hermit Seer", "warn the realm before it is too late", "a stooped figure wrapped in moss-green shawls, eyes clouded and bright")),
+            (1, ("Exiled Prince", "reclaim a stolen birthright", "a proud young figure in a faded noble doublet with a signet ring on a cord")),
+        ],
+    },
+    "scifi": {
+        "aliases": ("sci", "space", "cyber", "future", "robot", "star", "galactic", "punk"),
+        "world_prefix": [(2, "Kepler "), (2, "Nova "), (2, "Tau "), (1, "Helix "), (1, "Orbis ")],
+        "world_suffix": [(2, "Prime"), (2, "Station"), (1, "Reach"), (1, "IX"), (1, "Colony")],
+        "overview": [
+            (2, "{world} is a frontier colony held together by failing infrastructure and fragile treaties. "
+                "{faction0} controls the power grid while {faction1} controls the data, and an anomaly detected "
+                "beneath {location0} threatens to upset the balance."),
+            (1, "Three generations after the colony ships landed, {world} runs on rationed air and corporate "
+                "promises. When the long-range array at {location2} went silent, everyone noticed, and no one "
+                "admits to knowing why."),
+        ],
+        "location_adj": [(2, "Helios"), (2, "Kestrel"), (1, "Nadir"), (1, "Vanta"), (1, "Aurora"), (1, "Cobalt")],
+        "locations": [
+            (2, ("Arcology", ["Neon Concourse", "Hydroponics Deck", "Executive Spire", "Maintenance Shafts"])),
+            (2, ("Spaceport", ["Docking Ring", "Customs Hall", "Cargo Bay"])),
+            (1, ("Research Station", ["Clean Lab", "Server Vault", "Observation Dome"])),
+            (1, ("Undercity", ["Night Market", "Flooded Tunnels", "Chop Shop"])),
+            (1, ("Mining Outpost", ["Drill Platform", "Crew Barracks", "Ore Refinery"])),
+            (1, ("Relay Array", ["Antenna Field", "Control Bunker"])),
+        ],
+        "lighting": [(2, "Neon signage hums over the {surface}"), (2, "Harsh white floodlights glare off the {surface}"),
+                     (1, "Emergency strobes pulse red across the {surface}"),
+                     (1, "Holographic displays cast blue light on the {surface}")],
+        "surface": [(2, "brushed steel panels"), (1, "scuffed composite flooring"), (1, "rain-slick grating"),
+                    (1, "tangled cable runs"), (1, "frosted viewport glass")],
+        "detail": [(2, "Ventilation fans thrum somewhere overhead."), (1, "Warning decals peel from the bulkheads."),
+                   (1, "Drones drift past on patrol routes."), (1, "Condensation drips from exposed pipes."),
+                   (1, "Advertisements flicker in a dozen languages.")],
+        "factions": [
+            (2, ("Meridian Dynamics", "The corporation that built the colony and still owns its power grid. Its "
+                                      "executives speak of progress and count every breath.")),
+            (2, ("The Free Signal", "Hackers and pirate broadcasters who leak what the corporations bury. They "
+                                    "are heroes to some and terrorists to others.")),
+            (1, ("Colonial Security Authority", "An overstretched police force that answers to whoever pays it. "
+                                                "Its officers are tired, armed and nervous.")),
+            (1, ("The Dockworkers' Union", "The people who keep cargo moving and ships fueled. When they strike, "
+                                           "the whole colony holds its breath.")),
+            (1, ("The Quiet Circuit", "A cult that believes the colony's AI is waking up. They leave offerings "
+                                      "at server terminals.")),
+        ],
+        "first_names": [(1, n) for n in ("Ilya", "Juno", "Kaito", "Mara", "Dex", "Sable", "Orin", "Vesna",
+                                         "Tamsin", "Rook", "Anika", "Cass")],
+        "last_names": [(1, n) for n in ("Reyes", "Okafor", "Lindqvist", "Varga", "Chen", "Morrow", "Tanaka",
+                                        "Hale")],
+        "player_names": [(1, n) for n in ("Nyx Calder", "Ari Solen", "Jace Orlov", "Remy Kade")],
+        "roles": [
+            (2, ("Station Engineer", "keep the colony's systems alive", "a stocky figure in an oil-stained jumpsuit with a tool harness and augmented goggles")),
+            (2, ("Corporate Fixer", "close the deal before rivals do", "a sharply dressed figure in a charcoal suit with a chrome ocular implant")),
+            (1, ("Smuggler Pilot", "earn enough to buy their ship outright", "a lean figure in a patched flight jacket covered in mission patches")),
+            (1, ("Rogue AI Avatar", "understand what it has become", "a translucent holographic figure flickering with lines of code")),
+            (1, ("Security Captain", "hold the peace one more week", "a tall figure in matte-black tactical armor with a scarred jaw")),
+            (1, ("Xenobiologist", "prove the anomaly is alive", "a wiry figure in a lab coat over a pressure suit, hair tied back with wire")),
+        ],
+    },
+    "mystery": {
+        "aliases": ("mystery", "noir", "detective", "crime", "murder", "thriller", "victorian"),
+        "world_prefix": [(2, "Grey"), (2, "Black"), (1, "Ash"), (1, "Raven")],
+        "world_suffix": [(2, "haven"), (2, "moor"), (1, "ford"), (1, "wick")],
+        "overview": [
+            (2, "{world} is a rain-soaked city of gaslit streets and old money, where everyone keeps a secret and "
+                "some keep several. {faction0} runs the docks, {faction1} runs the courts, and a death at "
+                "{location0} has just made them nervous."),
+            (1, "The fog rarely lifts over {world}. Respectable families, desperate clerks and patient criminals "
+                "share the same narrow streets, and the disappearance near {location2} has set them all whispering."),
+        ],
+        "location_adj": [(2, "Blackwood"), (2, "Harrow"), (1, "St. Alder"), (1, "Whitcombe"), (1, "Kestle")],
+        "locations": [
+            (2, ("Manor", ["Drawing Room", "Locked Study", "Conservatory", "Servants' Stair"])),
+            (2, ("Docks", ["Warehouse Row", "Customs House", "Tide Steps"])),
+            (1, ("Police Precinct", ["Records Room", "Interview Room", "Holding Cells"])),
+            (1, ("Theatre", ["Grand Stage", "Dressing Rooms", "Prop Loft"])),
+            (1, ("Old Quarter", ["Pawnshop", "Night Club", "Back Alley"])),
+            (1, ("Cathedral", ["Nave", "Bell Tower"])),
+        ],
+        "lighting": [(2, "Gaslight flickers over the {surface}"), (2, "Grey rainlight seeps across the {surface}"),
+                     (1, "A single desk lamp throws hard shadows on the {surface}"),
+                     (1, "Streetlamps glow through fog onto the {surface}")],
+        "surface": [(2, "dark mahogany paneling"), (1, "rain-streaked windows"), (1, "worn Persian rugs"),
+                    (1, "soot-stained brick"), (1, "cluttered oak desks")],
+        "detail": [(2, "A clock ticks somewhere out of sight."), (1, "Cigarette smoke hangs in the air."),
+                   (1, "Water drips steadily from a broken gutter."), (1, "Dusty portraits watch from the walls."),
+                   (1, "Papers lie scattered as if searched in a hurry.")],
+        "factions": [
+            (2, ("The Harrow Family", "Old money with a long memory and a longer list of enemies. Their name opens "
+                                      "doors and closes investigations.")),
+            (2, ("The Dockside Syndicate", "Smugglers and fences who run the waterfront. They settle disputes quietly "
+                                           "and permanently.")),
+            (1, ("The City Constabulary", "An underfunded police force split between honest officers and those on the "
+                                          "take. Nobody is sure which is which.")),
+            (1, ("The Gazette", "The city's loudest newspaper, hungry for scandal. Its reporters go where police will not.")),
+            (1, ("The Lantern Society", "A gentlemen's club that claims to study the occult. Its members include judges "
+                                        "and bankers.")),
+        ],
+        "first_names": [(1, n) for n in ("Edith", "Ambrose", "Clara", "Felix", "Violet", "Silas", "Margot",
+                                         "Hugo", "Iris", "Lionel", "Nell", "Jasper")],
+        "last_names": [(1, n) for n in ("Harrow", "Blackwood", "Finch", "Carrow", "Whitlock", "Marsh",
+                                        "Penrose", "Quill")],
+        "player_names": [(1, n) for n in ("Evelyn Shaw", "Thomas Reed", "Grace Holloway", "Leo Marlowe")],
+        "roles": [
+            (2, ("Weary Inspector", "close the case before it is buried", "a rumpled figure in a damp trench coat and battered fedora, stubble and tired eyes")),
+            (2, ("Society Widow", "protect the family's reputation at any cost", "an elegant figure in black lace mourning dress with a pearl choker")),
+            (1, ("Nightclub Singer", "escape the contract that owns them", "a striking figure in a sequined gown with finger-waved hair")),
+            (1, ("Street Informant", "sell the right secret to the right buyer", "a scrawny figure in a patched coat and flat cap, fingers never still")),
+            (1, ("Family Doctor", "hide the truth about a death certificate", "a neat figure in a grey waistcoat with wire spectacles and a leather bag")),
+            (1, ("Crime Reporter", "break the story of the decade", "a restless figure with rolled shirtsleeves, ink-smudged cuffs and a notebook")),
+        ],
+    },
+    "horror": {
+        "aliases": ("horror", "gothic", "ghost", "haunt", "eldritch", "cosmic", "zombie", "vampire"),
+        "world_prefix": [(2, "Hollow"), (2, "Raven"), (1, "Dun"), (1, "Mor")],
+        "world_suffix": [(2, "brook"), (2, "wick"), (1, "fell"), (1, "moor")],
+        "overview": [
+            (2, "{world} is an isolated town where the church bells ring at hours no one sets. {faction0} pretends "
+                "all is well, {faction1} prepares for the worst, and the lights seen at {location0} grow brighter "
+                "every night."),
+            (1, "Nobody moves to {world}; people only leave, or try to. Since the old quarry at {location2} was "
+                "reopened, the livestock will not sleep and the children draw the same shape over and over."),
+        ],
+        "location_adj": [(2, "Blackfen"), (2, "Mourning"), (1, "Hollowell"), (1, "Grimsby"), (1, "Cinder")],
+        "locations": [
+            (2, ("Asylum", ["Admission Hall", "Padded Ward", "Hydrotherapy Room", "Boiler Basement"])),
+            (2, ("Church", ["Nave", "Crypt", "Bell Tower"])),
+            (1, ("Farmstead", ["Barn", "Root Cellar", "Cornfield"])),
+            (1, ("Woods", ["Dead Tree Circle", "Hunter's Cabin"])),
+            (1, ("Quarry", ["Quarry Floor", "Flooded Pit", "Foreman's Hut"])),
+            (1, ("Town Square", ["General Store", "Sheriff's Office", "Well"])),
+        ],
+        "lighting": [(2, "A guttering candle barely lights the {surface}"), (2, "Cold moonlight crawls over the {surface}"),
+                     (1, "A bare bulb swings above the {surface}"),
+                     (1, "Sickly green light seeps across the {surface}")],
+        "surface": [(2, "peeling wallpaper"), (1, "rotting floorboards"), (1, "damp stone walls"),
+                    (1, "rust-stained tiles"), (1, "frost-rimed glass")],
+        "detail": [(2, "Something scratches inside the walls."), (1, "The air smells of wet earth and iron."),
+                   (1, "Old photographs have had their faces scratched out."), (1, "A draft carries faint whispering."),
+                   (1, "Dark stains spread across the ceiling.")],
+        "factions": [
+            (2, ("The Town Council", "Respectable elders who insist nothing is wrong. Their meetings run late and "
+                                     "their minutes are never published.")),
+            (2, ("The Congregation of the Low Bell", "A devout church group that has started holding services at "
+                                                     "midnight. Their hymns have new verses.")),
+            (1, ("The Night Watch", "Volunteers who patrol after dark with lanterns and shotguns. They have started "
+                                    "to lose members.")),
+            (1, ("The Quarry Company", "Outsiders who reopened the old quarry. They pay well and ask no questions.")),
+        ],
+        "first_names": [(1, n) for n in ("Agnes", "Ezra", "Ruth", "Amos", "Delia", "Caleb", "Hester", "Jonah",
+                                         "Maud", "Gideon", "Lottie", "Abel")],
+        "last_names": [(1, n) for n in ("Crane", "Hollis", "Mather", "Greaves", "Pike", "Ashworth", "Vane",
+                                        "Stroud")],
+        "player_names": [(1, n) for n in ("Sam Corrigan", "Mira Hale", "Eli Thorne", "June Ashcroft")],
+        "roles": [
+            (2, ("Troubled Priest", "atone for a failure no one else remembers", "a gaunt figure in a frayed cassock with a tarnished crucifix and hollow eyes")),
+            (2, ("Sheriff", "keep the town from panicking", "a heavyset figure in a sheepskin coat with a tin star and a lantern")),
+            (1, ("Asylum Nurse", "free a patient they once wronged", "a pale figure in a starched white uniform, hands chapped and shaking")),
+            (1, ("Occult Scholar", "finish the ritual's translation", "a thin figure in a moth-eaten tweed suit carrying a cracked leather tome")),
+            (1, ("Quarry Foreman", "finish the dig whatever it costs", "a massive figure in a dust-caked work coat with scarred knuckles")),
+            (1, ("Strange Child", "show someone the shape in the dark", "a small figure in an old-fashioned nightgown clutching a button-eyed doll")),
+        ],
+    },
+}
+
+MYSTERIES = [
+    # (prompt, answer, twist, short hook used by the act templates)
+    (2, ("Who sabotaged {location0} on the night of the storm?",
+         "{npc1}, hoping to hide evidence of an older crime.",
+         "The sabotage was meant to save lives, not take them.",
+         "the sabotage at {location0}")),
+    (2, ("What is {faction0} hiding in the vaults beneath {location1}?",
+         "A record proving the founding of {world} was built on a betrayal.",
+         "The player's own family signed that record.",
+         "the secret beneath {location1}")),
+    (2, ("Why did {npc2} vanish a year ago, and why have they returned?",
+         "They fled after witnessing a murder and came back to expose it.",
+         "The victim is still alive and in hiding.",
+         "{npc2}'s disappearance")),
+    (1, ("Who is sending the anonymous warnings about {location3}?",
+         "{npc0}, who cannot speak openly without endangering their family.",
+         "The warnings are also meant for {npc0}'s own faction.",
+         "the warnings about {location3}")),
+    (1, ("What happened to the expedition that left for {location4}?",
+         "They found what {faction1} was searching for and were silenced.",
+         "One survivor walks among the player's allies.",
+         "the lost expedition")),
+    (1, ("Who forged the seal on the order that started the unrest?",
+         "A clerk working for {faction1}, on instructions no one can trace.",
+         "The instructions came from within {faction0}.",
+         "the forged order")),
+    (1, ("What does the symbol carved across {location2} mean?",
+         "It marks the site of a pact made generations ago.",
+         "The pact is about to come due.",
+         "the symbol at {location2}")),
+]
+
+ACT_STRUCTURES = [
+    (2, [
+        ("Arrival", "The player arrives at {location0} just as {mystery} first comes to light.", "Someone trusted is lying."),
+        ("Rising Stakes", "{npc} asks for help, and the trail leads toward {location}.", "An ally's motives are not what they seemed."),
+        ("Into the Dark", "A confrontation at {location} forces the player to choose a side.", "The obvious culprit is innocent."),
+        ("Revelation", "Evidence about {mystery} surfaces, and {npc} must be confronted.", "The player was part of the plan all along."),
+        ("Reckoning", "Everything converges at {location} for a final choice.", "The truth changes who the player must save."),
+    ]),
+    (1, [
+        ("The Call", "A message from {npc} pulls the player into {mystery}.", "The message was never meant for them."),
+        ("Crossing Over", "Travelling to {location}, the player leaves safety behind.", "The way back is closed."),
+        ("Trials", "{npc} tests the player's loyalty while {mystery} deepens.", "The test was a distraction."),
+        ("The Abyss", "At {location}, the player loses what they relied on most.", "The loss reveals a hidden strength."),
+        ("Return", "The player returns with the answer to {mystery}.", "Home has changed while they were gone."),
+    ]),
+]
+
+TRAITS = ("bravery", "curiosity", "empathy", "communication", "trust")
+
+
+def match_genre(genre: Optional[str]) -> str:
+    g = (genre or "").lower()
+    for key, table in GENRE_TABLES.items():
+        if any(alias in g for alias in table["aliases"]):
+            return key
+    return "fantasy"
+
+
+class ProceduralPremiseGenerator:
+    """
+    Offline, zero-latency premise builder. Composes a schema-valid premise from
+    the weighted template tables above for the closest matching genre; the same
+    (genre, seed) always produces the same world. Used as an instant-start mode
+    and as PremiseAgent's fallback when generation runs out of retries or time.
+    """
+
+    def __init__(self, genre: Optional[str], seed: Optional[int] = None):
+        self.genre = genre
+        self.genre_key = match_genre(genre)
+        self.seed = seed if seed is not None else random.randrange(2 ** 31)
+        self.rng = random.Random(f"{self.genre_key}:{self.seed}")
+        self.tables = GENRE_TABLES[self.genre_key]
+
+    def _pick(self, table):
+        weights, values = zip(*table)
+        return self.rng.choices(values, weights=weights, k=1)[0]
+
+    def _sample(self, table, k):
+        """k distinct values, weighted, without replacement."""
+        pool = list(table)
+        out = []
+        for _ in range(min(k, len(pool))):
+            weights = [w for w, _ in pool]
+            i = self.rng.choices(range(len(pool)), weights=weights, k=1)[0]
+            out.append(pool.pop(i)[1])
+        return out
+
+    def _describe(self, place):
+        light = self._pick(self.tables["lighting"]).format(surface=self._pick(self.tables["surface"]))
+        details = self._sample(self.tables["detail"], 2)
+        return f"{light} of the {place}. " + " ".join(details)
+
+    def generate(self) -> dict:
+        started = time.perf_counter()
+        t = self.tables
+
+        world = (self._pick(t["world_prefix"]) + self._pick(t["world_suffix"])).strip()
+
+        # Locations: distinct kinds, distinct adjectives, 1-4 subareas each
+        kinds = self._sample(t["locations"], 5)
+        while len(kinds) < 5:
+            kinds.append(self._pick(t["locations"]))
+        adjs = self._sample([(w, a) for w, a in t["location_adj"]], 5)
+        while len(adjs) < 5:
+            adjs.append(self._pick(t["location_adj"]))
+        key_locations, used_names = [], set()
+        for (kind, subs), adj in zip(kinds, adjs):
+            loc_name = f"{adj} {kind}"
+            n_subs = self.rng.randint(1, min(4, len(subs)))
+            subareas = []
+            for sub in self.rng.sample(subs, n_subs):
+                name = sub if sub not in used_names else f"{adj} {sub}"
+                used_names.add(name)
+                subareas.append({"name": name, "description": self._describe(name.lower())})
+            key_locations.append({"location_name": loc_name, "subareas": subareas})
+
+        factions = [{"name": n, "description": d}
+                    for n, d in self._sample(t["factions"], self.rng.randint(3, min(5, len(t["factions"]))))]
+
+        # NPCs with distinct names and roles
+        n_npcs = self.rng.randint(5, 6)
+        firsts = self._sample(t["first_names"], n_npcs)
+        lasts = [self._pick(t["last_names"]) for _ in range(n_npcs)]
+        roles = self._sample(t["roles"], len(t["roles"]))
+        npcs = []
+        for i in range(n_npcs):
+            role, goal, look = roles[i % len(roles)]
+            name = f"{firsts[i]} {lasts[i]}"
+            npcs.append({
+                "id": f"npc{i + 1}",
+                "name": name,
+                "role": role,
+                "description": f"{name} is a {role.lower()} known throughout {world}. "
+                               f"Few know what drives them, and fewer still can predict their next move.",
+                "goal": goal[0].upper() + goal[1:] + ".",
+                "visual_description": f"{look[0].upper() + look[1:]}. "
+                                      f"Their posture betrays the weight of their work as a {role.lower()}. "
+                                      f"Painted in soft, consistent lighting.",
+            })
+
+        fill = {
+            "world": world,
+            **{f"location{i}": kl["location_name"] for i, kl in enumerate(key_locations)},
+            **{f"faction{i}": f["name"] for i, f in enumerate(factions)},
+            **{f"npc{i}": n["name"] for i, n in enumerate(npcs)},
+        }
+
+        mysteries, hooks = [], []
+        for i, (p, a, tw, hook) in enumerate(self._sample(MYSTERIES, 4)):
+            mysteries.append({"id": f"m{i + 1}", "prompt": p.format(**fill),
+                              "answer": a.format(**fill), "twist": tw.format(**fill)})
+            hooks.append(hook.format(**fill))
+
+        acts = []
+        for i, (title, inciting, twist) in enumerate(self._pick(ACT_STRUCTURES)):
+            m = min(i, 3)
+            npc = npcs[self.rng.randrange(n_npcs)]
+            loc = key_locations[(i + 1) % 5]["location_name"]
+            acts.append({
+                "act_title": title,
+                "inciting_incident": inciting.format(
+                    location0=key_locations[0]["location_name"], location=loc,
+                    npc=npc["name"], mystery=hooks[m]
+                ),
+                "tied_mystery": mysteries[m]["id"],
+                "tie_npc": npc["id"],
+                "twist": twist,
+                "scenes_count": self.rng.randint(12, 35),
+            })
+
+        player_name = self._pick(t["player_names"])
+        mentor = npcs[self.rng.randrange(n_npcs)]
+        origin = (
+            f"{player_name} grew up on the edges of {world}, never quite belonging to any of its factions. "
+            f"Years ago, {mentor['name']} ({mentor['id']}) took them in and taught them to notice what others miss. "
+            f"When {mentor['name']} began asking questions about {hooks[0]} ({mysteries[0]['id']}), "
+            f"the lessons stopped abruptly. "
+            f"Now {player_name} returns to {key_locations[0]['location_name']} to find out why."
+        )
+
+        kl0 = key_locations[0]
+        premise = {
+            "world_data": {
+                "world_name": world,
+                "world_overview": self._pick(t["overview"]).format(**fill),
+                "key_locations": key_locations,
+                "factions": factions,
+            },
+            "current_location": {
+                "location_name": kl0["location_name"],
+                "subarea_name": kl0["subareas"][0]["name"],
+                "subarea_description": kl0["subareas"][0]["description"],
+            },
+            "mysteries": mysteries,
+            "npcs": npcs,
+            "player_backstory": {
+                "name": player_name,
+                "origin_story": origin,
+                "starting_traits": {trait: self.rng.randint(1, 5) for trait in TRAITS},
+            },
+            "plot_outline": {"five_act_plan": acts},
+        }
+        logging.debug(f"[ProceduralPremise] {self.genre_key}/{self.seed} built in "
+                      f"{(time.perf_counter() - started) * 1000:.2f} ms")
+        return premise
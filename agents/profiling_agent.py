@@ -2,6 +2,11 @@ import openai
 import json
 import logging
 import time
+import os
+import threading
+
+from agents.trait_estimator import TraitEstimator, PLAYER_TRAITS, DEFAULT_MODEL_PATH, record_label
+from game.scheduler import BACKGROUND, INTERACTIVE, JobScheduler, api_slot
 
 class PlayerProfilingAgent:
     CANONICAL = {
@@ -17,6 +22,18 @@ class PlayerProfilingAgent:
         # ensure the state has storage for the last analysis
         if not hasattr(self.state, "last_personality_analysis"):
             self.state.last_personality_analysis = ""
+        # local trait-delta estimator; GPT is only asked when it isn't confident
+        self.estimator = TraitEstimator.load(
+            os.getenv("TRAIT_MODEL_PATH", DEFAULT_MODEL_PATH), "player", PLAYER_TRAITS
+        )
+        self.min_confidence = float(os.getenv("TRAIT_ESTIMATOR_MIN_CONFIDENCE", "0.6"))
+
+        # Deferred personality analysis: analyse every N choices (0 = on demand only)
+        self.analysis_every = int(os.getenv("PERSONALITY_ANALYSIS_EVERY", "1"))
+        # the queued choices themselves live in state.pending_analysis (saved with the game)
+        self._inflight = None
+        self._lock = threading.Lock()
+        self._scheduler = JobScheduler.shared()
 
     def infer_traits_from_choice(self, choice_text, context, retries=2):
         """
@@ -24,7 +41,14 @@ class PlayerProfilingAgent:
         in the range [-0.5, +0.5], one decimal place.
         Keys: bravery, curiosity, empathy, communication, trust.
         Output only the JSON object.
+        The local estimator answers instead when its confidence reaches
+        `min_confidence`; GPT answers are logged as training labels for it.
         """
+        local, confidence = self.estimator.predict(choice_text, context)
+        if confidence >= self.min_confidence:
+            logging.debug(f"[PlayerProfilingAgent] local estimate (conf {confidence}): {local}")
+            return local
+
         prompt = (
             f"Context (scene snippet): {context}\n"
             f"Player choice: \"{choice_text}\"\n\n"
@@ -45,17 +69,18 @@ class PlayerProfilingAgent:
         traits = {}
         for attempt in range(retries):
             try:
-                resp = openai.ChatCompletion.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system",
-                         "content": "You infer small player trait changes and output only valid JSON."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=120,
-                    temperature=0.5,
-                    request_timeout=30
-                )
+                with api_slot("chat"):
+                    resp = openai.ChatCompletion.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system",
+                             "content": "You infer small player trait changes and output only valid JSON."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=120,
+                        temperature=0.5,
+                        request_timeout=30
+                    )
                 raw = resp.choices[0].message.content.strip()
                 try:
                     parsed = json.loads(raw)
@@ -84,6 +109,8 @@ class PlayerProfilingAgent:
             # one decimal place
             clean[key] = round(val, 1)
 
+        if clean:
+            record_label("player", choice_text, context, clean)
         return clean
 
     def infer_personality_analysis(
@@ -110,21 +137,51 @@ class PlayerProfilingAgent:
             "of the player character—highlight how their ongoing choices and trait shifts "
             "refine or evolve the analysis. Output only the analysis."
         )
+        return self._request_analysis(prompt, retries)
 
+    def infer_coalesced_analysis(self, prev_profile, prev_analysis, steps, updated_profile, retries=2):
+        """
+        Same as infer_personality_analysis, but folds several (choice, context) steps
+        made since the last analysis into a single GPT call.
+        """
+        if len(steps) == 1:
+            choice_text, context = steps[0]
+            return self.infer_personality_analysis(
+                prev_profile, prev_analysis, choice_text, context, updated_profile, retries
+            )
+
+        # keep the prompt small: only the tail of each scene matters for the choice
+        lines = [
+            f"{i}. Scene snippet: …{context[-600:]}\n   Player choice: \"{choice_text}\""
+            for i, (choice_text, context) in enumerate(steps, 1)
+        ]
+        prompt = (
+            f"Previous profile: {prev_profile}\n"
+            f"Previous analysis: {prev_analysis}\n"
+            f"Choices made since then, in order:\n" + "\n".join(lines) + "\n"
+            f"Updated profile: {updated_profile}\n\n"
+            "Based on these, provide a concise (under 100 words) personality analysis "
+            "of the player character—highlight how their ongoing choices and trait shifts "
+            "refine or evolve the analysis. Output only the analysis."
+        )
+        return self._request_analysis(prompt, retries)
+
+    def _request_analysis(self, prompt, retries):
         analysis = ""
         for attempt in range(retries):
             try:
-                resp = openai.ChatCompletion.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system",
-                         "content": "You are an expert in character psychology; build on prior analysis."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=150,
-                    temperature=0.7,
-                    request_timeout=30
-                )
+                with api_slot("chat"):
+                    resp = openai.ChatCompletion.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system",
+                             "content": "You are an expert in character psychology; build on prior analysis."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=150,
+                        temperature=0.7,
+                        request_timeout=30
+                    )
                 analysis = resp.choices[0].message.content.strip()
                 break
             except Exception as e:
@@ -133,25 +190,72 @@ class PlayerProfilingAgent:
 
         return analysis
 
-    def update_profile(self, choice_index, choices, context):
+    # ─── Deferred analysis ─────────────────────────────────────────────────
+    def schedule_analysis(self):
+        """
+        Called once the next scene is on screen. Starts a background analysis when
+        `analysis_every` choices have piled up; with analysis_every == 0 ("on demand
+        only") nothing happens until refresh_analysis() is called.
+        """
+        with self._lock:
+            due = self.analysis_every > 0 and len(self.state.pending_analysis) >= self.analysis_every
+        if due:
+            return self.refresh_analysis(priority=BACKGROUND)
+        return None
+
+    def refresh_analysis(self, priority=INTERACTIVE):
+        """
+        Analyse all pending choices now (in the background), e.g. when the profile
+        sidebar opens. Returns a Future resolving to the analysis text, or None if
+        nothing is pending. A request already in flight is reused (and moved up to
+        `priority` if it is still queued).
+        """
+        with self._lock:
+            if self._inflight is not None and not self._inflight.done():
+                self._scheduler.promote(self._inflight, priority)
+                return self._inflight
+            if not self.state.pending_analysis:
+                return None
+            steps, base_profile = self.state.take_pending_analysis()
+            self._inflight = self._scheduler.submit_as(
+                priority, self._run_analysis, steps, base_profile, dict(self.state.player_profile)
+            )
+            return self._inflight
+
+    def has_pending_analysis(self):
+        with self._lock:
+            return bool(self.state.pending_analysis)
+
+    def _run_analysis(self, steps, base_profile, updated_profile):
+        # runs on a scheduler worker: the profile was copied on the caller's thread
+        prev_analysis = self.state.last_personality_analysis or ""
+        analysis = self.infer_coalesced_analysis(base_profile, prev_analysis, steps, updated_profile)
+        # under the state's lock, and persisted by the next save_game() on the
+        # main thread; a failed analysis keeps its choices for the next attempt
+        with self._lock:
+            self.state.finish_analysis(analysis, steps, base_profile)
+        return analysis
+
+    def update_profile(self, choice_index, choices, context, deltas=None):
         """
         After the player makes a choice:
-          1) Infer small float trait deltas.
+          1) Infer small float trait deltas (unless pre-computed `deltas` are given).
           2) Apply them to state.player_profile (clamped 0.0–10.0).
-          3) Generate a short personality analysis.
-        Saves the analysis to state.last_personality_analysis and returns:
+          3) Queue the choice for the deferred personality analysis
+             (see schedule_analysis / refresh_analysis); this never waits on GPT.
+        Returns:
           - 'deltas': {trait: delta, ...}
-          - 'analysis': "<new analysis>"
+          - 'analysis': the latest finished analysis (may predate this choice)
         """
         if choice_index < 0 or choice_index >= len(choices):
             return {"deltas": {}, "analysis": ""}
 
         choice = choices[choice_index]
         prev_profile  = dict(self.state.player_profile)
-        prev_analysis = self.state.last_personality_analysis or ""
 
         # 1) infer float deltas
-        deltas = self.infer_traits_from_choice(choice, context)
+        if deltas is None:
+            deltas = self.infer_traits_from_choice(choice, context)
 
         # 2) apply and clamp to [0.0, 10.0]
         for trait, delta in deltas.items():
@@ -161,18 +265,13 @@ class PlayerProfilingAgent:
             new = round(max(min(new, 10.0), 0.0), 1)
             self.state.player_profile[trait] = new
 
-        updated_profile = dict(self.state.player_profile)
-
-        # 3) personality analysis
-        analysis = self.infer_personality_analysis(
-            prev_profile, prev_analysis, choice, context, updated_profile
-        )
+        # 3) queue for personality analysis
+        with self._lock:
+            self.state.queue_analysis(choice, context, prev_profile)
 
-        # persist
-        self.state.last_personality_analysis = analysis
         try:
             self.state.save_game()
         except Exception:
             pass
 
-        return {"deltas": deltas, "analysis": analysis}
+        return {"deltas": deltas, "analysis": self.state.last_personality_analysis or ""}
@@ -0,0 +1,164 @@
+import os
+import re
+from typing import Iterable, List, Optional
+
+from agents.visual_change import STOPWORDS, strip_dialogue
+
+MAX_PROMPT_CHARS = 450
+
+# Things a background can show. Phrases are only ever built around these, so
+# the prompt never mentions people or actions.
+ENVIRONMENT_NOUNS = frozenset("""
+    hall halls room rooms chamber chambers corridor corridors hallway passage passages stair stairs staircase
+    steps door doors doorway gate gates window windows wall walls floor floors ceiling roof rafters beams
+    pillar pillars column columns arch arches balcony tower towers spire spires turret battlements courtyard
+    throne altar shrine temple chapel crypt tomb tombs vault cellar dungeon cell cells library shelves
+    bookshelves books scrolls desk table tables chair chairs bench benches bed fireplace hearth furnace
+    forge anvil barrel barrels crate crates chest chests carpet rug rugs tapestry tapestries banner banners
+    curtain curtains mirror statue statues fountain well lantern lanterns lamp lamps candle candles
+    chandelier chandeliers torch torches brazier sconce sconces tavern inn bar counter kitchen market stalls shop
+    street streets alley alleys square plaza bridge bridges road roads path paths trail cobblestones
+    village town city rooftops docks dock harbor harbour pier wharf boats boat ship ships sails
+    mast deck river stream lake pond sea ocean shore beach waves cliff cliffs cave caves cavern tunnel
+    tunnels mine mountain mountains hill hills valley canyon ridge peak forest woods trees tree grove
+    clearing meadow field fields garden gardens flowers vines roots moss ferns grass swamp marsh bog
+    desert dunes sand ruins rubble camp campfire tent tents fence walls ramparts station platform
+    console consoles screens screen terminal terminals panels hatch airlock cockpit bridge engine
+    engines reactor corridor lab laboratory machinery pipes cables wires neon signs skyline towers
+    hangar starfield stars sky clouds moon sun horizon
+""".split())
+
+LIGHTING = frozenset("""
+    torchlight torchlit candlelight candlelit firelight firelit moonlight moonlit sunlight sunlit starlight
+    lamplight glow glowing flickering dim dimly shadow shadows shadowy dark darkness gloom gloomy bright
+    golden pale neon twilight dawn dusk sunset sunrise night midnight haze hazy murky shimmering
+""".split())
+
+MOOD = frozenset("""
+    eerie ominous somber sombre quiet silent hushed cozy cosy warm cold chilly tense serene peaceful desolate
+    grim abandoned ancient mysterious foreboding chaotic bustling lonely haunting haunted melancholy
+    festive crumbling ruined derelict pristine opulent lavish cramped vast sterile humid damp
+""".split())
+
+WEATHER = frozenset("""
+    rain storm snow fog mist thunder lightning smoke fire flames
+""".split())
+
+DESCRIPTORS = frozenset("""
+    old new long tall short wide narrow great grand small large huge vast massive tiny high low deep
+    stone wooden wood oak pine iron steel brass bronze copper silver gold marble glass crystal velvet
+    silk leather rusted rusty dusty mossy worn cracked broken faded carved polished ornate grimy muddy
+    wet frozen icy snowy sandy rocky red blue green black white grey gray crimson amber violet scarlet
+    open closed empty crowded overgrown twisted winding spiral arched vaulted stained flickering
+""".split())
+
+_ADJECTIVE_SUFFIXES = ("ed", "en", "ful", "ous", "ic", "al", "ish", "less", "ing", "ive", "ian")
+_SEGMENT = re.compile(r"[.,;:!?\n—()]+")
+_WORD = re.compile(r"[a-z][a-z'-]*")
+
+
+class ScenePromptExtractor:
+    """
+    Builds the environment-only DALL·E prompt locally instead of asking GPT-4:
+
+      1. drop dialogue and character names from the scene
+      2. find scenery nouns (ENVIRONMENT_NOUNS) with up to two descriptive
+         words in front of them ("long oak tables", "faded banners")
+      3. collect lighting / weather / mood words
+      4. add phrases from the subarea's world-map description
+      5. compose one line under 450 characters ending in --ar 16:9
+
+    The artstyle is not included here: ImageAgent prepends it to every prompt.
+    `confidence` (0-1) grows with the scenery found in the scene itself; below
+    IMAGE_PROMPT_MIN_CONFIDENCE, ImageAgent asks the model instead.
+    """
+
+    def __init__(self, min_confidence: Optional[float] = None):
+        if min_confidence is None:
+            min_confidence = float(os.getenv("IMAGE_PROMPT_MIN_CONFIDENCE", "0.5"))
+        self.min_confidence = min_confidence
+
+    @staticmethod
+    def _is_descriptor(word: str) -> bool:
+        if word in DESCRIPTORS or word in LIGHTING or word in MOOD:
+            return True
+        return len(word) > 3 and word.endswith(_ADJECTIVE_SUFFIXES) and not word.endswith("ly")
+
+    def noun_phrases(self, text: Optional[str], names: Iterable[str] = ()) -> List[str]:
+        """Scenery noun phrases in order of appearance, one per noun."""
+        skip = set(STOPWORDS)
+        for name in names:
+            skip.update((name or "").lower().split())
+        phrases, seen = [], set()
+        for segment in _SEGMENT.split(strip_dialogue(text).lower()):
+            words = _WORD.findall(segment)
+            for i, word in enumerate(words):
+                if word not in ENVIRONMENT_NOUNS or word in seen or word in skip:
+                    continue
+                if i + 1 < len(words) and words[i + 1] in ENVIRONMENT_NOUNS:
+                    continue          # modifier of a compound: "harbor docks", "airlock hatch"
+                mods = []
+                for prev in reversed(words[max(0, i - 2):i]):
+                    if prev in skip or not (self._is_descriptor(prev) or prev in ENVIRONMENT_NOUNS):
+                        break
+                    mods.insert(0, prev)
+                seen.add(word)
+                phrases.append(" ".join(mods + [word]))
+        return phrases
+
+    @staticmethod
+    def _atmosphere(text: Optional[str]) -> dict:
+        words = _WORD.findall(strip_dialogue(text).lower())
+        pick = lambda vocab: list(dict.fromkeys(w for w in words if w in vocab))
+        return {
+            "lighting": pick(LIGHTING),
+            "weather": pick(WEATHER),
+            "mood": pick(MOOD),
+        }
+
+    def extract(
+        self,
+        scene_text: str,
+        location: Optional[str] = None,
+        location_description: Optional[str] = None,
+        names: Iterable[str] = ()
+    ) -> dict:
+        """{"prompt", "confidence", "phrases", "atmosphere"} for one scene."""
+        names = list(names)
+        scene = self.noun_phrases(scene_text, names)
+        setting = [p for p in self.noun_phrases(location_description) if p.split()[-1] not in
+                   {s.split()[-1] for s in scene}][:3]
+        atmosphere = self._atmosphere(scene_text)
+        found = sum(len(v) for v in atmosphere.values())
+        confidence = min(1.0, 0.25 * len(scene) + 0.1 * min(found, 3) + 0.1 * min(len(setting), 2))
+
+        head = f"Close-up view of {location}" if location else "Close-up environment view"
+        mood = []
+        if atmosphere["lighting"]:
+            mood.append(f"{', '.join(atmosphere['lighting'][:3])} lighting")
+        if atmosphere["weather"]:
+            mood.append(f"{', '.join(atmosphere['weather'][:2])}")
+        if atmosphere["mood"]:
+            mood.append(f"{', '.join(atmosphere['mood'][:2])} mood")
+        tail = "detailed textures, no people, no text --ar 16:9"
+
+        while True:
+            details = setting + scene
+            parts = [f"{head}: {', '.join(details)}" if details else head]
+            if mood:
+                parts.append("; ".join(mood))
+            parts.append(tail)
+            prompt = ". ".join(parts)
+            if len(prompt) < MAX_PROMPT_CHARS or not details:
+                break
+            # over budget: the subarea description goes first, then the scene's last phrases
+            if setting:
+                setting = setting[:-1]
+            else:
+                scene = scene[:-1]
+        return {
+            "prompt": prompt[:MAX_PROMPT_CHARS - 1],
+            "confidence": round(confidence, 2),
+            "phrases": details,
+            "atmosphere": atmosphere,
+        }
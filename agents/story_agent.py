@@ -3,6 +3,8 @@ import json
 import time
 import re
 
+from game.scheduler import api_slot
+
 # Try to import the new v1+ client class
 try:
     from openai import OpenAI
@@ -176,22 +178,24 @@ class StoryAgent:
                 ]
 
                 if _USE_V0:
-                    resp = self.client.ChatCompletion.create(
-                        model="gpt-4",
-                        messages=messages,
-                        max_tokens=800,
-                        temperature=0.75,
-                        request_timeout=60
-                    )
+                    with api_slot("chat"):
+                        resp = self.client.ChatCompletion.create(
+                            model="gpt-4",
+                            messages=messages,
+                            max_tokens=800,
+                            temperature=0.75,
+                            request_timeout=60
+                        )
                     raw = resp.choices[0].message.content.strip()
                 else:
-                    resp = self.client.chat.completions.create(
-                        model="gpt-4",
-                        messages=messages,
-                        max_tokens=800,
-                        temperature=0.75,
-                        timeout=60
-                    )
+                    with api_slot("chat"):
+                        resp = self.client.chat.completions.create(
+                            model="gpt-4",
+                            messages=messages,
+                            max_tokens=800,
+                            temperature=0.75,
+                            timeout=60
+                        )
                     raw = resp.choices[0].message.content.strip()
 
                 scene, choices = self._parse_output(raw)
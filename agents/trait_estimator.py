@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import random
+import logging
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from game.trait_history import PLAYER_TRAITS, COMPANION_TRAITS
+
+DEFAULT_MODEL_PATH = "trait_model.json"
+DEFAULT_DATA_DIR   = os.path.join(os.path.expanduser("~"), ".visual_novel_engine")
+_LABEL_LOCK = threading.Lock()   # labels arrive from the prescore, profiling and companion threads
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+# Common words carry no signal about the player's temperament.
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "to", "of", "in", "on", "at", "for", "with",
+    "is", "are", "was", "be", "it", "its", "this", "that", "my", "your", "you", "i",
+    "me", "we", "our", "they", "them", "their", "he", "she", "his", "her", "as", "by",
+    "from", "into", "up", "so", "if", "then", "do", "s",
+}
+
+
+def extract_features(choice_text: str, context: str = "") -> Dict[str, float]:
+    """
+    Bag of unigrams + bigrams from the choice (weight 1.0) plus unigrams from the
+    scene context (prefixed "ctx:", weight 0.25).
+    """
+    feats: Dict[str, float] = {}
+    words = [w for w in _WORD_RE.findall(choice_text.lower()) if w not in _STOPWORDS]
+    for w in words:
+        feats[w] = feats.get(w, 0.0) + 1.0
+    for a, b in zip(words, words[1:]):
+        key = f"{a}_{b}"
+        feats[key] = feats.get(key, 0.0) + 1.0
+    for w in set(_WORD_RE.findall((context or "").lower())) - _STOPWORDS:
+        feats[f"ctx:{w}"] = 0.25
+    return feats
+
+
+def _clamp_delta(val: float) -> float:
+    return round(max(min(val, 0.5), -0.5), 1)
+
+
+class TraitEstimator:
+    """
+    Local stand-in for the GPT trait-delta calls. A learned lexicon: every feature
+    carries a per-trait weight fitted from past GPT-labelled choices (shrunk toward
+    zero by `alpha` for rarely seen features), and a prediction is the trait bias
+    plus the feature-weighted mean of the matched weights.
+
+    `predict()` also returns a confidence in [0, 1] built from how much of the
+    choice the lexicon recognises and how often those features were seen, so
+    callers can defer to the model when the estimate is a guess.
+    """
+
+    def __init__(self, traits: Iterable[str], alpha: float = 2.0):
+        self.traits  = tuple(traits)
+        self.alpha   = alpha
+        self.bias    = {t: 0.0 for t in self.traits}
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.support: Dict[str, int] = {}
+        self.n_examples = 0
+
+    # ─── Training ──────────────────────────────────────────────────────────
+    def fit(self, examples: List[Tuple[str, str, Dict[str, float]]]) -> "TraitEstimator":
+        """examples: [(choice_text, context, {trait: delta}), ...]"""
+        self.n_examples = len(examples)
+        self.weights, self.support = {}, {}
+        if not examples:
+            self.bias = {t: 0.0 for t in self.traits}
+            return self
+
+        self.bias = {
+            t: sum(float(d.get(t, 0.0)) for _, _, d in examples) / len(examples)
+            for t in self.traits
+        }
+
+        sums: Dict[str, Dict[str, float]] = {}
+        for choice, context, deltas in examples:
+            for f, x in extract_features(choice, context).items():
+                self.support[f] = self.support.get(f, 0) + 1
+                acc = sums.setdefault(f, {t: 0.0 for t in self.traits})
+                for t in self.traits:
+                    acc[t] += x * (float(deltas.get(t, 0.0)) - self.bias[t])
+
+        for f, acc in sums.items():
+            denom = self.support[f] + self.alpha
+            self.weights[f] = {t: v / denom for t, v in acc.items()}
+        return self
+
+    # ─── Inference ─────────────────────────────────────────────────────────
+    def predict(self, choice_text: str, context: str = "") -> Tuple[Dict[str, float], float]:
+        """
+        Returns ({trait: delta}, confidence). Deltas use the same contract as the
+        GPT path: clamped to [-0.5, +0.5] with one decimal place.
+        """
+        feats = extract_features(choice_text, context)
+        raw = dict(self.bias)
+        total = sum(feats.values()) or 1.0
+        for f, x in feats.items():
+            w = self.weights.get(f)
+            if w:
+                for t in self.traits:
+                    raw[t] += x * w[t] / total
+
+        choice_feats = [f for f in feats if not f.startswith("ctx:")]
+        known = [f for f in choice_feats if f in self.weights]
+        if not choice_feats or not known:
+            confidence = 0.0
+        else:
+            coverage = len(known) / len(choice_feats)
+            seen = sum(self.support[f] for f in known) / len(known)
+            confidence = coverage * seen / (seen + self.alpha)
+
+        return {t: _clamp_delta(raw[t]) for t in self.traits}, round(confidence, 3)
+
+    # ─── Persistence ───────────────────────────────────────────────────────
+    def to_dict(self) -> dict:
+        return {
+            "traits": list(self.traits),
+            "alpha": self.alpha,
+            "n_examples": self.n_examples,
+            "bias": self.bias,
+            "weights": self.weights,
+            "support": self.support,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TraitEstimator":
+        est = cls(data["traits"], alpha=data.get("alpha", 2.0))
+        est.n_examples = data.get("n_examples", 0)
+        est.bias    = {t: float(data.get("bias", {}).get(t, 0.0)) for t in est.traits}
+        est.weights = data.get("weights", {})
+        est.support = data.get("support", {})
+        return est
+
+    @classmethod
+    def load(cls, path: str, kind: str, traits: Iterable[str]) -> "TraitEstimator":
+        """
+        Load the `kind` ("player" / "companion") section of a model file. A missing
+        or unreadable file yields an untrained estimator (confidence always 0).
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_dict(json.load(f)[kind])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"[TraitEstimator] Failed to load {kind} model from {path}: {e}")
+        return cls(traits)
+
+
+def label_log_path() -> str:
+    """TRAIT_LABEL_LOG, else trait_labels.jsonl in the game's data directory (GAME_DATA_DIR)."""
+    data_dir = os.getenv("GAME_DATA_DIR", DEFAULT_DATA_DIR)
+    return os.getenv("TRAIT_LABEL_LOG") or os.path.join(data_dir, "trait_labels.jsonl")
+
+
+def record_label(kind: str, choice_text: str, context: str, deltas: Dict[str, float],
+                 path: Optional[str] = None):
+    """
+    Append one GPT-labelled choice to the JSONL training log. The log holds
+    the player's choices and scene text, so without an explicit `path` it is
+    only written when TRAIT_LABELS=1.
+    """
+    if path is None:
+        if os.getenv("TRAIT_LABELS", "0").lower() not in ("1", "true", "yes"):
+            return
+        path = label_log_path()
+    entry = {"kind": kind, "choice": choice_text, "context": context, "deltas": deltas}
+    try:
+        with _LABEL_LOCK:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except Exception as e:
+        logging.warning(f"[TraitEstimator] Failed to record label: {e}")
+
+
+def load_labels(paths: Iterable[str]) -> Dict[str, List[Tuple[str, str, Dict[str, float]]]]:
+    by_kind: Dict[str, List[Tuple[str, str, Dict[str, float]]]] = {"player": [], "companion": []}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    e = json.loads(line)
+                    by_kind.setdefault(e["kind"], []).append((e["choice"], e.get("context", ""), e["deltas"]))
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    return by_kind
+
+
+def agreement(est: TraitEstimator, examples: List[Tuple[str, str, Dict[str, float]]],
+              min_confidence: float = 0.0) -> dict:
+    """
+    Compare estimator output with the GPT labels: mean absolute error, sign
+    agreement and exact (one-decimal) matches per trait, restricted to the
+    examples the estimator would actually answer at `min_confidence`.
+    """
+    answered = 0
+    abs_err = {t: 0.0 for t in est.traits}
+    sign_ok = {t: 0 for t in est.traits}
+    exact   = {t: 0 for t in est.traits}
+    for choice, context, labels in examples:
+        pred, conf = est.predict(choice, context)
+        if conf < min_confidence:
+            continue
+        answered += 1
+        for t in est.traits:
+            gold = _clamp_delta(float(labels.get(t, 0.0)))
+            abs_err[t] += abs(pred[t] - gold)
+            sign_ok[t] += ((pred[t] > 0) - (pred[t] < 0)) == ((gold > 0) - (gold < 0))
+            exact[t]   += pred[t] == gold
+
+    n = answered or 1
+    return {
+        "examples": len(examples),
+        "answered": answered,
+        "coverage": round(answered / len(examples), 3) if examples else 0.0,
+        "mae":        {t: round(abs_err[t] / n, 3) for t in est.traits},
+        "sign_agree": {t: round(sign_ok[t] / n, 3) for t in est.traits},
+        "exact":      {t: round(exact[t] / n, 3) for t in est.traits},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fit the offline trait-delta estimator from GPT-labelled choice logs "
+                    "and report its agreement with GPT on a held-out split."
+    )
+    parser.add_argument("logs", nargs="*", default=[label_log_path()],
+                        help="JSONL label logs (default: %(default)s)")
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH, help="model file to write")
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction held out for evaluation")
+    parser.add_argument("--min-confidence", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    by_kind = load_labels(args.logs)
+    rng = random.Random(args.seed)
+    model = {}
+    for kind, traits in (("player", PLAYER_TRAITS), ("companion", COMPANION_TRAITS)):
+        examples = list(by_kind.get(kind, []))
+        rng.shuffle(examples)
+        cut = int(len(examples) * (1 - args.holdout))
+        train, test = examples[:cut], examples[cut:]
+
+        report = agreement(TraitEstimator(traits).fit(train), test, args.min_confidence)
+        print(f"[{kind}] train={len(train)} test={len(test)}")
+        print(json.dumps(report, indent=2))
+
+        # Ship a model fitted on everything we have
+        model[kind] = TraitEstimator(traits).fit(examples).to_dict()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(model, f)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import re
+import zlib
+from typing import Iterable, Optional, Set
+
+import numpy as np
+
+# Scene cues that change what the background should look like even when the
+# player hasn't left the subarea.
+VISUAL_CUES = (
+    "dawn", "dusk", "sunrise", "sunset", "night", "midnight", "morning", "evening", "nightfall",
+    "storm", "rain", "snow", "fog", "mist", "thunder", "lightning",
+    "fire", "flames", "smoke", "explosion", "collapse", "collapses", "flood", "blood",
+    "dark", "darkness", "lights", "blackout", "torches",
+)
+
+STOPWORDS = frozenset("""
+    a an the and or but if then so of to in on at by for with from into onto over under up down out off
+    as is are was were be been being it its it's this that these those there here he she they them his her
+    their you your we our i me my not no yes do does did have has had will would can could should may might
+    just very too also still again now then than while when where what who whom which how all any some each
+    one two like around back away through across toward towards before after above below between
+""".split())
+
+_DIALOGUE = re.compile(r'^[^:\n]{1,40}:\s*".*"\s*$', re.MULTILINE)
+_WORD = re.compile(r"[a-z][a-z'-]+")
+
+
+def strip_dialogue(text: Optional[str]) -> str:
+    """The narration only: `Name: "..."` lines removed."""
+    return _DIALOGUE.sub(" ", text or "")
+
+
+def visual_cues(text: Optional[str]) -> Set[str]:
+    words = set(re.findall(r"[a-z]+", (text or "").lower()))
+    return words.intersection(VISUAL_CUES)
+
+
+def major_visual_change(previous_text: Optional[str], text: str) -> bool:
+    """True when `text` introduces a lighting/weather/destruction cue the previous scene lacked."""
+    return bool(visual_cues(text) - visual_cues(previous_text))
+
+
+def present_characters(text: Optional[str], names: Iterable[str]) -> Set[str]:
+    """Names (full or first name) that appear in `text`."""
+    low = (text or "").lower()
+    found = set()
+    for name in names:
+        if not name:
+            continue
+        first = name.split()[0].lower()
+        if re.search(rf"\b{re.escape(name.lower())}\b", low) or (
+            len(first) > 2 and re.search(rf"\b{re.escape(first)}\b", low)
+        ):
+            found.add(name)
+    return found
+
+
+class VisualChangeScorer:
+    """
+    Decides whether a new scene deserves a new background, by comparing it with
+    the last illustrated scene:
+
+      location — 1 if the subarea changed (or the old one is unknown)
+      npcs     — share of characters present now who weren't before
+      env      — 1 − cosine similarity of hashed uni/bi-gram vectors over the
+                 narration's environment words (dialogue, names, stopwords dropped)
+      cues     — 1 if a lighting / weather / destruction cue newly appears in
+                 the narration
+
+    score = Σ weight × component, capped at 1. A new image is requested when
+    score ≥ threshold (IMAGE_CHANGE_THRESHOLD).
+    """
+
+    WEIGHTS = {"location": 1.0, "npcs": 0.25, "env": 0.5, "cues": 0.4}
+
+    def __init__(self, threshold: Optional[float] = None, dims: int = 1024):
+        if threshold is None:
+            threshold = float(os.getenv("IMAGE_CHANGE_THRESHOLD", "0.5"))
+        self.threshold = threshold
+        self.dims = dims
+
+    def environment_words(self, text: Optional[str], names: Iterable[str] = ()) -> list:
+        narration = strip_dialogue(text).lower()
+        skip = set(STOPWORDS)
+        for name in names:
+            skip.update((name or "").lower().split())
+        return [w for w in _WORD.findall(narration) if w not in skip]
+
+    def vectorize(self, words: list) -> np.ndarray:
+        """L2-normalised hashed bag of unigrams + bigrams (crc32, stable across runs)."""
+        vec = np.zeros(self.dims, dtype=np.float32)
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if not grams:
+            return vec
+        idx = np.fromiter((zlib.crc32(g.encode("utf-8")) % self.dims for g in grams),
+                          dtype=np.int64, count=len(grams))
+        np.add.at(vec, idx, 1.0)
+        return vec / np.linalg.norm(vec)
+
+    def score(
+        self,
+        previous_text: Optional[str],
+        text: str,
+        previous_location: Optional[str] = None,
+        location: Optional[str] = None,
+        names: Iterable[str] = ()
+    ) -> dict:
+        """
+        {"score", "new_image", "components": {...}, "inputs": {...}} for the new
+        scene `text` against the last illustrated `previous_text`.
+        """
+        names = list(names)
+        if not previous_text:
+            return {"score": 1.0, "new_image": True, "components": {}, "inputs": {"reason": "no previous image"}}
+
+        before = present_characters(previous_text, names)
+        now = present_characters(text, names)
+        prev_words = self.environment_words(previous_text, names)
+        words = self.environment_words(text, names)
+        prev_vec, vec = self.vectorize(prev_words), self.vectorize(words)
+        similarity = float(prev_vec @ vec) if prev_vec.any() and vec.any() else 0.0
+        # cues from narration only: "before dawn" in dialogue changes nothing on screen
+        new_cues = sorted(visual_cues(" ".join(words)) - visual_cues(" ".join(prev_words)))
+
+        components = {
+            "location": 0.0 if location and location == previous_location else 1.0,
+            "npcs": len(now - before) / len(now) if now else 0.0,
+            "env": round(1.0 - similarity, 3),
+            "cues": 1.0 if new_cues else 0.0,
+        }
+        score = min(1.0, sum(self.WEIGHTS[k] * v for k, v in components.items()))
+        return {
+            "score": round(score, 3),
+            "new_image": score >= self.threshold,
+            "components": components,
+            "inputs": {
+                "previous_location": previous_location,
+                "location": location,
+                "new_characters": sorted(now - before),
+                "new_cues": new_cues,
+            },
+        }
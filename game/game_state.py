@@ -2,7 +2,11 @@
 
 import json
 import os
+import uuid
 import logging
+import threading
+
+from game.trait_history import TraitHistory, HISTORY_FILE
 
 class GameState:
     def __init__(self):
@@ -30,6 +34,13 @@ class GameState:
         self.visited_by_backstory       = []
         self.current_location_name      = None
 
+        # Set-backed indexes over the lists above (rebuilt on load, never saved)
+        self._map_visit_index           = set()
+        self._backstory_index           = set()
+        self._visited_index             = set()
+        self._revealed_index            = set()
+        self._newly_revealed            = []
+
         # ─── Node→pretty-name lookup ────────────────────────────────────────
         self.node_names                 = {}
 
@@ -55,15 +66,66 @@ class GameState:
         self.last_scene_text            = None
         self.last_scene_choices         = []
         self.last_scene_image_url       = None
+        self.last_scene_image_location  = None   # subarea the background was drawn for
+        self.location_images            = {}     # subarea → pre-generated background path
 
         # ─── Personality analysis ──────────────────────────────────────────
         # Added for PlayerProfilingAgent
         self.last_personality_analysis  = ""
+        self.pending_analysis           = []     # [[choice_text, context], ...] not yet analysed
+        self.pending_analysis_base      = None   # player profile before the first pending choice
+
+        # ─── Trait time series (binary sidecar, not part of savegame.json) ──
+        self.trait_history              = TraitHistory()
+
+        # Guards the fields background threads write (image dicts, personality
+        # analysis) while the main thread saves (not persisted)
+        self._worker_lock               = threading.Lock()
 
         # Try to load existing save
         self.load_game()
+        self.build_world_map()
+
+    def set_location_image(self, name: str, path: str):
+        """Record a subarea's background; safe to call from worker threads."""
+        with self._worker_lock:
+            self.location_images = {**self.location_images, name: path}
+
+    def set_character_image(self, name: str, url: str):
+        """Record a character's portrait; safe to call from worker threads."""
+        with self._worker_lock:
+            self.character_image_urls = {**self.character_image_urls, name: url}
+
+    def queue_analysis(self, choice: str, context: str, base_profile: dict):
+        """Queue a choice for the deferred personality analysis (saved with the game)."""
+        with self._worker_lock:
+            if not self.pending_analysis:
+                self.pending_analysis_base = dict(base_profile)
+            self.pending_analysis = self.pending_analysis + [[choice, context]]
+
+    def take_pending_analysis(self):
+        """Hand all queued choices to an analysis: (steps, base profile)."""
+        with self._worker_lock:
+            steps, self.pending_analysis = self.pending_analysis, []
+            base, self.pending_analysis_base = self.pending_analysis_base, None
+        return steps, base
+
+    def finish_analysis(self, analysis: str, steps: list, base_profile):
+        """Store a finished analysis, or put its choices back in front of the queue; safe from worker threads."""
+        with self._worker_lock:
+            if analysis:
+                self.last_personality_analysis = analysis
+            else:
+                self.pending_analysis = list(steps) + self.pending_analysis
+                self.pending_analysis_base = base_profile
 
     def save_game(self):
+        with self._worker_lock:
+            location_images = dict(self.location_images)
+            character_image_urls = dict(self.character_image_urls)
+            analysis = self.last_personality_analysis
+            pending_analysis = list(self.pending_analysis)
+            pending_analysis_base = self.pending_analysis_base
         save_data = {
             # Story state
             "current_story_point":       self.current_story_point,
@@ -108,21 +170,31 @@ class GameState:
             "current_party":             self.current_party,
 
             # Character images
-            "character_image_urls":      self.character_image_urls,
+            "character_image_urls":      character_image_urls,
 
             # Resume support
             "last_scene_text":           self.last_scene_text,
             "last_scene_choices":        self.last_scene_choices,
             "last_scene_image_url":      self.last_scene_image_url,
+            "last_scene_image_location": self.last_scene_image_location,
+            "location_images":           location_images,
 
             # Personality analysis
-            "last_personality_analysis": self.last_personality_analysis,
+            "last_personality_analysis": analysis,
+            "pending_analysis":          pending_analysis,
+            "pending_analysis_base":     pending_analysis_base,
         }
+        # written aside and swapped in, so a failed dump never truncates the save
+        tmp = f"savegame.json.{uuid.uuid4().hex}.tmp"
         try:
-            with open("savegame.json", "w", encoding="utf-8") as f:
+            with open(tmp, "w", encoding="utf-8") as f:
                 json.dump(save_data, f, indent=2)
+            os.replace(tmp, "savegame.json")
         except Exception as e:
             logging.error(f"Failed to save game: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.trait_history.save(HISTORY_FILE)
 
     def load_game(self):
         if not os.path.exists("savegame.json"):
@@ -186,9 +258,16 @@ class GameState:
         self.last_scene_text           = data.get("last_scene_text",       self.last_scene_text)
         self.last_scene_choices        = data.get("last_scene_choices",    self.last_scene_choices)
         self.last_scene_image_url      = data.get("last_scene_image_url",  self.last_scene_image_url)
+        self.last_scene_image_location = data.get("last_scene_image_location", self.last_scene_image_location)
+        self.location_images           = data.get("location_images",       self.location_images)
 
         # ─── Personality analysis
         self.last_personality_analysis = data.get("last_personality_analysis", self.last_personality_analysis)
+        self.pending_analysis          = data.get("pending_analysis",      self.pending_analysis)
+        self.pending_analysis_base     = data.get("pending_analysis_base", self.pending_analysis_base)
+
+        # ─── Trait history sidecar
+        self.trait_history             = TraitHistory.load(HISTORY_FILE)
 
     def clamp_profiles(self, min_val=0, max_val=10):
         for profile in (self.player_profile, self.companion_profile):
@@ -210,12 +289,69 @@ class GameState:
             self.act_snippet_counter = 0
             print(f"[DEBUG] → ADVANCED TO ACT {self.current_act_index+1}/{len(self.acts)}")
 
+    def record_trait_history(self, player_deltas=None, companion_deltas=None):
+        self.trait_history.append(
+            self.turn_counter, self.current_act_index,
+            self.player_profile, self.companion_profile,
+            player_deltas, companion_deltas
+        )
+
     def add_memory(self, key, value=True):
         self.story_memory[key] = value
 
     def record_location(self, location):
-        if location not in self.visited_map_locations:
+        if location not in self._map_visit_index:
+            self._map_visit_index.add(location)
             self.visited_map_locations.append(location)
+            self._mark_visited(location)
+
+    def record_backstory_visit(self, location):
+        if location in self._backstory_index:
+            return False
+        self._backstory_index.add(location)
+        self.visited_by_backstory.append(location)
+        self._mark_visited(location)
+        return True
+
+    def build_world_map(self):
+        """
+        Derive the adjacency dictionary from story_outline["world_data"] when no
+        explicit world_map exists (each region links to its subareas, and the
+        subareas of one region link to each other), then rebuild the
+        visited/revealed indexes against it.
+        """
+        if not self.world_map:
+            wd = (self.story_outline or {}).get("world_data", {})
+            adjacency = {}
+            for loc in wd.get("key_locations", []):
+                region = loc["location_name"]
+                subs = [sub["name"] for sub in loc.get("subareas", [])]
+                adjacency.setdefault(region, [])
+                for sub in subs:
+                    if sub not in adjacency[region]:
+                        adjacency[region].append(sub)
+                    nbrs = adjacency.setdefault(sub, [])
+                    for other in [region] + subs:
+                        if other != sub and other not in nbrs:
+                            nbrs.append(other)
+            self.world_map = adjacency
+        self._rebuild_map_index()
+
+    def _mark_visited(self, location):
+        self._visited_index.add(location)
+        for loc in [location] + list(self.world_map.get(location, [])):
+            if loc not in self._revealed_index:
+                self._revealed_index.add(loc)
+                self._newly_revealed.append(loc)
+
+    def _rebuild_map_index(self):
+        self._map_visit_index = set(self.visited_map_locations)
+        self._backstory_index = set(self.visited_by_backstory)
+        self._visited_index = set()
+        self._revealed_index = set()
+        for loc in self.visited_map_locations + self.visited_by_backstory:
+            self._mark_visited(loc)
+        self._newly_revealed = []
 
     def add_image(self, url: str):
         if not hasattr(self, "images"):
@@ -226,12 +362,25 @@ class GameState:
         pass
 
     def get_revealed_map(self):
-        visited = set(self.visited_map_locations) | set(self.visited_by_backstory)
-        revealed = set(visited)
-        for loc in visited:
-            for nbr in self.world_map.get(loc, []):
-                revealed.add(nbr)
-        return visited, revealed
+        """
+        Returns (visited, revealed) as frozen snapshots of the indexes kept up
+        to date by record_location()/record_backstory_visit().
+        """
+        return frozenset(self._visited_index), frozenset(self._revealed_index)
+
+    def is_visited(self, location):
+        return location in self._visited_index
+
+    def is_revealed(self, location):
+        return location in self._revealed_index
+
+    def pop_newly_revealed(self):
+        """
+        Returns the locations revealed since the previous call (in reveal order)
+        and resets the list, so a map view only redraws what changed.
+        """
+        fresh, self._newly_revealed = self._newly_revealed, []
+        return fresh
 
     def get_current_location_name(self):
         return self.current_location_name
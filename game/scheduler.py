@@ -0,0 +1,353 @@
+# scheduler.py
+
+import os
+import time
+import heapq
+import itertools
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"   # the player is waiting on it (next scene, its image, a speaker's portrait)
+PREFETCH    = "prefetch"      # speculative, probably needed soon (choice scoring, party portraits)
+BACKGROUND  = "background"    # nice to have (pre-generated backgrounds, analysis, premise pool)
+PRIORITY_CLASSES = (INTERACTIVE, PREFETCH, BACKGROUND)
+_RANK = {cls: rank for rank, cls in enumerate(PRIORITY_CLASSES)}
+
+_local = threading.local()
+
+
+def current_priority() -> str:
+    """Class of the work running on this thread; untagged threads (the UI) are interactive."""
+    return getattr(_local, "priority", None) or INTERACTIVE
+
+
+def inherit_priority(fn: Callable) -> Callable:
+    """
+    Wrap `fn` to run as the calling thread's class wherever it ends up running.
+    For work handed to plain threads and pools (task graphs, premise sections,
+    pre-generation), which would otherwise start untagged, i.e. interactive.
+    """
+    priority = current_priority()
+
+    def run(*args, **kwargs):
+        previous = getattr(_local, "priority", None)
+        _local.priority = priority
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.priority = previous
+    return run
+
+
+class TokenBucket:
+    """`rate_per_min` requests per minute with bursts of up to `burst`; rate 0 = unlimited."""
+
+    def __init__(self, rate_per_min: float = 0, burst: Optional[float] = None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = max(1.0, burst if burst is not None else rate_per_min / 6 or 1)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def _fill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 = now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._fill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        if self.rate > 0:
+            self._fill(now)
+            self.tokens -= 1
+
+
+class _Endpoint:
+    def __init__(self, name: str, concurrency: int, rate_per_min: float, burst: Optional[float]):
+        self.name = name
+        self.limit = max(1, concurrency)
+        self.bucket = TokenBucket(rate_per_min, burst)
+        self.in_flight = 0
+        self.waiters = []   # heap of [rank, seq, priority class, preempted flag]
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "priority", "submitted", "started", "preempted")
+
+    def __init__(self, fn, args, kwargs, priority):
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.future = Future()
+        self.priority = priority
+        self.submitted = time.perf_counter()
+        self.started = False
+        self.preempted = False
+
+
+class JobScheduler(Executor):
+    """
+    Engine-wide scheduler for model and image work.
+
+    Jobs (submit / submit_as) carry one of three priority classes and start in
+    class order, FIFO within a class. One worker is held back for interactive
+    work, so speculative jobs can never fill the pool while the player waits.
+    submit() without a class inherits the class of the submitting thread;
+    threads and pools started outside the scheduler keep it only through
+    inherit_priority().
+
+    API calls inside any job or thread go through endpoint() ("chat", "image"),
+    which enforces a per-endpoint concurrency limit and token-bucket rate
+    limit. Waiting callers are served in class order and, again, one slot is
+    kept for interactive callers. Nothing is ever interrupted or paused: a
+    running job or a request already on the wire finishes. Interactive work
+    only overtakes speculative work that hasn't started (or hasn't got its API
+    slot yet); the "preempted" metric counts those overtaken jobs and callers.
+
+    metrics() reports queue depth, wait times and counts per class.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, workers: int = 6, endpoints: Optional[Dict[str, dict]] = None, reserve: int = 1):
+        self.workers = max(1, workers)
+        self.reserve = max(0, min(reserve, self.workers - 1))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sched")
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._queue = []                 # heap of (rank, seq, job)
+        self._jobs: Dict[int, _Job] = {} # id(future) → job not yet started
+        self._running = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._endpoints: Dict[str, _Endpoint] = {}
+        for name, cfg in (endpoints or {}).items():
+            self._endpoints[name] = _Endpoint(name, cfg.get("concurrency", 1), cfg.get("rpm", 0), cfg.get("burst"))
+        self._stats = {cls: {"submitted": 0, "started": 0, "completed": 0, "failed": 0, "cancelled": 0,
+                             "preempted": 0,
+                             "queue_wait_total": 0.0, "queue_wait_max": 0.0,
+                             "slot_waits": 0, "slot_wait_total": 0.0, "slot_wait_max": 0.0}
+                       for cls in PRIORITY_CLASSES}
+        self._shutdown = False
+
+    @classmethod
+    def shared(cls) -> "JobScheduler":
+        """
+        Process-wide scheduler configured from SCHED_WORKERS and
+        SCHED_{CHAT,IMAGE}_{CONCURRENCY,RPM}.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    workers=int(os.getenv("SCHED_WORKERS", "6")),
+                    endpoints={
+                        "chat": {"concurrency": int(os.getenv("SCHED_CHAT_CONCURRENCY", "6")),
+                                 "rpm": float(os.getenv("SCHED_CHAT_RPM", "0"))},
+                        "image": {"concurrency": int(os.getenv("SCHED_IMAGE_CONCURRENCY", "3")),
+                                  "rpm": float(os.getenv("SCHED_IMAGE_RPM", "0"))},
+                    },
+                )
+            return cls._shared
+
+    # ─── Jobs ──────────────────────────────────────────────────────────────
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """Executor-compatible submit; the job takes the submitting thread's class."""
+        return self.submit_as(current_priority(), fn, *args, **kwargs)
+
+    def submit_as(self, priority: str, fn: Callable, /, *args, **kwargs) -> Future:
+        if priority not in _RANK:
+            raise ValueError(f"Unknown priority class '{priority}'")
+        job = _Job(fn, args, kwargs, priority)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new jobs after shutdown")
+            self._stats[priority]["submitted"] += 1
+            if priority == INTERACTIVE:
+                self._mark_preempted(j for _, _, j in self._queue)
+            heapq.heappush(self._queue, (_RANK[priority], next(self._seq), job))
+            self._jobs[id(job.future)] = job
+            self._pump()
+        return job.future
+
+    def promote(self, future: Future, priority: str = INTERACTIVE) -> bool:
+        """Move a queued job up to `priority` (e.g. a prefetch the player now waits on)."""
+        with self._cond:
+            job = self._jobs.get(id(future))
+            if job is None or job.started or _RANK[priority] >= _RANK[job.priority]:
+                return False
+            self._stats[job.priority]["submitted"] -= 1
+            self._stats[priority]["submitted"] += 1
+            job.priority = priority
+            heapq.heappush(self._queue, (_RANK[priority], next(self._seq), job))
+            self._pump()
+            return True
+
+    def _mark_preempted(self, jobs):
+        # caller holds self._cond; bookkeeping only — the heap order already
+        # puts interactive jobs first, nothing is stopped
+        for job in jobs:
+            if job.priority != INTERACTIVE and not job.started and not job.preempted:
+                job.preempted = True
+                self._stats[job.priority]["preempted"] += 1
+
+    def _free_workers(self, priority: str) -> int:
+        busy = sum(self._running.values())
+        return self.workers - busy - (0 if priority == INTERACTIVE else self.reserve)
+
+    def _pump(self):
+        # caller holds self._cond; start queued jobs while workers are free
+        while self._queue:
+            rank, _, job = self._queue[0]
+            if job.started or rank != _RANK[job.priority]:
+                heapq.heappop(self._queue)        # stale entry left by promote()
+                continue
+            if self._free_workers(job.priority) <= 0:
+                return
+            heapq.heappop(self._queue)
+            job.started = True
+            del self._jobs[id(job.future)]
+            stats = self._stats[job.priority]
+            if not job.future.set_running_or_notify_cancel():
+                stats["cancelled"] += 1           # cancelled while queued
+                continue
+            wait = time.perf_counter() - job.submitted
+            stats["started"] += 1
+            stats["queue_wait_total"] += wait
+            stats["queue_wait_max"] = max(stats["queue_wait_max"], wait)
+            self._running[job.priority] += 1
+            self._pool.submit(self._run, job)
+
+    def _run(self, job: _Job):
+        previous = getattr(_local, "priority", None)
+        _local.priority = job.priority
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except BaseException as e:
+            job.future.set_exception(e)
+            outcome = "failed"
+        else:
+            job.future.set_result(result)
+            outcome = "completed"
+        finally:
+            _local.priority = previous
+        with self._cond:
+            self._running[job.priority] -= 1
+            self._stats[job.priority][outcome] += 1
+            self._pump()
+
+    @contextmanager
+    def priority(self, priority: str):
+        """Run the enclosed code (API calls, submits) as `priority` on this thread."""
+        if priority not in _RANK:
+            raise ValueError(f"Unknown priority class '{priority}'")
+        previous = getattr(_local, "priority", None)
+        _local.priority = priority
+        try:
+            yield
+        finally:
+            _local.priority = previous
+
+    # ─── Endpoints ─────────────────────────────────────────────────────────
+    @contextmanager
+    def endpoint(self, name: str):
+        """Hold one `name` API slot (concurrency + rate token) for the enclosed call."""
+        ep = self._endpoints.get(name)
+        if ep is None:
+            yield
+            return
+        priority = current_priority()
+        rank = _RANK[priority]
+        started = time.perf_counter()
+        with self._cond:
+            entry = [rank, next(self._seq), priority, False]
+            if priority == INTERACTIVE:
+                for waiter in ep.waiters:
+                    if waiter[2] != INTERACTIVE and not waiter[3]:
+                        waiter[3] = True
+                        self._stats[waiter[2]]["preempted"] += 1
+            heapq.heappush(ep.waiters, entry)
+            while True:
+                timeout = None
+                if ep.waiters[0] is entry:
+                    reserve = 0 if priority == INTERACTIVE or ep.limit == 1 else 1
+                    if ep.in_flight < ep.limit - reserve:
+                        timeout = ep.bucket.delay(time.monotonic())
+                        if timeout <= 0:
+                            break
+                self._cond.wait(timeout)
+            heapq.heappop(ep.waiters)
+            ep.in_flight += 1
+            ep.bucket.take(time.monotonic())
+            wait = time.perf_counter() - started
+            stats = self._stats[priority]
+            stats["slot_waits"] += 1
+            stats["slot_wait_total"] += wait
+            stats["slot_wait_max"] = max(stats["slot_wait_max"], wait)
+            self._cond.notify_all()               # the next waiter may fit as well
+        if wait > 1:
+            logger.debug(f"[JobScheduler] {priority} {name} call waited {wait:.2f}s for a slot")
+        try:
+            yield
+        finally:
+            with self._cond:
+                ep.in_flight -= 1
+                self._cond.notify_all()
+
+    # ─── Metrics / lifecycle ───────────────────────────────────────────────
+    def metrics(self) -> dict:
+        """
+        {"classes": {class: {"queued", "running", "waiting_for_slot", "submitted",
+        "completed", "failed", "cancelled", "preempted", "avg_queue_wait", "max_queue_wait",
+        "avg_slot_wait", "max_slot_wait"}}, "endpoints": {name: {"in_flight",
+        "limit", "waiting", "rpm"}}}; waits in seconds.
+        """
+        with self._cond:
+            queued = {cls: 0 for cls in PRIORITY_CLASSES}
+            for job in self._jobs.values():
+                if not job.future.cancelled():
+                    queued[job.priority] += 1
+            waiting = {cls: 0 for cls in PRIORITY_CLASSES}
+            for ep in self._endpoints.values():
+                for waiter in ep.waiters:
+                    waiting[waiter[2]] += 1
+            classes = {}
+            for cls, s in self._stats.items():
+                started = s["started"]
+                classes[cls] = {
+                    "queued": queued[cls],
+                    "running": self._running[cls],
+                    "waiting_for_slot": waiting[cls],
+                    "submitted": s["submitted"],
+                    "completed": s["completed"],
+                    "failed": s["failed"],
+                    "cancelled": s["cancelled"],
+                    "preempted": s["preempted"],
+                    "avg_queue_wait": round(s["queue_wait_total"] / started, 3) if started else 0.0,
+                    "max_queue_wait": round(s["queue_wait_max"], 3),
+                    "avg_slot_wait": round(s["slot_wait_total"] / s["slot_waits"], 3) if s["slot_waits"] else 0.0,
+                    "max_slot_wait": round(s["slot_wait_max"], 3),
+                }
+            endpoints = {
+                name: {"in_flight": ep.in_flight, "limit": ep.limit, "waiting": len(ep.waiters),
+                       "rpm": round(ep.bucket.rate * 60, 1)}
+                for name, ep in self._endpoints.items()
+            }
+        return {"classes": classes, "endpoints": endpoints}
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for job in self._jobs.values():
+                    job.future.cancel()
+        self._pool.shutdown(wait=wait)
+
+
+def api_slot(endpoint: str):
+    """`with api_slot("chat"): openai.ChatCompletion.create(...)` — see JobScheduler.endpoint."""
+    return JobScheduler.shared().endpoint(endpoint)
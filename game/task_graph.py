@@ -0,0 +1,141 @@
+# task_graph.py
+
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from game.scheduler import inherit_priority
+
+
+class TaskGraph:
+    """
+    Tiny dependency-graph runner. Each task is submitted to a thread pool the
+    moment all of its dependencies have succeeded and is called with their
+    results as positional arguments (in `deps` order). Tasks may be added while
+    the graph is already running; a task whose dependency failed fails too.
+
+    `on_event` receives {"task", "status", "done", "total", "elapsed"} dicts
+    ("started" / "done" / "failed") from worker threads, so a UI should only
+    record them and render from its own thread. Tasks run as the scheduler
+    priority class of the thread that added them.
+    """
+
+    def __init__(self, max_workers: int = 8, on_event: Optional[Callable[[dict], None]] = None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="setup")
+        self._on_event = on_event
+        self._lock     = threading.Lock()
+        self._tasks: Dict[str, dict] = {}
+        self._waiting: Dict[str, List[str]] = {}   # dep name → tasks blocked on it
+
+    # ─── Building ──────────────────────────────────────────────────────────
+    def add(self, name: str, fn: Callable, deps: Iterable[str] = ()) -> Future:
+        deps = list(deps)
+        with self._lock:
+            if name in self._tasks:
+                raise ValueError(f"Task '{name}' already exists")
+            missing = [d for d in deps if d not in self._tasks]
+            if missing:
+                raise ValueError(f"Task '{name}' depends on unknown task(s): {missing}")
+            task = {"fn": inherit_priority(fn), "deps": deps, "future": Future(), "started": None}
+            self._tasks[name] = task
+            pending = [d for d in deps if not self._tasks[d]["future"].done()]
+            for d in pending:
+                self._waiting.setdefault(d, []).append(name)
+        if not pending:
+            self._maybe_start(name)
+        return task["future"]
+
+    def _maybe_start(self, name: str):
+        with self._lock:
+            task = self._tasks[name]
+            if task["started"] is not None:
+                return
+            dep_futures = [self._tasks[d]["future"] for d in task["deps"]]
+            if not all(f.done() for f in dep_futures):
+                return
+            task["started"] = time.perf_counter()
+
+        failed = [d for d, f in zip(task["deps"], dep_futures) if f.exception() is not None]
+        if failed:
+            self._finish(name, error=RuntimeError(f"dependency failed: {', '.join(failed)}"))
+            return
+
+        args = [f.result() for f in dep_futures]
+        self._emit(name, "started")
+        self._executor.submit(self._run, name, task["fn"], args)
+
+    def _run(self, name: str, fn: Callable, args: list):
+        try:
+            result = fn(*args)
+        except Exception as e:
+            logging.exception(f"[TaskGraph] Task '{name}' failed")
+            self._finish(name, error=e)
+        else:
+            self._finish(name, result=result)
+
+    def _finish(self, name: str, result=None, error: Optional[BaseException] = None):
+        task = self._tasks[name]
+        if error is not None:
+            task["future"].set_exception(error)
+        else:
+            task["future"].set_result(result)
+        self._emit(name, "failed" if error is not None else "done")
+
+        with self._lock:
+            dependents = self._waiting.pop(name, [])
+        for dep in dependents:
+            self._maybe_start(dep)
+
+    def _emit(self, name: str, status: str):
+        if not self._on_event:
+            return
+        prog = self.progress()
+        started = self._tasks[name]["started"]
+        event = {
+            "task": name,
+            "status": status,
+            "done": prog["done"],
+            "total": prog["total"],
+            "elapsed": round(time.perf_counter() - started, 3) if started else 0.0,
+        }
+        try:
+            self._on_event(event)
+        except Exception:
+            logging.exception("[TaskGraph] on_event callback failed")
+
+    # ─── Querying ──────────────────────────────────────────────────────────
+    def result(self, name: str, timeout: Optional[float] = None):
+        """Block until `name` finishes; re-raises its exception."""
+        return self._tasks[name]["future"].result(timeout=timeout)
+
+    def wait(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None):
+        """Block until the given tasks (default: all) finish. Failures are not raised."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in list(names if names is not None else self._tasks):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                self._tasks[name]["future"].exception(timeout=remaining)
+            except Exception:
+                pass
+
+    def done(self, names: Optional[Iterable[str]] = None) -> bool:
+        with self._lock:
+            names = list(names if names is not None else self._tasks)
+            return all(self._tasks[n]["future"].done() for n in names)
+
+    def progress(self) -> dict:
+        with self._lock:
+            futures = {n: t["future"] for n, t in self._tasks.items()}
+            started = {n for n, t in self._tasks.items() if t["started"] is not None}
+        finished = {n for n, f in futures.items() if f.done()}
+        return {
+            "done": len(finished),
+            "total": len(futures),
+            "running": sorted(started - finished),
+            "failed": sorted(n for n in finished if futures[n].exception() is not None),
+        }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,202 @@
+# trait_history.py
+
+import os
+import uuid
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PLAYER_TRAITS    = ("bravery", "curiosity", "empathy", "communication", "trust")
+COMPANION_TRAITS = ("trust", "fear", "affection")
+
+# One fixed column per trait; companion columns are prefixed so "trust" exists twice.
+COLUMNS = PLAYER_TRAITS + tuple(f"companion_{t}" for t in COMPANION_TRAITS)
+
+HISTORY_FILE = "trait_history.npz"
+
+
+class TraitHistory:
+    """
+    Per-session trait time series: one row per committed choice, one float32
+    column per trait (see COLUMNS), holding both the profile value after the
+    choice and the delta that produced it. Rows are appended into pre-allocated
+    arrays and persisted as a small .npz sidecar next to savegame.json, so charts
+    and cross-session analytics never have to parse full saves.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._n      = 0
+        self.turns   = np.zeros(capacity, dtype=np.int32)
+        self.acts    = np.zeros(capacity, dtype=np.int16)
+        self._values = np.zeros((capacity, len(COLUMNS)), dtype=np.float32)
+        self._deltas = np.zeros((capacity, len(COLUMNS)), dtype=np.float32)
+
+    def __len__(self):
+        return self._n
+
+    # ─── Recording ─────────────────────────────────────────────────────────
+    def append(
+        self,
+        turn: int,
+        act: int,
+        player_profile: Dict[str, float],
+        companion_profile: Dict[str, float],
+        player_deltas: Optional[Dict[str, float]] = None,
+        companion_deltas: Optional[Dict[str, float]] = None
+    ):
+        if self._n == len(self.turns):
+            self._grow()
+        i = self._n
+        self.turns[i] = turn
+        self.acts[i] = act
+        self._values[i] = self._row(player_profile, companion_profile)
+        self._deltas[i] = self._row(player_deltas or {}, companion_deltas or {})
+        self._n += 1
+
+    @staticmethod
+    def _row(player: Dict[str, float], companion: Dict[str, float]):
+        return [float(player.get(t, 0.0)) for t in PLAYER_TRAITS] + \
+               [float(companion.get(t, 0.0)) for t in COMPANION_TRAITS]
+
+    def _grow(self):
+        cap = max(1, len(self.turns)) * 2
+        self.turns   = np.resize(self.turns, cap)
+        self.acts    = np.resize(self.acts, cap)
+        self._values = np.resize(self._values, (cap, len(COLUMNS)))
+        self._deltas = np.resize(self._deltas, (cap, len(COLUMNS)))
+
+    # ─── Views ─────────────────────────────────────────────────────────────
+    @property
+    def values(self) -> np.ndarray:
+        """(turns × COLUMNS) profile values after each choice."""
+        return self._values[:self._n]
+
+    @property
+    def deltas(self) -> np.ndarray:
+        """(turns × COLUMNS) deltas applied at each choice."""
+        return self._deltas[:self._n]
+
+    @staticmethod
+    def column(trait: str) -> int:
+        return COLUMNS.index(trait)
+
+    # ─── Queries ───────────────────────────────────────────────────────────
+    def rolling_average(self, window: int = 5, trait: Optional[str] = None) -> np.ndarray:
+        """
+        Trailing mean of the profile values over `window` choices (shorter at the
+        start). Returns (turns × COLUMNS), or a 1-D series for a single `trait`.
+        """
+        vals = self.values.astype(np.float64)
+        if trait is not None:
+            vals = vals[:, [self.column(trait)]]
+        if not len(vals):
+            out = vals
+        else:
+            csum = np.cumsum(vals, axis=0)
+            lagged = np.vstack([np.zeros((window, vals.shape[1])), csum])[:len(vals)]
+            counts = np.minimum(np.arange(1, len(vals) + 1), window)[:, None]
+            out = (csum - lagged) / counts
+        return out[:, 0] if trait is not None else out
+
+    def act_summary(self) -> Dict[int, Dict[str, Dict[str, float]]]:
+        """
+        {act_index: {column: {"mean", "min", "max", "net_change"}}} over the
+        choices made in each act.
+        """
+        summary = {}
+        acts = self.acts[:self._n]
+        for act in np.unique(acts):
+            mask = acts == act
+            vals = self.values[mask]
+            net = self.deltas[mask].sum(axis=0)
+            means, mins, maxs = vals.mean(axis=0), vals.min(axis=0), vals.max(axis=0)
+            summary[int(act)] = {
+                col: {
+                    "mean": round(float(means[j]), 2),
+                    "min": round(float(mins[j]), 1),
+                    "max": round(float(maxs[j]), 1),
+                    "net_change": round(float(net[j]), 1),
+                }
+                for j, col in enumerate(COLUMNS)
+            }
+        return summary
+
+    def largest_swings(self, k: int = 5) -> List[Dict]:
+        """The k single-choice deltas with the largest magnitude, biggest first."""
+        d = self.deltas
+        if not d.size:
+            return []
+        flat = np.abs(d).ravel()
+        k = min(k, int(np.count_nonzero(flat)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-flat, k - 1)[:k]
+        top = top[np.argsort(-flat[top], kind="stable")]
+        rows, cols = np.unravel_index(top, d.shape)
+        return [
+            {
+                "turn": int(self.turns[r]),
+                "act": int(self.acts[r]),
+                "trait": COLUMNS[c],
+                "delta": round(float(d[r, c]), 1),
+            }
+            for r, c in zip(rows, cols)
+        ]
+
+    # ─── Persistence ───────────────────────────────────────────────────────
+    def save(self, path: str = HISTORY_FILE):
+        # written aside and swapped in, so a failed write never truncates the sidecar
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    columns=np.array(COLUMNS),
+                    turns=self.turns[:self._n],
+                    acts=self.acts[:self._n],
+                    values=self.values,
+                    deltas=self.deltas,
+                )
+            os.replace(tmp, path)
+        except Exception as e:
+            logging.error(f"Failed to save trait history: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    @classmethod
+    def load(cls, path: str = HISTORY_FILE) -> "TraitHistory":
+        hist = cls()
+        if not os.path.exists(path):
+            return hist
+        try:
+            with np.load(path) as data:
+                if tuple(data["columns"]) != COLUMNS:
+                    raise ValueError("column layout mismatch")
+                n = len(data["turns"])
+                hist = cls(capacity=max(64, n))
+                hist.turns[:n] = data["turns"]
+                hist.acts[:n] = data["acts"]
+                hist._values[:n] = data["values"]
+                hist._deltas[:n] = data["deltas"]
+                hist._n = n
+        except Exception as e:
+            logging.error(f"Failed to load trait history: {e}")
+        return hist
+
+
+def load_archived_histories(archive_root: str = "archive") -> Dict[str, TraitHistory]:
+    """
+    Cross-session analytics: {save folder name: TraitHistory} for every archived
+    run that has a trait-history sidecar, without touching its savegame.json.
+    """
+    histories = {}
+    if not os.path.isdir(archive_root):
+        return histories
+    for d in sorted(os.listdir(archive_root)):
+        path = os.path.join(archive_root, d, "story", HISTORY_FILE)
+        if os.path.isfile(path):
+            histories[d] = TraitHistory.load(path)
+    return histories
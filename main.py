@@ -1,20 +1,31 @@
 #!/usr/bin/env python3
 import os
 import logging
+import time
+import threading
 import shutil
 from dotenv import load_dotenv
 
 from game.game_state import GameState
+from game.task_graph import TaskGraph
+from game.scheduler import BACKGROUND, INTERACTIVE, PREFETCH, JobScheduler, inherit_priority
 from agents.premise_agent import PremiseAgent
+from agents.premise_pool import PremisePool
 from agents.story_agent import StoryAgent
 from agents.branching_agent import BranchingAgent
 from agents.profiling_agent import PlayerProfilingAgent
 from agents.companion_agent import CompanionAgent
 from agents.companion_generator import CompanionGenerator
+from agents.asset_manifest import AssetManifest
 from agents.image_agent import ImageAgent
+from agents.image_cache import ImageCache, premise_id
+from agents.visual_change import VisualChangeScorer
 from agents.character_image_agent import CharacterImageAgent
+from agents.portrait_cache import reuse_for_premise
+from agents.choice_scoring_agent import ChoiceScoringAgent
+from agents.trait_estimator import record_label
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import Optional, Dict
 
 
@@ -24,9 +35,12 @@ class GameEngine:
       - has_save(): bool
       - resume_game(): loads existing state (no prompts)
       - start_new_game(genre, artstyle, premise_choice=None): steps through premise + returns companion list
-      - select_companion(index, companion_list): records choice + generates portraits (parallel) + sets up agents
+      - select_companion(index, companion_list): records choice + waits for the setup graph (portraits)
+      - request_portrait(speaker): Future for an NPC portrait, generated on first appearance
+      - get_setup_progress() / setup_done() / finish_setup(): new-game setup progress for the loading page
       - get_current_text() / get_current_choices() / make_choice(...) /
         get_current_image_path()
+      - on_scene_shown() / refresh_personality_analysis(): deferred background work
     """
 
     def __init__(self):
@@ -48,16 +62,64 @@ class GameEngine:
         self._profiling_agent = None
         self._companion_agent = None
         self._image_agent = None
+        self._choice_scoring_agent = None
 
         # Track last choice & last‐drawn image text
         self._last_choice = None
         self._first_turn = True
         self._last_image_text = None
 
+        # New-game setup graph (premise → companions / portraits / backstory)
+        self._setup = None
+        self._setup_last_event = None
+        self._premise_preview = None
+        self._premise_sectioned = os.getenv("PREMISE_SECTIONED", "0").lower() in ("1", "true", "yes")
+        self._char_image_agent = None
+        # NPC portraits: generated when the NPC joins the party, ties the current
+        # act or first speaks (NPC_PORTRAITS=eager renders them all during setup)
+        self._npc_portraits_eager = os.getenv("NPC_PORTRAITS", "lazy").lower() == "eager"
+        self._npc_portraits: Dict[str, Future] = {}
+        self._npc_portraits_lock = threading.Lock()
+        # Window/display size in device pixels; scene images are sized for it
+        self._display_size = None
+
+        # Pre-generated custom premises (PREMISE_POOL_SIZE > 0 enables it)
+        self._premise_pool = PremisePool.shared(self.API_KEY)
+        warm = [g for g in os.getenv("PREMISE_POOL_GENRES", "").split(",") if g.strip()]
+        if warm:
+            self._premise_pool.refill(warm)
+
+        # Background work that must not block the UI: one engine-wide scheduler
+        # (interactive > prefetch > background, per-endpoint API limits)
+        self._executor = JobScheduler.shared()
+
+        # Choice pre-scoring: (scene_text, Future[{choice_text: scores}])
+        self._prescore_enabled = os.getenv("PRESCORE_CHOICES", "0").lower() in ("1", "true", "yes")
+        self._prescore_wait = float(os.getenv("PRESCORE_WAIT_SECONDS", "0.3"))
+        self._prescore = None
+        # Scene image being generated: (scene_text, location, Future[path],
+        # illustrated_text); post-processing runs on the shared image process pool
+        self._scene_image = None
+        # Scene text the current background was actually drawn (or picked) for;
+        # reused backgrounds keep comparing against it
+        self._illustrated_text = None
+        self._change_scorer = VisualChangeScorer()
+        # Backgrounds shared across sessions of a premise (IMAGE_CACHE_MB=0 disables)
+        self._image_cache = ImageCache.shared() if float(os.getenv("IMAGE_CACHE_MB", "512")) > 0 else None
+        self._asset_manifest = AssetManifest.for_directory("generated_images")
+        # Eager background pre-generation for every subarea of the premise
+        self._pregen_enabled = os.getenv("PREGENERATE_BACKGROUNDS", "0").lower() in ("1", "true", "yes")
+        self._pregen_workers = int(os.getenv("PREGEN_CONCURRENCY", "2"))
+        self._pregen_batch   = int(os.getenv("PREGEN_PROMPT_BATCH", "4"))
+        self._pregen_executor = None
+        # seconds a scene image may take before a procedural stand-in is used (0 = wait)
+        self._image_deadline = float(os.getenv("IMAGE_DEADLINE_SECONDS", "0"))
+
     def _archive_old_data(self):
         portrait_dir = "character_portraits"
         generated_dir = "generated_images"
         save_file = "savegame.json"
+        history_file = "trait_history.npz"
         log_file = "game.log"
         archive_root = "archive"
 
@@ -98,6 +160,8 @@ class GameEngine:
                 shutil.move(os.path.join(generated_dir, fname), os.path.join(gen_arch, fname))
         if has_save:
             shutil.move(save_file, os.path.join(story_arch, save_file))
+        if os.path.isfile(history_file):
+            shutil.move(history_file, os.path.join(story_arch, history_file))
         if has_log:
             shutil.move(log_file, os.path.join(story_arch, log_file))
 
@@ -146,16 +210,21 @@ class GameEngine:
         if not hasattr(self.state, "last_scene_image_url"):
             self.state.last_scene_image_url = None
 
+        self._char_image_agent = CharacterImageAgent(
+            api_key=self.API_KEY,
+            debug=True,
+            genre=self.state.selected_genre,
+            artstyle=self.state.global_artstyle,
+            reuse_cached=reuse_for_premise(None)
+        )
+        with self._npc_portraits_lock:
+            self._npc_portraits = {}
+
         # Generate missing player portrait...
         po = self.state.story_outline["player_backstory"]
         player = po["name"]
         if player not in self.state.character_image_urls:
-            cia = CharacterImageAgent(
-                api_key=self.API_KEY,
-                debug=True,
-                genre=self.state.selected_genre,
-                artstyle=self.state.global_artstyle
-            )
+            cia = self._char_image_agent
             prompt = f"Character portrait of {player}, origin: {po['origin_story']}."
             try:
                 url = cia.generate_character_image(
@@ -166,7 +235,7 @@ class GameEngine:
                     size="1024x1024"
                 )
                 if url:
-                    self.state.character_image_urls[player] = url
+                    self.state.set_character_image(player, url)
                     self.logger.debug("Generated missing player portrait: %s → %s", player, url)
                 else:
                     self.logger.warning("No URL returned for player portrait: %s", player)
@@ -176,12 +245,15 @@ class GameEngine:
 
         # Initialize all story‐phase agents
         self._initialize_story_phase_agents()
+        self._start_background_pregen()
+        self._prefetch_npc_portraits()
 
         # Clear choice flag
         self._last_choice = None
 
         # **Critical**: seed last‐image-text so we reuse the saved image
         self._last_image_text = self.state.last_scene_text
+        self._illustrated_text = self.state.last_scene_text
 
         self._first_turn = True
         self.logger.info("Resumed existing savegame.")
@@ -192,6 +264,13 @@ class GameEngine:
         artstyle: str,
         premise_choice: Optional[str] = None
     ) -> list:
+        """
+        Runs new-game setup as a task graph: the premise first, then backstory
+        inference, companion generation and the player portrait concurrently.
+        Returns as soon as the companion options exist; the portraits keep running
+        while the player picks (see select_companion / finish_setup). NPC
+        portraits are prefetched outside the graph (see _prefetch_npc_portraits).
+        """
         self._teardown_logging()
         self._archive_old_data()
         self._setup_logging()
@@ -206,19 +285,77 @@ class GameEngine:
                          self.state.selected_genre, self.state.global_artstyle)
 
         if premise_choice is None:
-            choice = input("Generate a custom premise or use the default one? (custom/default): ")
+            choice = input("Generate a custom premise, build a procedural one offline, or use the default? (custom/procedural/default): ")
         else:
             choice = premise_choice
 
+        self._char_image_agent = CharacterImageAgent(
+            api_key=self.API_KEY,
+            debug=True,
+            genre=self.state.selected_genre,
+            artstyle=self.state.global_artstyle,
+            reuse_cached=reuse_for_premise(choice)
+        )
+        with self._npc_portraits_lock:
+            self._npc_portraits = {}
+
+        if self._setup:
+            self._setup.shutdown()
+        self._setup_last_event = None
+        self._premise_preview = None
+        self._setup = TaskGraph(
+            max_workers=int(os.getenv("SETUP_MAX_WORKERS", "8")),
+            on_event=self._on_setup_event
+        )
+        self._setup.add("premise", lambda: self._setup_premise(choice))
+        self._setup.add("backstory", lambda full: self._branching_agent.check_backstory_visits(),
+                        deps=["premise"])
+        self._setup.add("companions", self._generate_companion_options, deps=["premise"])
+
+        # Portraits that don't depend on the companion pick start right away
+        full = self._setup.result("premise")
+        pb = full["player_backstory"]
+        self._add_portrait_task(
+            "player", pb["name"],
+            f"Character portrait of {pb['name']}, origin: {pb['origin_story']}.",
+            self.state.player_profile, None
+        )
+        if self._npc_portraits_eager:
+            for npc in full["npcs"]:
+                self._add_portrait_task(
+                    f"npc_{npc['id']}", npc["name"], npc.get("description", ""),
+                    {}, npc.get("visual_description", "")
+                )
+
+        self._companion_options = self._setup.result("companions")
+        return self._companion_options
+
+    def _setup_premise(self, choice: str) -> dict:
         agent = PremiseAgent(api_key=self.API_KEY, state=self.state)
         if choice.lower().startswith("d"):
             full = agent._load_default()
             self.logger.info("Loaded default premise.")
+        elif choice.lower().startswith("p"):
+            full = agent.generate_procedural()
+            self.logger.info("Built procedural premise offline.")
         else:
-            full = agent.generate_premise()
-            self.logger.info("Generated custom premise via AI.")
+            full = self._premise_pool.take(self.state.selected_genre)
+            if full:
+                self.state.current_location = full.get("current_location", {})
+                self.logger.info("Using pre-generated custom premise from the pool.")
+            elif self._premise_sectioned:
+                full = agent.generate_premise_sectioned(on_section=self._on_premise_section)
+                self.logger.info("Generated custom premise via AI (sectioned).")
+            else:
+                full = agent.generate_premise()
+                self.logger.info("Generated custom premise via AI.")
+            self._premise_pool.refill(self.state.selected_genre, self.state.global_artstyle)
+
+        self._premise_preview = {
+            "world_name": full["world_data"].get("world_name", ""),
+            "world_overview": full["world_data"].get("world_overview", ""),
+        }
 
-        world_data       = full["world_data"]
         plot_outline     = full["plot_outline"]
         player_backstory = full["player_backstory"]
 
@@ -231,92 +368,265 @@ class GameEngine:
 
         first_npc = plot_outline["five_act_plan"][0]["tie_npc"]
         self.state.current_party        = [first_npc]
-        self.state.visited_by_backstory = player_backstory.get("starting_locations", [])
+        self.state.build_world_map()
+        for loc in player_backstory.get("starting_locations", []):
+            self.state.record_backstory_visit(loc)
 
         self.state.save_game()
         self.logger.debug("Premise saved to state.")
         self._initialize_story_phase_agents()
-        self._branching_agent.check_backstory_visits()
-
+        self._start_background_pregen()
+        self._prefetch_npc_portraits()
+        return full
 
-        self._companion_options = CompanionGenerator(
+    # ─── Background pre-generation ─────────────────────────────────────────
+    def _pregen_order(self) -> list:
+        """
+        Subareas as [(name, description)], starting subarea first, then its
+        map neighbours breadth-first, then the rest in premise order.
+        """
+        subareas = {}
+        for kl in (self.state.story_outline or {}).get("world_data", {}).get("key_locations", []):
+            for sub in kl.get("subareas", []):
+                subareas.setdefault(sub["name"], sub.get("description", ""))
+
+        start = (getattr(self.state, "current_location", None) or {}).get("subarea_name")
+        order, seen, queue = [], set(), [start] if start else []
+        while queue:
+            node = queue.pop(0)
+            if node in seen:
+                continue
+            seen.add(node)
+            if node in subareas:
+                order.append(node)
+            queue.extend(self.state.world_map.get(node, []))
+        order += [name for name in subareas if name not in seen]
+        return [(name, subareas[name]) for name in order]
+
+    def _start_background_pregen(self):
+        """With PREGENERATE_BACKGROUNDS, render every subarea's background in the background."""
+        if not self._pregen_enabled or not self._image_agent:
+            return
+        todo = [
+            (name, desc) for name, desc in self._pregen_order()
+            if not os.path.isfile(self.state.location_images.get(name) or "")
+        ]
+        if not todo:
+            return
+        if self._pregen_executor is None:
+            self._pregen_executor = ThreadPoolExecutor(
+                max_workers=max(1, self._pregen_workers), thread_name_prefix="pregen"
+            )
+        threading.Thread(
+            target=self._pregenerate_backgrounds, args=(self._image_agent, todo),
+            name="pregen-prompts", daemon=True
+        ).start()
+
+    def _pregenerate_backgrounds(self, agent: ImageAgent, todo: list):
+        # Runs on its own thread: prompt batches are built in priority order and
+        # each batch's renders start as soon as its prompts are back.
+        with self._executor.priority(BACKGROUND):
+            self._pregenerate_batches(agent, todo)
+
+    def _pregenerate_batches(self, agent: ImageAgent, todo: list):
+        started = time.perf_counter()
+        pending = []
+        for name, desc in todo:
+            cached = agent.cached_location_image(name) if self._image_cache else None
+            if cached:
+                self.state.set_location_image(name, cached)
+            else:
+                pending.append((name, desc))
+        self.logger.info("[PREGEN] %d subarea background(s) to render, %d from cache",
+                         len(pending), len(todo) - len(pending))
+
+        futures = []
+        for i in range(0, len(pending), max(1, self._pregen_batch)):
+            if agent is not self._image_agent:
+                return   # a new game started meanwhile
+            batch = pending[i:i + max(1, self._pregen_batch)]
+            prompts = agent.generate_location_prompts(batch)
+            for name, desc in batch:
+                futures.append(self._pregen_executor.submit(
+                    inherit_priority(self._pregenerate_one), agent, name, desc, prompts.get(name)
+                ))
+        for f in futures:
+            f.exception()
+        self.logger.info("[PREGEN] Finished in %.1fs", time.perf_counter() - started)
+
+    def _pregenerate_one(self, agent: ImageAgent, name: str, desc: str, prompt: Optional[str]):
+        # runs as BACKGROUND, inherited from _pregenerate_backgrounds()
+        if agent is not self._image_agent:
+            return
+        path = agent.generate_location_image(name, desc, prompt=prompt)
+        if path and os.path.isfile(path):
+            self.state.set_location_image(name, path)
+            self.logger.debug("[PREGEN] %s → %s", name, path)
+
+    def _on_premise_section(self, name: str, data):
+        # called from premise worker threads: record only, the UI polls
+        self.logger.debug("[SETUP] Premise section ready: %s", name)
+        if name == "skeleton":
+            self._premise_preview = {
+                "world_name": data.get("world_name", ""),
+                "world_overview": data.get("world_overview", ""),
+            }
+
+    def get_premise_preview(self) -> Optional[Dict]:
+        """World name/overview as soon as they exist, before the premise is complete."""
+        return self._premise_preview
+
+    def _generate_companion_options(self, full: dict) -> list:
+        return CompanionGenerator(
             api_key=self.API_KEY
-        ).generate_companions(self.state.selected_genre, world_data)
-        return self._companion_options
-
-    def select_companion(self, index: int, companion_list: list):
-        comp = companion_list[index]
-        self.state.companion_name        = comp["name"]
-        self.state.companion_description = comp["description"]
-        self.state.companion_profile     = comp["traits"]
-        self.state.companion_visual_desc = comp.get("visual_description", "")
+        ).generate_companions(self.state.selected_genre, full["world_data"])
 
-        char_image_agent = CharacterImageAgent(
-            api_key=self.API_KEY,
-            debug=True,
-            genre=self.state.selected_genre,
-            artstyle=self.state.global_artstyle
+    def _add_portrait_task(self, kind, name, prompt, traits, vis):
+        self._setup.add(
+            f"portrait:{kind}",
+            lambda _full: self._generate_portrait(name, prompt, traits, vis),
+            deps=["premise"]
         )
 
-        tasks = []
-        pb = self.state.story_outline["player_backstory"]
-        tasks.append((
-            "player",
-            pb["name"],
-            f"Character portrait of {pb['name']}, origin: {pb['origin_story']}.",
-            self.state.player_profile,
-            None
-        ))
-        tasks.append((
-            "companion",
-            comp["name"],
-            comp["description"],
-            comp["traits"],
-            comp.get("visual_description", "")
-        ))
-        for npc in self.state.story_outline["npcs"]:
-            tasks.append((
-                f"npc_{npc['id']}",
-                npc["name"],
-                npc.get("description", ""),
-                {},
-                npc.get("visual_description", "")
-            ))
+    def _generate_portrait(self, char_name, prompt, traits, vis, state=None, agent=None):
+        state = state or self.state
+        try:
+            url = (agent or self._char_image_agent).generate_character_image(
+                name=char_name,
+                description=prompt,
+                traits=traits,
+                visual_description=vis,
+                size="1024x1024"
+            )
+        except Exception as e:
+            self.logger.error("Error generating portrait for %s: %s", char_name, e)
+            url = None
 
-        futures = {}
-        with ThreadPoolExecutor(max_workers=len(tasks)) as exe:
-            for kind, name, prompt, traits, vis in tasks:
-                fut = exe.submit(
-                    char_image_agent.generate_character_image,
-                    name=name,
-                    description=prompt,
-                    traits=traits,
-                    visual_description=vis,
-                    size="1024x1024"
-                )
-                futures[fut] = (kind, name)
+        if url and "unknown_character" in url:
+            self.logger.warning("Got placeholder for %s—skipping that image.", char_name)
+            url = None
 
-            for fut in as_completed(futures):
-                kind, char_name = futures[fut]
-                try:
-                    url = fut.result()
-                except Exception as e:
-                    self.logger.error("Error generating portrait for %s: %s", char_name, e)
-                    url = None
+        if url:
+            state.set_character_image(char_name, url)
+            self.logger.debug("Portrait URL for %s: %s", char_name, url)
+        else:
+            self.logger.warning("No portrait URL saved for %s", char_name)
+        return url
+
+    # ─── Lazy NPC portraits ────────────────────────────────────────────────
+    def _find_npc(self, name: Optional[str]) -> Optional[dict]:
+        """Premise NPC called `name` (full name, else first name), or None."""
+        if not name:
+            return None
+        npcs = (self.state.story_outline or {}).get("npcs", [])
+        wanted = name.strip().lower()
+        for npc in npcs:
+            if npc.get("name", "").strip().lower() == wanted:
+                return npc
+        first = wanted.split()[0]
+        for npc in npcs:
+            if npc.get("name", "").strip().lower().split()[:1] == [first]:
+                return npc
+        return None
+
+    def _schedule_npc_portrait(self, npc: dict, priority: str = PREFETCH) -> Future:
+        """Start (once per game) the portrait job for `npc`; returns its Future."""
+        name = npc["name"]
+        with self._npc_portraits_lock:
+            future = self._npc_portraits.get(name)
+            if future is not None and future.done() and not future.exception() and not future.result():
+                future = None      # the last attempt produced nothing: try again
+            if future is None:
+                existing = self.state.character_image_urls.get(name)
+                if existing and os.path.isfile(existing):
+                    future = Future()
+                    future.set_result(existing)
+                else:
+                    self.logger.debug("[PORTRAIT] Scheduling %s portrait for %s", priority, name)
+                    future = self._executor.submit_as(
+                        priority, self._generate_portrait, name, npc.get("description", ""), {},
+                        npc.get("visual_description", ""), self.state, self._char_image_agent
+                    )
+                self._npc_portraits[name] = future
+            elif not future.done():
+                self._executor.promote(future, priority)   # a prefetch the player now waits on
+            return future
+
+    def _prefetch_npc_portraits(self):
+        """Portraits for the NPCs in the party and the current act's tie NPC."""
+        if not (self.state and self.state.story_outline and self._char_image_agent):
+            return
+        ids = list(getattr(self.state, "current_party", None) or [])
+        acts = self.state.story_outline.get("plot_outline", {}).get("five_act_plan", [])
+        if 0 <= self.state.current_act_index < len(acts):
+            ids.append(acts[self.state.current_act_index].get("tie_npc"))
+        by_id = {npc.get("id"): npc for npc in self.state.story_outline.get("npcs", [])}
+        for npc_id in dict.fromkeys(ids):
+            if npc_id in by_id:
+                self._schedule_npc_portrait(by_id[npc_id])
+
+    def request_portrait(self, speaker: str) -> Optional[Future]:
+        """
+        Future for `speaker`'s portrait path. Known portraits resolve at once;
+        an NPC without one is generated now (the UI shows the line meanwhile).
+        None if the speaker is nobody we can draw.
+        """
+        urls = self.state.character_image_urls
+        url = urls.get(speaker)
+        if not url and " " in speaker:
+            url = urls.get(speaker.split()[0])
+        if url and os.path.isfile(url):
+            done = Future()
+            done.set_result(url)
+            return done
+        npc = self._find_npc(speaker)
+        if npc is None or not self._char_image_agent:
+            return None
+        return self._schedule_npc_portrait(npc, INTERACTIVE)
+
+    def _on_setup_event(self, event: dict):
+        # called from setup worker threads: record only, the UI polls
+        self._setup_last_event = event
+        self.logger.debug("[SETUP] %s %s (%d/%d, %.2fs)", event["task"], event["status"],
+                          event["done"], event["total"], event["elapsed"])
+
+    def get_setup_progress(self) -> Dict:
+        """
+        Snapshot of new-game setup for the loading page:
+        {"done", "total", "running": [...], "failed": [...], "last_event": {...} | None}
+        """
+        if not self._setup:
+            return {"done": 0, "total": 0, "running": [], "failed": [], "last_event": None}
+        prog = self._setup.progress()
+        prog["last_event"] = self._setup_last_event
+        return prog
 
-                if url and "unknown_character" in url:
-                    self.logger.warning("Got placeholder for %s—skipping that image.", char_name)
-                    url = None
+    def setup_done(self) -> bool:
+        return self._setup is None or self._setup.done()
 
-                if url:
-                    self.state.character_image_urls[char_name] = url
-                    self.logger.debug("Portrait URL for %s: %s", char_name, url)
-                else:
-                    self.logger.warning("No portrait URL saved for %s", char_name)
+    def select_companion(self, index: int, companion_list: list, wait: bool = True):
+        comp = companion_list[index]
+        self.state.companion_name        = comp["name"]
+        self.state.companion_description = comp["description"]
+        self.state.companion_profile     = comp["traits"]
+        self.state.companion_visual_desc = comp.get("visual_description", "")
 
+        self._add_portrait_task(
+            "companion", comp["name"], comp["description"],
+            comp["traits"], comp.get("visual_description", "")
+        )
+        if wait:
+            self.finish_setup()
+
+    def finish_setup(self):
+        """Wait for every outstanding setup task, then persist the result."""
+        if self._setup:
+            self._setup.wait()
+            failed = self._setup.progress()["failed"]
+            if failed:
+                self.logger.warning("Setup tasks failed: %s", ", ".join(failed))
         self.state.save_game()
         self.logger.info("All character portraits generated and saved.")
-        #self._initialize_story_phase_agents()
 
     def _initialize_story_phase_agents(self):
         self._story_agent     = StoryAgent(api_key=self.API_KEY, state=self.state)
@@ -326,8 +636,17 @@ class GameEngine:
         self._image_agent     = ImageAgent(
             api_key=self.API_KEY,
             debug=True,
-            artstyle=self.state.global_artstyle
+            artstyle=self.state.global_artstyle,
+            display_size=self._display_size,
+            cache=self._image_cache,
+            premise=premise_id(self.state.story_outline),
+            manifest=self._asset_manifest,
+            state=self.state
         )
+        self._choice_scoring_agent = ChoiceScoringAgent(self.state)
+        self._prescore = None
+        self._scene_image = None
+        self._illustrated_text = None
         # only reset choice & first_turn here:
         self._last_choice = None
         self._first_turn  = True
@@ -345,6 +664,7 @@ class GameEngine:
         self._last_choice             = None # no choice made yet, as snippet was just generated
         self.state.save_game()
         self.logger.debug("[STORY] Generated new scene: %r", text)
+        self._start_prescore()
         return text
 
     def get_current_choices(self) -> list:
@@ -359,10 +679,24 @@ class GameEngine:
         if choice_text in choices:
             # a preset choice button was clicked
             idx = choices.index(choice_text)
-            self._profiling_agent.update_profile(idx, choices, self.state.last_scene_text or "")
-            self._companion_agent.update_companion_profile(idx, choices, self.state.last_scene_text or "")
-            self._branching_agent.update_story_point(idx, choices, self.state.last_scene_text or "")
+            context = self.state.last_scene_text or ""
+            scored = self._take_prescore(choice_text)
+            if scored:
+                self.logger.debug("[CHOICE] Applying pre-scored analysis for %r", choice_text)
+                # GPT labels for the choice actually taken train the local estimator
+                record_label("player", choice_text, context, scored["player"])
+                record_label("companion", choice_text, context, scored["companion"])
+                player = self._profiling_agent.update_profile(idx, choices, context, deltas=scored["player"])
+                companion = self._companion_agent.update_companion_profile(idx, choices, context, deltas=scored["companion"])
+                self._branching_agent.update_story_point(idx, choices, context, transition=scored["transition"])
+            else:
+                player = self._profiling_agent.update_profile(idx, choices, context)
+                companion = self._companion_agent.update_companion_profile(idx, choices, context)
+                self._branching_agent.update_story_point(idx, choices, context)
             self.state.advance_plot_phase()
+            self.state.record_trait_history(player["deltas"], companion)
+            # the party or the act may have changed: warm up the new faces
+            self._prefetch_npc_portraits()
         else:
             # custom‐typed choice: leave idx alone (None) so StoryAgent sees raw text
             idx = None
@@ -371,22 +705,240 @@ class GameEngine:
         self._last_choice = choice_text
         self.state.save_game()
 
-    def get_current_image_path(self) -> Optional[str]:
-        # Pull the scene text
+    def _start_prescore(self):
+        """
+        Score all preset choices of the current scene in one background request
+        (PRESCORE_CHOICES=1) so make_choice() can apply the result instantly.
+        """
+        text = self.state.last_scene_text
+        choices = list(self.state.last_scene_choices or [])
+        if not (self._prescore_enabled and self._choice_scoring_agent and text and choices):
+            return
+        if self._prescore and self._prescore[0] == text:
+            return
+        fut = self._executor.submit_as(PREFETCH, self._choice_scoring_agent.score_choices, text, choices)
+        self._prescore = (text, fut)
+
+    def _take_prescore(self, choice_text: str) -> Optional[Dict]:
+        """
+        Pre-scored analysis for `choice_text`, if it is ready (or becomes ready
+        within PRESCORE_WAIT_SECONDS). This runs on the GUI thread, so a slower
+        pre-score is cancelled and the choice is scored on demand instead.
+        """
+        if not self._prescore:
+            return None
+        scene, fut = self._prescore
+        self._prescore = None
+        if scene != self.state.last_scene_text:
+            fut.cancel()
+            return None
+        try:
+            scored = fut.result(timeout=self._prescore_wait)
+        except FutureTimeout:
+            fut.cancel()
+            self.logger.debug("[CHOICE] Pre-score not ready; inferring on demand.")
+            return None
+        except Exception as e:
+            self.logger.warning("Choice pre-scoring unavailable (%s); inferring on demand.", e)
+            return None
+        return scored.get(choice_text)
+
+    def on_scene_shown(self):
+        """
+        Hook for the UI once a scene is on screen: kicks off background work that
+        must not delay the choice → scene path (choice pre-scoring and the
+        throttled personality analysis).
+        """
+        self._start_prescore()
+        if self._profiling_agent:
+            self._profiling_agent.schedule_analysis()
+        self.logger.debug("[SCHED] %s", self._executor.metrics()["classes"])
+
+    def refresh_personality_analysis(self):
+        """
+        Analyse any pending choices right away (e.g. the profile sidebar opened).
+        Returns a Future for the new analysis, or None if it's already current.
+        """
+        if not self._profiling_agent:
+            return None
+        return self._profiling_agent.refresh_analysis()
+
+    def set_display_size(self, width: int, height: int):
+        """Called by the UI so scene images are rendered for the actual window."""
+        self._display_size = (int(width), int(height))
+        if self._image_agent:
+            self._image_agent.set_display_size(width, height)
+
+    def request_scene_image(self) -> Future:
+        """
+        Future for the current scene's image path. Generation runs on the engine
+        executor (prompt, DALL·E, download) and the image pool (post-processing);
+        repeated calls for the same scene share one Future.
+        """
         text = self.state.last_scene_text or self.get_current_text()
+        prev_url = self.state.last_scene_image_url
 
         # Only regenerate if we have no image or the text has changed
-        if (not self.state.last_scene_image_url
-            or text != self._last_image_text):
+        if prev_url and text == self._last_image_text:
+            done = Future()
+            done.set_result(prev_url)
+            return done
+
+        if self._scene_image is None or self._scene_image[0] != text:
+            if self._scene_image and self._scene_image[2].cancel():
+                self.logger.debug("[IMAGE] Dropped stale image job for a previous scene")
+            location = self._scene_location()
+            decision = self._score_visual_change(text, location)
+            pregen = self.state.location_images.get(location) if location else None
+            illustrated = text
+            if not decision["new_image"] and prev_url and os.path.isfile(prev_url):
+                self.logger.debug("[IMAGE] Reusing %s", prev_url)
+                if self._image_cache:
+                    self._image_cache.record_reuse()
+                future = Future()
+                future.set_result(prev_url)
+                illustrated = self._illustrated_text
+            elif pregen and os.path.isfile(pregen) and pregen != prev_url:
+                self.logger.debug("[IMAGE] Using pre-generated background for %s", location)
+                future = Future()
+                future.set_result(pregen)
+            else:
+                self.logger.debug("[IMAGE] Generating image for scene_text:\n%s", text)
+                # called from the UI thread, so this runs as interactive work
+                extra = {"accept_cached": self._cached_background_fits(text, location)} if self._image_cache else {}
+                future = self._executor.submit(
+                    self._image_agent.generate_scene_image, text, location, turn=self.state.turn_counter, **extra
+                )
+                if self._image_deadline > 0:
+                    future = self._with_deadline(future, text, location)
+            self._scene_image = (text, location, future, illustrated)
+        return self._scene_image[2]
 
-            self.logger.debug("[IMAGE] Generating image for scene_text:\n%s", text)
-            url = self._image_agent.generate_scene_image(text)
-            self.state.last_scene_image_url = url
-            self._last_image_text = text
-            self.state.save_game()
+    def _with_deadline(self, job: Future, text: str, location: Optional[str]) -> Future:
+        """
+        Future that resolves with `job`'s image, or — if that takes longer than
+        IMAGE_DEADLINE_SECONDS — with a procedural background rendered on the
+        spot. A late DALL·E image still lands in the manifest and cache.
+        """
+        out, lock = Future(), threading.Lock()
+        agent, turn = self._image_agent, self.state.turn_counter
+
+        def settle(result=None, error=None):
+            with lock:
+                if out.done():
+                    return
+                if error is not None:
+                    out.set_exception(error)
+                else:
+                    out.set_result(result)
+
+        def finished(f):
+            if not f.cancelled():
+                settle(*((None, f.exception()) if f.exception() else (f.result(), None)))
+
+        def expired():
+            if out.done():
+                return
+            self.logger.warning("[IMAGE] No image after %.1fs, using a procedural background", self._image_deadline)
+            settle(agent.procedural_scene_image(text, location, turn))
+
+        timer = threading.Timer(self._image_deadline, expired)
+        timer.daemon = True
+        job.add_done_callback(finished)
+        out.add_done_callback(lambda f: (timer.cancel(), job.cancel() if f.cancelled() else None))
+        timer.start()
+        return out
+
+    def _scene_names(self) -> list:
+        names = [n.get("name") for n in (self.state.story_outline or {}).get("npcs", [])]
+        names.append(getattr(self.state, "companion_name", None))
+        return [n for n in names if n]
+
+    def _cached_background_fits(self, text: str, location: Optional[str]):
+        """
+        The same-subarea reuse rule applied to a cached background: its prompt
+        must not differ visually from the new scene (checked before any prompt
+        is generated for the scene).
+        """
+        names = self._scene_names()
+
+        def accept(cached_prompt: str) -> bool:
+            decision = self._change_scorer.score(
+                cached_prompt, text, previous_location=location, location=location, names=names
+            )
+            return not decision["new_image"]
+        return accept
+
+    def _score_visual_change(self, text: str, location: Optional[str]) -> dict:
+        """Score the new scene against the last illustrated one and log the decision."""
+        decision = self._change_scorer.score(
+            self._illustrated_text, text,
+            previous_location=self.state.last_scene_image_location, location=location,
+            names=self._scene_names()
+        )
+        self.logger.info(
+            "[IMAGE] Visual change %.2f (threshold %.2f) → %s; components=%s inputs=%s",
+            decision["score"], self._change_scorer.threshold,
+            "new image" if decision["new_image"] else "reuse",
+            decision["components"], decision["inputs"]
+        )
+        return decision
+
+    def get_placeholder_image_path(self) -> Optional[str]:
+        """
+        What to show while the scene's own image is generated: the current
+        subarea's pre-generated or cached background, else the last image drawn
+        there this session, else the last scene image.
+        """
+        location = self._scene_location()
+        candidates = [self.state.location_images.get(location) if location else None]
+        latest = self._asset_manifest.latest(location) if location else None
+        candidates.append(latest and latest["file"])
+        if location and self._image_cache and self._image_agent:
+            candidates.append(self._image_cache.find_location(
+                self._image_agent.premise, location, self._image_agent.artstyle
+            ))
+        candidates.append(self.state.last_scene_image_url)
+        for path in candidates:
+            if path and os.path.isfile(path):
+                return path
+        return None
+
+    def _scene_location(self) -> Optional[str]:
+        cur = getattr(self.state, "current_location", None) or {}
+        return cur.get("subarea_name") or self.state.current_location_name or cur.get("location_name")
+
+    def _commit_scene_image(self, text: str, location: Optional[str], url: str, illustrated: str):
+        if text == self._last_image_text and url == self.state.last_scene_image_url:
+            return
+        self.state.last_scene_image_url = url
+        self.state.last_scene_image_location = location
+        self._last_image_text = text
+        self._illustrated_text = illustrated
+        self.state.save_game()
 
+    def get_current_image_path(self) -> Optional[str]:
+        future = self.request_scene_image()
+        if self._scene_image and self._scene_image[2] is future:
+            text, location, _, illustrated = self._scene_image
+            self._commit_scene_image(text, location, future.result(), illustrated)
         return self.state.last_scene_image_url
 
+    def get_images_for_turn(self, turn: int) -> list:
+        """Manifest entries (file, prompt, location, size…) for images drawn on `turn`."""
+        return self._asset_manifest.by_turn(turn)
+
+    def get_images_for_location(self, location: str) -> list:
+        """Manifest entries for every image drawn at `location`, oldest first."""
+        return self._asset_manifest.by_location(location)
+
+    def get_image_cache_stats(self) -> Optional[dict]:
+        return self._image_cache.stats() if self._image_cache else None
+
+    def get_scheduler_metrics(self) -> dict:
+        """Per-class queue depth / wait times and per-endpoint load (see JobScheduler.metrics)."""
+        return self._executor.metrics()
+
 '''
 if __name__ == "__main__":
     engine = GameEngine()
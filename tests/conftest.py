@@ -0,0 +1,76 @@
+# conftest.py
+#
+# Helpers shared by the test modules. pytest puts this directory on sys.path,
+# so tests import them with `from conftest import ...`.
+
+import io
+import json
+import threading
+from types import SimpleNamespace
+
+from PIL import Image
+
+
+def png(size=(320, 180), colour="navy", mode="RGB", noise=False) -> bytes:
+    """An encoded PNG; `noise` makes it incompressible (realistic download sizes)."""
+    buf = io.BytesIO()
+    if noise:
+        img = Image.effect_noise(size, 64).convert(mode)
+    else:
+        img = Image.new(mode, size, colour)
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def chat_reply(content: str):
+    """openai 0.28 ChatCompletion response with one plain-text choice."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def function_call_reply(name: str, arguments):
+    """openai 0.28 ChatCompletion response calling function `name` with `arguments` (JSON-encoded)."""
+    message = {"function_call": {"name": name, "arguments": json.dumps(arguments)}}
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeChat:
+    """
+    Stands in for openai.ChatCompletion: records every request in `calls` and
+    answers it. `answers` is a list replayed in order, a dict keyed by the
+    requested function name, or one callable for every request; list and dict
+    entries may be callables too. Callables get the request kwargs.
+
+    Function-call requests get the answer as arguments; others as message
+    content (JSON-encoded unless it is a string). Use the instance itself to
+    monkeypatch "openai.ChatCompletion.create", or set it as a client's
+    ChatCompletion. Requests may arrive from several threads.
+    """
+
+    def __init__(self, answers):
+        self.answers = answers if isinstance(answers, dict) or callable(answers) else list(answers)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    @property
+    def prompts(self):
+        """The last message of each request."""
+        return [c["messages"][-1]["content"] for c in self.calls]
+
+    def create(self, **kwargs):
+        call = kwargs.get("function_call")
+        function = call.get("name") if isinstance(call, dict) else None
+        with self._lock:
+            self.calls.append(kwargs)
+            if isinstance(self.answers, dict):
+                answer = self.answers[function]
+            elif callable(self.answers):
+                answer = self.answers
+            else:
+                answer = self.answers.pop(0)
+        if callable(answer):
+            answer = answer(kwargs)
+        if function:
+            return function_call_reply(function, answer)
+        return chat_reply(answer if isinstance(answer, str) else json.dumps(answer))
+
+    __call__ = create
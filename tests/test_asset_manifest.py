@@ -0,0 +1,63 @@
+# test_asset_manifest.py
+
+import os
+import threading
+
+from agents.asset_manifest import AssetManifest
+
+
+def _image(directory, asset_id, size=100):
+    path = os.path.join(directory, f"{asset_id}.jpg")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def test_concurrent_allocation_is_unique_and_survives_restart(tmp_path):
+    directory = str(tmp_path / "generated_images")
+    manifest = AssetManifest(directory)
+    ids, lock = [], threading.Lock()
+
+    def grab():
+        for _ in range(20):
+            asset_id = manifest.allocate()
+            with lock:
+                ids.append(asset_id)
+
+    threads = [threading.Thread(target=grab) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(ids) == list(range(1, 81))
+
+    # ids allocated but never written are still taken after a restart
+    assert AssetManifest(directory).allocate() == 81
+
+
+def test_lookup_by_turn_and_location(tmp_path):
+    directory = str(tmp_path / "generated_images")
+    manifest = AssetManifest(directory)
+    a, b, c = manifest.allocate(), manifest.allocate(), manifest.allocate()
+    manifest.record(a, _image(directory, a, 10), prompt="hall", location="Great Hall", turn=1, width=16, height=9)
+    manifest.record(c, _image(directory, c, 30), prompt="hall again", location="great hall ", turn=3)
+    manifest.release(b)
+
+    reopened = AssetManifest(directory)
+    assert [e["id"] for e in reopened.by_location("Great Hall")] == [a, c]
+    assert reopened.by_turn(1)[0]["bytes"] == 10 and reopened.by_turn(1)[0]["width"] == 16
+    assert reopened.latest("Great Hall")["prompt"] == "hall again"
+    assert reopened.get(b) is None and reopened.by_turn(2) == []
+
+
+def test_archived_manifest_restarts_and_legacy_folders_are_seeded(tmp_path):
+    directory = str(tmp_path / "generated_images")
+    os.makedirs(directory)
+    _image(directory, 4)
+    manifest = AssetManifest(directory)
+    assert manifest.allocate() == 5               # folder written before the manifest existed
+
+    for name in os.listdir(directory):            # new game archives the folder
+        os.replace(os.path.join(directory, name), str(tmp_path / name))
+    assert manifest.allocate() == 1 and manifest.entries() == []
+    assert AssetManifest.for_directory(directory) is AssetManifest.for_directory(directory)
@@ -0,0 +1,123 @@
+# test_background_pregen.py
+
+import json
+import threading
+
+import pytest
+
+from agents.image_agent import ImageAgent
+from agents.image_pool import ImageProcessPool
+from game.game_state import GameState
+
+from conftest import FakeChat
+
+
+OUTLINE = {
+    "world_data": {
+        "world_name": "Aurion",
+        "key_locations": [
+            {"location_name": "Village", "subareas": [{"name": "Inn", "description": "A warm inn."},
+                                                      {"name": "Well", "description": "An old well."}]},
+            {"location_name": "Citadel", "subareas": [{"name": "Gate", "description": "Iron gate."},
+                                                      {"name": "Hall", "description": "Great hall."},
+                                                      {"name": "Tower", "description": "Tall tower."}]},
+        ]
+    }
+}
+
+
+def test_batched_location_prompts(monkeypatch):
+    chat = FakeChat(["Here:\n" + json.dumps([{"location": 2, "prompt": "Iron gate at dusk --ar 16:9"},
+                                             {"location": 1, "prompt": "Warm   inn interior --ar 16:9"},
+                                             {"location": 9, "prompt": "out of range"}])])
+    monkeypatch.setattr("openai.ChatCompletion.create", chat)
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0))
+    prompts = agent.generate_location_prompts([("Inn", "A warm inn."), ("Gate", "Iron gate.")])
+
+    assert len(chat.calls) == 1
+    assert prompts == {"Inn": "Warm inn interior --ar 16:9", "Gate": "Iron gate at dusk --ar 16:9"}
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("PREGENERATE_BACKGROUNDS", "1")
+    monkeypatch.setenv("IMAGE_CACHE_MB", "0")
+    from main import GameEngine
+    eng = GameEngine()
+    eng.state = GameState()
+    eng.state.story_outline = OUTLINE
+    eng.state.current_location = {"location_name": "Citadel", "subarea_name": "Hall"}
+    eng.state.build_world_map()
+    return eng
+
+
+def test_pregen_starts_at_current_subarea_and_fills_location_images(engine, tmp_path):
+    assert [n for n, _ in engine._pregen_order()] == ["Hall", "Gate", "Tower", "Inn", "Well"]
+
+    done = threading.Event()
+    rendered, batches = [], []
+
+    class FakeImageAgent:
+        premise, artstyle = "p", None
+
+        def generate_location_prompts(self, batch):
+            batches.append([n for n, _ in batch])
+            return {n: f"prompt {n}" for n, _ in batch}
+
+        def generate_location_image(self, name, desc, prompt=None):
+            path = tmp_path / f"{name}.jpg"
+            path.write_bytes(b"x")
+            rendered.append((name, prompt))
+            if len(rendered) == 5:
+                done.set()
+            return str(path)
+
+    engine._image_agent = FakeImageAgent()
+    engine._pregen_batch = 3
+    engine._start_background_pregen()
+    assert done.wait(5)
+    engine._pregen_executor.shutdown(wait=True)
+
+    assert batches == [["Hall", "Gate", "Tower"], ["Inn", "Well"]]
+    assert sorted(rendered) == sorted((n, f"prompt {n}") for n in ["Hall", "Gate", "Tower", "Inn", "Well"])
+
+    # scene display picks the pre-generated background without rendering
+    engine.state.last_scene_text = "Mara waits in the hall."
+    assert engine.get_current_image_path() == str(tmp_path / "Hall.jpg")
+
+
+def test_stale_scene_image_jobs_are_dropped(engine, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    gate = threading.Event()
+    drawn = []
+
+    class SlowImageAgent:
+        premise, artstyle = "p", None
+
+        def generate_scene_image(self, text, location=None, turn=None):
+            gate.wait(5)
+            drawn.append(text)
+            path = tmp_path / f"{len(drawn)}.jpg"
+            path.write_bytes(b"x")
+            return str(path)
+
+    engine._image_agent = SlowImageAgent()
+    engine._executor = ThreadPoolExecutor(max_workers=1)
+    engine.state.location_images = {}
+    engine.state.last_scene_image_url = str(tmp_path / "old.jpg")
+    (tmp_path / "old.jpg").write_bytes(b"x")
+
+    futures = []
+    for text in ["First scene.", "Second scene.", "Third scene."]:
+        engine.state.last_scene_text = text
+        futures.append(engine.request_scene_image())
+        assert engine.get_placeholder_image_path() == str(tmp_path / "old.jpg")
+
+    assert futures[1].cancelled() and not futures[2].done()
+    gate.set()
+    assert engine.get_current_image_path() == str(tmp_path / "2.jpg")
+    assert drawn == ["First scene.", "Third scene."]
+    assert engine.state.last_scene_image_url.endswith("2.jpg")
@@ -0,0 +1,126 @@
+# test_choice_scoring.py
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agents.choice_scoring_agent import ChoiceScoringAgent
+from game.game_state import GameState
+
+from conftest import FakeChat
+
+
+CHOICES = ["Charge the gate", "Talk to the guard", "Sneak around"]
+SCENE = "Guards block the harbor gate."
+
+
+def test_score_choices_keeps_only_complete_answers(tmp_path, monkeypatch):
+    log = tmp_path / "labels.jsonl"
+    monkeypatch.setenv("TRAIT_LABEL_LOG", str(log))
+    monkeypatch.setenv("TRAIT_LABELS", "1")
+    monkeypatch.setattr("openai.ChatCompletion.create", FakeChat([[
+        {"choice": 1, "player": {"Courage": 0.9, "curiosity": "0.1"}, "companion": {"fear": -0.2},
+         "moved": True, "new_location": "Docks"},
+        {"choice": 2, "player": {"communication": 0.3}},            # no companion estimate
+        {"choice": 3, "companion": {"trust": 0.1}},                 # no player estimate
+        {"choice": 7, "player": {}, "companion": {}},               # no such choice
+    ]]))
+    agent = ChoiceScoringAgent(SimpleNamespace(world_map_hierarchy={"Docks": {}}))
+
+    scored = agent.score_choices(SCENE, CHOICES)
+    assert list(scored) == ["Charge the gate"]
+    charge = scored["Charge the gate"]
+    assert charge["player"]["bravery"] == 0.5 and charge["player"]["curiosity"] == 0.1
+    assert charge["companion"] == {"trust": 0.0, "fear": -0.2, "affection": 0.0}
+    assert charge["transition"] == {"moved": True, "new_location": "Docks"}
+    assert not log.exists()                     # offered choices are not labels
+
+
+class FakeScorer:
+    def __init__(self):
+        self.calls = []
+
+    def score_choices(self, scene_text, choices):
+        self.calls.append(scene_text)
+        return {"Talk to the guard": {"player": {"communication": 0.3}, "companion": {"trust": 0.1},
+                                      "transition": {"moved": False, "new_location": None}}}
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("IMAGE_CACHE_MB", "0")
+    monkeypatch.setenv("PRESCORE_CHOICES", "1")
+    from main import GameEngine
+    eng = GameEngine()
+    eng.state = GameState()
+    eng.state.last_scene_text = SCENE
+    eng.state.last_scene_choices = list(CHOICES)
+    eng._choice_scoring_agent = FakeScorer()
+    return eng
+
+
+def test_prescore_runs_once_per_scene_and_matches_choice_text(engine):
+    engine._start_prescore()
+    engine._start_prescore()
+    assert engine._take_prescore("Talk to the guard")["player"] == {"communication": 0.3}
+    assert engine._choice_scoring_agent.calls == [SCENE]
+    assert engine._take_prescore("Talk to the guard") is None       # consumed
+
+
+def test_unscored_and_custom_choices_fall_back(engine):
+    engine._start_prescore()
+    assert engine._take_prescore("Charge the gate") is None
+    engine._start_prescore()
+    assert engine._take_prescore("I bribe the guard with my last coin") is None
+
+
+def test_stale_prescore_is_ignored(engine):
+    engine._start_prescore()
+    engine.state.last_scene_text = "The gate is already open."
+    assert engine._take_prescore("Talk to the guard") is None
+
+
+def test_slow_prescore_is_cancelled_not_awaited(engine):
+    gate = threading.Event()
+    scorer = engine._choice_scoring_agent
+    scorer.score_choices = lambda text, choices: gate.wait(5) and FakeScorer.score_choices(scorer, text, choices)
+    engine._start_prescore()
+    _, future = engine._prescore
+
+    started = time.monotonic()
+    assert engine._take_prescore("Talk to the guard") is None
+    assert time.monotonic() - started < 2
+    gate.set()
+    assert future.cancelled() or future.result(timeout=5)
+
+
+def test_make_choice_applies_prescore_or_scores_on_demand(engine, tmp_path, monkeypatch):
+    log = tmp_path / "labels.jsonl"
+    monkeypatch.setenv("TRAIT_LABEL_LOG", str(log))
+    monkeypatch.setenv("TRAIT_LABELS", "1")
+    applied = []
+
+    def update_profile(idx, choices, context, deltas=None):
+        applied.append((choices[idx], deltas))
+        return {"deltas": deltas or {}}
+
+    engine._profiling_agent = SimpleNamespace(update_profile=update_profile)
+    engine._companion_agent = SimpleNamespace(
+        update_companion_profile=lambda idx, choices, context, deltas=None: deltas or {})
+    engine._branching_agent = SimpleNamespace(update_story_point=lambda *a, **kw: None)
+
+    engine._start_prescore()
+    engine.make_choice("Talk to the guard")
+    engine.state.last_scene_choices = list(CHOICES)
+    engine._last_choice = None
+    engine._start_prescore()
+    engine.make_choice("Sneak around")
+    assert applied == [("Talk to the guard", {"communication": 0.3}), ("Sneak around", None)]
+    labels = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [(e["kind"], e["choice"]) for e in labels] == [("player", "Talk to the guard"),
+                                                         ("companion", "Talk to the guard")]
@@ -0,0 +1,83 @@
+# test_downloader.py
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agents.downloader import Downloader, DownloadError
+
+from conftest import png
+
+BODY = png((256, 256), noise=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves BODY; the first full request is cut off halfway, Range requests get a 206."""
+    requests_seen = []
+    cut_first = True
+
+    def do_GET(self):
+        rng = self.headers.get("Range")
+        type(self).requests_seen.append(rng)
+        if self.path == "/broken":
+            payload = b"not an image"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        if rng:
+            start = int(rng.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+            self.send_header("Content-Length", str(len(BODY) - start))
+            self.end_headers()
+            self.wfile.write(BODY[start:])
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        if type(self).cut_first:
+            type(self).cut_first = False
+            self.wfile.write(BODY[: len(BODY) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.requests_seen = []
+    _Handler.cut_first = True
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_interrupted_download_resumes_with_range(server, tmp_path):
+    dest = str(tmp_path / "img" / "scene.png")
+    path = Downloader(retries=3, backoff=0).fetch(f"{server}/scene.png", dest)
+
+    assert path == dest and open(dest, "rb").read() == BODY
+    first, resumed = _Handler.requests_seen
+    assert first is None and resumed.startswith("bytes=") and resumed != "bytes=0-"
+    assert not (tmp_path / "img" / "scene.png.part").exists()
+
+
+def test_corrupt_downloads_fail_cleanly(server, tmp_path):
+    dest = str(tmp_path / "bad.png")
+    with pytest.raises(DownloadError):
+        Downloader(retries=2, backoff=0).fetch(f"{server}/broken", dest)
+    assert list(tmp_path.iterdir()) == []
+    assert _Handler.requests_seen == [None, None]          # no resume of bad bytes
+
+    _Handler.cut_first = False
+    with pytest.raises(DownloadError):
+        Downloader(retries=1, backoff=0).fetch(f"{server}/ok.png", dest, sha256="0" * 64)
@@ -0,0 +1,104 @@
+# test_game_state.py
+
+import json
+import os
+
+import pytest
+
+from game.game_state import GameState
+
+
+@pytest.fixture
+def premise():
+    path = os.path.join(os.path.dirname(__file__), "..", "agents", "defaults", "default_premise.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch, premise):
+    # GameState loads/saves savegame.json from the working directory
+    monkeypatch.chdir(tmp_path)
+    st = GameState()
+    st.story_outline = premise
+    st.build_world_map()
+    return st
+
+
+def test_world_map_derived_from_key_locations(state, premise):
+    kl0 = premise["world_data"]["key_locations"][0]
+    region = kl0["location_name"]
+    sub0 = kl0["subareas"][0]["name"]
+    assert sub0 in state.world_map[region]
+    assert region in state.world_map[sub0]
+
+
+def test_record_location_reveals_neighbors_incrementally(state, premise):
+    kl0 = premise["world_data"]["key_locations"][0]
+    region = kl0["location_name"]
+    sub0 = kl0["subareas"][0]["name"]
+
+    state.record_location(sub0)
+    state.record_location(sub0)
+    assert state.visited_map_locations == [sub0]
+    assert state.is_visited(sub0)
+    assert state.is_revealed(region)
+
+    fresh = state.pop_newly_revealed()
+    assert fresh[0] == sub0 and region in fresh
+    assert state.pop_newly_revealed() == []
+
+    visited, revealed = state.get_revealed_map()
+    assert visited == {sub0}
+    assert revealed == {sub0, *state.world_map[sub0]}
+    assert isinstance(visited, frozenset) and isinstance(revealed, frozenset)
+    state.record_location(state.world_map[sub0][0])
+    assert visited == {sub0}                      # a snapshot, not the live index
+
+
+def test_indexes_rebuilt_after_load(state, premise):
+    kl1 = premise["world_data"]["key_locations"][1]
+    sub = kl1["subareas"][0]["name"]
+    assert state.record_backstory_visit(sub)
+    assert not state.record_backstory_visit(sub)
+    state.save_game()
+
+    reloaded = GameState()
+    assert reloaded.visited_by_backstory == [sub]
+    assert reloaded.is_visited(sub)
+    assert reloaded.is_revealed(kl1["location_name"])
+    assert reloaded.pop_newly_revealed() == []
+
+
+def test_save_while_background_images_arrive(state, tmp_path):
+    import threading
+
+    stop = threading.Event()
+
+    def fill():
+        i = 0
+        while not stop.is_set():
+            state.set_location_image(f"Subarea {i}", f"generated_images/{i}.jpg")
+            i += 1
+
+    worker = threading.Thread(target=fill)
+    worker.start()
+    try:
+        for _ in range(20):
+            state.save_game()
+            with open("savegame.json", "r", encoding="utf-8") as f:
+                assert isinstance(json.load(f)["location_images"], dict)
+    finally:
+        stop.set()
+        worker.join()
+    assert not list(tmp_path.glob("savegame.json.*.tmp"))
+
+
+def test_failed_save_keeps_previous_file(state):
+    state.save_game()
+    with open("savegame.json", "r", encoding="utf-8") as f:
+        before = f.read()
+    state.story_memory = {"bad": object()}       # not JSON-serialisable
+    state.save_game()
+    with open("savegame.json", "r", encoding="utf-8") as f:
+        assert f.read() == before
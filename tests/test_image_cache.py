@@ -0,0 +1,119 @@
+# test_image_cache.py
+
+import base64
+import json
+import os
+
+from agents.asset_manifest import AssetManifest
+from agents.image_agent import ImageAgent
+from agents.image_cache import ImageCache, normalize_prompt, premise_id
+from agents.image_pool import ImageProcessPool
+from agents.visual_change import major_visual_change
+
+from conftest import png
+
+
+def _file(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_key_ignores_formatting_but_not_content():
+    k = ImageCache.key("p1", "Great Hall", "Watercolor", "A dim hall, torches lit --ar 16:9")
+    assert k == ImageCache.key("p1", "great hall ", "watercolor", "a dim   hall torches lit.")
+    assert k != ImageCache.key("p2", "Great Hall", "Watercolor", "A dim hall, torches lit")
+    assert k != ImageCache.key("p1", "Great Hall", "Anime", "A dim hall, torches lit")
+    assert normalize_prompt("Foggy DOCKS, at night! --ar 16:9") == "foggy docks at night"
+
+
+def test_hits_persist_across_instances_and_lru_eviction(tmp_path):
+    root = str(tmp_path / "cache")
+    cache = ImageCache(root=root, quota_mb=2.5 / 1024)          # 2.5 KB
+    a = ImageCache.key("p", "hall", None, "a")
+    b = ImageCache.key("p", "hall", None, "b")
+    c = ImageCache.key("p", "hall", None, "c")
+    cache.put(a, _file(tmp_path, "a.jpg", 1024), "p", "hall", None, "a")
+    cache.put(b, _file(tmp_path, "b.jpg", 1024), "p", "hall", None, "b")
+    assert cache.get(a)                      # a is now more recent than b
+    cache.put(c, _file(tmp_path, "c.jpg", 1024), "p", "hall", None, "c")
+
+    again = ImageCache(root=root, quota_mb=2.5 / 1024)
+    assert again.get(b) is None
+    assert again.get(a).endswith(".jpg") and os.path.isfile(again.get(c))
+    stats = again.stats()
+    assert stats["entries"] == 2 and stats["bytes"] <= stats["quota_bytes"]
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_lookups_persist_lazily(tmp_path):
+    root = str(tmp_path / "cache")
+    cache = ImageCache(root=root)
+    a = ImageCache.key("p", "hall", None, "a")
+    cache.put(a, _file(tmp_path, "a.jpg", 10), "p", "hall", None, "a")
+    index = os.path.join(root, "index.json")
+    os.utime(index, (0, 0))
+
+    assert cache.get(a) and cache.get("missing") is None
+    assert cache.find_location("p", "Hall", None) and cache.find_location("p", "cellar", None) is None
+    cache.record_reuse()
+    assert os.path.getmtime(index) == 0          # nothing written by lookups
+    cache.flush()
+    stats = json.load(open(index))["stats"]
+    assert stats == {"hits": 2, "misses": 1, "reuses": 1}
+
+
+def _agent(tmp_path, monkeypatch, cache, calls):
+    def create(**kwargs):
+        calls.append(kwargs["prompt"])
+        return {"data": [{"b64_json": base64.b64encode(png()).decode()}]}
+
+    monkeypatch.setattr("openai.Image.create", create)
+    return ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), output_profile="compact",
+                      manifest=AssetManifest(str(tmp_path / "generated_images")), cache=cache,
+                      premise="p", response_format="b64_json")
+
+
+def test_hits_are_placed_outside_the_cache_and_survive_eviction(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache, calls = ImageCache(root=str(tmp_path / "cache")), []
+    agent = _agent(tmp_path, monkeypatch, cache, calls)
+    first = agent.generate_scene_image("A quiet harbor.", location="Docks", prompt="harbor", turn=1)
+    again = agent.generate_scene_image("A quiet harbor.", location="Docks", prompt="harbor", turn=2)
+    assert len(calls) == 1 and first != again
+    assert os.path.dirname(again) == os.path.dirname(first) == str(tmp_path / "generated_images")
+    assert agent.manifest.by_turn(2)[0]["timings"] == {"mode": "cache"}
+
+    cache.quota_bytes = 0                 # linked entries are pinned, copies never depended on it
+    cache._evict()
+    assert os.path.isfile(again)
+    if os.stat(again).st_nlink > 1:
+        assert cache.stats()["entries"] == 1
+
+
+def test_location_reuse_skips_the_prompt_call(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache, calls = ImageCache(root=str(tmp_path / "cache")), []
+    agent = _agent(tmp_path, monkeypatch, cache, calls)
+    agent.generate_scene_image("A quiet harbor.", location="Docks", prompt="quiet harbor boats", turn=1)
+
+    def no_prompt(*args):
+        raise AssertionError("prompt generated before the cache lookup")
+    monkeypatch.setattr(agent, "_generate_image_prompt", no_prompt)
+    seen = []
+    reused = agent.generate_scene_image("Boats bob in the harbor.", location="Docks", turn=2,
+                                        accept_cached=lambda p: seen.append(p) or True)
+    assert len(calls) == 1 and os.path.isfile(reused) and seen == ["quiet harbor boats"]
+
+    monkeypatch.setattr(agent, "_generate_image_prompt", lambda text, location: "stormy harbor")
+    fresh = agent.generate_scene_image("A storm breaks.", location="Docks", turn=3, accept_cached=lambda p: False)
+    assert len(calls) == 2 and fresh != reused
+
+
+def test_visual_change_and_premise_id():
+    assert not major_visual_change("The hall is quiet.", "Mara paces across the hall.")
+    assert major_visual_change("The hall is quiet.", "Night falls and a storm hammers the windows.")
+    assert not major_visual_change("A storm rages.", "The storm keeps raging.")
+    outline = {"world_data": {"world_name": "Aurion", "key_locations": [{"location_name": "Citadel"}]}}
+    assert premise_id(outline) == premise_id(dict(outline))
+    assert premise_id(outline) != premise_id({"world_data": {"world_name": "Other"}})
@@ -0,0 +1,76 @@
+# test_image_pool.py
+
+import threading
+import time
+
+from PIL import Image
+
+from agents.image_agent import ImageAgent
+from agents.image_pool import ImageProcessPool
+from agents.image_profiles import get_profile, render, render_portrait
+
+from conftest import png
+
+
+def test_render_runs_in_worker_process(tmp_path):
+    pool = ImageProcessPool(workers=1, max_pending=2)
+    try:
+        futures = [pool.submit(render, png((200, 120)), str(tmp_path / str(i)), get_profile("display"), (400, 240))
+                   for i in range(3)]
+        paths = [f.result(timeout=60) for f in futures]
+    finally:
+        pool.shutdown()
+    for path in paths:
+        with Image.open(path) as img:
+            assert img.size == (400, 240)
+    assert pool.pending == 0
+
+
+def test_workers_are_spawned_not_forked(monkeypatch):
+    seen = {}
+    monkeypatch.setattr("agents.image_pool.ProcessPoolExecutor", lambda **kw: seen.update(kw) or "executor")
+    assert ImageProcessPool(workers=1)._get_executor() == "executor"
+    assert seen["mp_context"].get_start_method() == "spawn"
+
+
+def _slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_queue_depth_is_bounded():
+    pool = ImageProcessPool(workers=0, max_pending=1)
+    gate = threading.Event()
+    holder = threading.Thread(target=lambda: pool.submit(gate.wait, 5))   # occupies the only slot
+    holder.start()
+    deadline = time.time() + 5
+    while pool.pending < 1:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    assert pool.submit(_slow, 0, timeout=0.05).result() == 0   # full → inline
+    assert pool.pending == 1
+
+    threading.Timer(0.2, gate.set).start()
+    started = time.perf_counter()
+    assert pool.submit(_slow, 0).result() == 0                 # waits for the slot
+    assert gate.is_set() and time.perf_counter() - started >= 0.15
+    holder.join(5)
+    assert pool.pending == 0
+
+
+def test_portrait_resize_and_agent_filenames(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = render_portrait(png((1024, 1024)), "portraits/a.png", 512)
+    with Image.open(path) as img:
+        assert img.size == (512, 512)
+    path = render_portrait(png((1024, 1024)), "portraits/b.png")
+    with Image.open(path) as img:
+        assert img.size == (1024, 1024)            # no limit by default
+
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), output_profile="compact")
+    names = [agent._next_filename() for _ in range(3)]
+    assert names == ["1", "2", "3"]
+    out = agent._postprocess_image(png((200, 120)), names[0])
+    assert out.endswith("1.jpg")
+    assert agent._next_filename() == "4"
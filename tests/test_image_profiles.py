@@ -0,0 +1,60 @@
+# test_image_profiles.py
+
+from PIL import Image
+
+from agents.image_profiles import (
+    PROFILES, benchmark, get_profile, pick_variant, render, render_portrait, target_size, variant_paths
+)
+
+from conftest import png
+
+
+def test_target_size_covers_display_and_respects_no_upscale():
+    display = get_profile("display")
+    assert target_size((1792, 1024), display, (1920, 1080)) == (1920, 1097)
+    assert target_size((1792, 1024), display, None) == (1792, 1024)
+    assert target_size((1792, 1024), get_profile("display-webp"), (3840, 2160)) == (1792, 1024)
+    assert target_size((1792, 1024), get_profile("legacy")) == (3584, 2048)
+
+
+def test_render_writes_profile_format(tmp_path):
+    raw = png((179, 102), (120, 80, 40))
+    for name in PROFILES:
+        path = render(raw, str(tmp_path / name), get_profile(name), (358, 204))
+        with Image.open(path) as img:
+            assert img.format == PROFILES[name]["format"]
+            assert img.mode == PROFILES[name]["mode"]
+            assert img.size == target_size((179, 102), get_profile(name), (358, 204))
+
+
+def test_profile_selection_and_quality_override(monkeypatch):
+    monkeypatch.setenv("IMAGE_OUTPUT_PROFILE", "compact")
+    monkeypatch.setenv("IMAGE_OUTPUT_QUALITY", "60")
+    assert get_profile()["name"] == "compact"
+    assert get_profile()["quality"] == 60
+    assert get_profile("source-png")["quality"] is None
+    assert get_profile("nope")["name"] == "display"
+
+
+def test_benchmark_reports_every_profile():
+    results = benchmark(png((179, 102), (120, 80, 40)), display_size=(358, 204), runs=1)
+    assert set(results) == set(PROFILES)
+    assert results["legacy"]["peak_mb"] >= results["compact"]["peak_mb"]
+    assert all(r["file_kb"] > 0 for r in results.values())
+
+
+def test_variants_and_nearest_pick(tmp_path):
+    path = render(png((1792, 1024)), str(tmp_path / "1"), get_profile("source-png"),
+                  variant_widths=(960, 1280, 1920))
+    assert sorted(variant_paths(path)) == [960, 1280]           # never wider than the image
+    with Image.open(variant_paths(path)[960]) as img:
+        assert img.size == (960, 549)
+
+    assert pick_variant(path, 900, 500) == variant_paths(path)[960]
+    assert pick_variant(path, 1200, 700) == variant_paths(path)[1280]     # 700 px high needs 1225 wide
+    assert pick_variant(path, 1600, 900) == path
+    assert pick_variant(path, 1200, 700, cover=False) == variant_paths(path)[1280]
+
+    portrait = render_portrait(png((1024, 1024)), str(tmp_path / "p" / "mara.png"), 512, (240, 480))
+    assert pick_variant(portrait, 220, 220) == str(tmp_path / "p" / "mara@240w.png")
+    assert pick_variant(portrait, 440, 440) == str(tmp_path / "p" / "mara@480w.png")
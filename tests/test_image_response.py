@@ -0,0 +1,99 @@
+# test_image_response.py
+
+import base64
+import os
+import shutil
+
+import openai
+
+from agents.asset_manifest import AssetManifest
+from agents.character_image_agent import CharacterImageAgent
+from agents.image_agent import ImageAgent
+from agents.image_pool import ImageProcessPool
+from agents.portrait_cache import PortraitCache
+
+from conftest import png
+
+
+class FakeDownloader:
+    def __init__(self, src):
+        self.src, self.urls = src, []
+
+    def fetch(self, url, dest):
+        self.urls.append(url)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(self.src, dest)
+        return dest
+
+
+def test_inline_payload_skips_the_download(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["response_format"])
+        return {"data": [{"b64_json": base64.b64encode(png()).decode()}]}
+
+    monkeypatch.setattr("openai.Image.create", create)
+    downloader = FakeDownloader(None)
+    manifest = AssetManifest(str(tmp_path / "generated_images"))
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), output_profile="compact",
+                       manifest=manifest, downloader=downloader, response_format="b64_json")
+
+    path = agent.generate_scene_image("A quiet harbor.", location="Docks", prompt="harbor", turn=2)
+    assert path.endswith("1.jpg") and calls == ["b64_json"] and downloader.urls == []
+    timings = manifest.by_turn(2)[0]["timings"]
+    assert timings["mode"] == "b64_json" and "decode" in timings and "download" not in timings
+    assert agent.timings[-1]["id"] == 1
+
+
+def test_rejected_inline_mode_falls_back_to_urls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    src = tmp_path / "src.png"
+    src.write_bytes(png())
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["response_format"])
+        if kwargs["response_format"] != "url":
+            raise openai.error.InvalidRequestError("response_format not supported", "response_format")
+        return {"data": [{"url": "https://images.example/1.png"}]}
+
+    monkeypatch.setattr("openai.Image.create", create)
+    downloader = FakeDownloader(str(src))
+    manifest = AssetManifest(str(tmp_path / "generated_images"))
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), manifest=manifest,
+                       downloader=downloader, response_format="b64_json")
+
+    agent.generate_scene_image("A quiet harbor.", prompt="harbor", turn=1)
+    agent.generate_scene_image("A stormy harbor.", prompt="storm", turn=2)
+    assert calls == ["b64_json", "url", "url"] and len(downloader.urls) == 2
+    assert manifest.by_turn(2)[0]["timings"]["mode"] == "url"
+    assert not list((tmp_path / "generated_images").glob("*.download"))
+
+    portraits = CharacterImageAgent(api_key="test", pool=ImageProcessPool(workers=0), downloader=downloader,
+                                    cache=PortraitCache(str(tmp_path / "portrait_cache")))
+    path = portraits.generate_character_image("Mara Vale", "a sailor", {})
+    assert path.startswith("character_portraits/mara_vale_") and os.path.isfile(path)
+    assert calls[-2:] == ["b64_json", "url"]
+
+
+def test_other_rejections_keep_the_inline_mode(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["response_format"])
+        raise openai.error.InvalidRequestError("Your request was rejected by the safety system", None)
+
+    monkeypatch.setattr("openai.Image.create", create)
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), output_profile="compact",
+                       manifest=AssetManifest(str(tmp_path / "generated_images")), response_format="b64_json")
+    path = agent.generate_scene_image("A quiet harbor.", prompt="harbor", turn=1)
+    assert os.path.isfile(path) and calls == ["b64_json"] and agent.response_format == "b64_json"
+
+    portraits = CharacterImageAgent(api_key="test", pool=ImageProcessPool(workers=0),
+                                    cache=PortraitCache(str(tmp_path / "portrait_cache")))
+    assert os.path.isfile(portraits.generate_character_image("Mara Vale", "a sailor", {}))
+    assert calls == ["b64_json", "b64_json"] and portraits.response_format == "b64_json"
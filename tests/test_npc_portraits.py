@@ -0,0 +1,82 @@
+# test_npc_portraits.py
+
+import threading
+
+import pytest
+
+from game.game_state import GameState
+
+
+OUTLINE = {
+    "npcs": [
+        {"id": "npc1", "name": "Mara Vale", "description": "a sailor", "visual_description": "weathered sailor"},
+        {"id": "npc2", "name": "Corwin Ashdown", "description": "a scholar"},
+        {"id": "npc3", "name": "Ysolde", "description": "a smuggler"},
+    ],
+    "plot_outline": {"five_act_plan": [{"tie_npc": "npc2"}, {"tie_npc": "npc3"}]},
+}
+
+
+class FakePortraitAgent:
+    def __init__(self, tmp_path, gate=None):
+        self.tmp_path, self.gate, self.names = tmp_path, gate, []
+
+    def generate_character_image(self, name, description, traits, visual_description=None, size=None):
+        if self.gate:
+            self.gate.wait(5)
+        self.names.append(name)
+        path = self.tmp_path / f"{name}.png"
+        path.write_bytes(b"x")
+        return str(path)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("IMAGE_CACHE_MB", "0")
+    from main import GameEngine
+    eng = GameEngine()
+    eng.state = GameState()
+    eng.state.story_outline = OUTLINE
+    eng.state.current_party = ["npc1"]
+    return eng
+
+
+def test_prefetch_covers_party_and_tie_npc_only(engine, tmp_path):
+    engine._char_image_agent = agent = FakePortraitAgent(tmp_path)
+    engine._prefetch_npc_portraits()
+    for future in list(engine._npc_portraits.values()):
+        future.result(timeout=5)
+
+    assert sorted(agent.names) == ["Corwin Ashdown", "Mara Vale"]
+    assert set(engine.state.character_image_urls) == {"Corwin Ashdown", "Mara Vale"}
+
+
+def test_speaker_portrait_is_generated_once_on_first_appearance(engine, tmp_path):
+    gate = threading.Event()
+    engine._char_image_agent = agent = FakePortraitAgent(tmp_path, gate)
+
+    first = engine.request_portrait("Ysolde")
+    assert first is not None and not first.done()        # the line is shown meanwhile
+    assert engine.request_portrait("Ysolde") is first
+    gate.set()
+    assert first.result(timeout=5) == str(tmp_path / "Ysolde.png")
+    assert agent.names == ["Ysolde"]
+
+    # known portraits (also by first name) resolve at once; strangers get none
+    assert engine.request_portrait("Ysolde the Quick").result() == str(tmp_path / "Ysolde.png")
+    assert engine.request_portrait("Town Crier") is None
+
+
+def test_concurrent_portraits_are_all_kept(engine, tmp_path):
+    import threading
+
+    engine._char_image_agent = FakePortraitAgent(tmp_path)
+    names = [f"Extra {i}" for i in range(40)]
+    threads = [threading.Thread(target=engine._generate_portrait, args=(n, "", {}, None)) for n in names]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert set(names) <= set(engine.state.character_image_urls)
@@ -0,0 +1,119 @@
+# test_portrait_cache.py
+
+import base64
+import os
+
+from PIL import Image
+
+from agents.character_image_agent import CharacterImageAgent
+from agents.image_pool import ImageProcessPool
+from agents.portrait_cache import PortraitCache, reuse_for_premise
+
+from conftest import png
+
+
+def _agent(cache, reuse):
+    return CharacterImageAgent(api_key="test", pool=ImageProcessPool(workers=0), cache=cache,
+                               reuse_cached=reuse, genre="Fantasy", artstyle="Watercolor")
+
+
+def test_reuse_skips_dalle_and_names_stay_distinct(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["prompt"])
+        return {"data": [{"b64_json": base64.b64encode(png((64, 64))).decode()}]}
+
+    monkeypatch.setattr("openai.Image.create", create)
+    cache = PortraitCache(str(tmp_path / "portrait_cache"))
+
+    first = _agent(cache, reuse=True).generate_character_image("Bram", "a smith", {}, "burly smith, soot")
+    other = _agent(cache, reuse=True).generate_character_image("Bram", "a priest", {}, "thin priest, robes")
+    assert first != other and os.path.isfile(first) and os.path.isfile(other)
+    assert len(calls) == 2
+
+    # a new session with the same description takes the cached portrait
+    os.remove(first)
+    again = _agent(PortraitCache(str(tmp_path / "portrait_cache")), reuse=True)
+    assert again.generate_character_image("Bram", "a smith", {}, "burly  smith, soot") == first
+    assert len(calls) == 2 and os.path.isfile(first)
+
+    # without reuse the model is asked again
+    _agent(cache, reuse=False).generate_character_image("Bram", "a smith", {}, "burly smith, soot")
+    assert len(calls) == 3
+
+
+def test_linked_portraits_survive_archiving_and_eviction(tmp_path):
+    src = tmp_path / "bram.png"
+    src.write_bytes(png((64, 64)))
+    cache = PortraitCache(str(tmp_path / "cache"), quota_mb=0)
+    shared = PortraitCache.key("burly smith", "Fantasy", None, "1024x1024")
+    cache.put(shared, str(src))
+    run = tmp_path / "character_portraits" / "bram_1.png"
+    cache.place(shared, str(run))
+    os.remove(src)
+    assert cache.refcount(shared) == 1
+
+    # archiving moves the run's link; the cached file stays referenced
+    archived = tmp_path / "archive" / "bram_1.png"
+    archived.parent.mkdir()
+    os.replace(run, archived)
+    assert cache.refcount(shared) == 1
+
+    # over quota: only entries nobody links to are dropped
+    lone = tmp_path / "lone.png"
+    lone.write_bytes(png((64, 64), "red"))
+    unused = PortraitCache.key("old sailor", "Fantasy", None, "1024x1024")
+    cache.put(unused, str(lone))
+    os.remove(lone)
+    cache.put(PortraitCache.key("young guard", "Fantasy", None, "1024x1024"), str(archived))
+    assert cache.get(unused) is None
+    assert cache.get(shared) and cache.stats()["shared"] >= 1
+
+
+def test_lookups_do_not_rewrite_the_index(tmp_path):
+    src = tmp_path / "bram.png"
+    src.write_bytes(png((64, 64)))
+    cache = PortraitCache(str(tmp_path / "cache"))
+    key = PortraitCache.key("burly smith", "Fantasy", None, "1024x1024")
+    cache.put(key, str(src))
+    index = tmp_path / "cache" / "index.json"
+    os.utime(index, (0, 0))
+
+    assert cache.get(key) and cache.get("missing") is None
+    assert os.path.getmtime(index) == 0
+    cache.flush()
+    again = PortraitCache(str(tmp_path / "cache")).stats()
+    assert again["hits"] == 1 and again["misses"] == 1 and again["entries"] == 1
+
+
+def test_reuse_policy(monkeypatch):
+    monkeypatch.delenv("PORTRAIT_CACHE_REUSE", raising=False)
+    assert reuse_for_premise("default") and not reuse_for_premise("custom") and not reuse_for_premise(None)
+    monkeypatch.setenv("PORTRAIT_CACHE_REUSE", "always")
+    assert reuse_for_premise("custom")
+    monkeypatch.setenv("PORTRAIT_CACHE_REUSE", "never")
+    assert not reuse_for_premise("default")
+
+
+def test_regenerating_a_placed_portrait_leaves_shared_copies_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    colour = {"value": "navy"}
+    monkeypatch.setattr("openai.Image.create",
+                        lambda **kw: {"data": [{"b64_json": base64.b64encode(png((64, 64), colour["value"])).decode()}]})
+    cache = PortraitCache(str(tmp_path / "portrait_cache"))
+    first = _agent(cache, reuse=True).generate_character_image("Bram", "a smith", {}, "burly smith")
+    key = PortraitCache.key("burly smith", "Fantasy", "Watercolor", "512x512")
+
+    archived = tmp_path / "archived.png"
+    os.link(first, archived)
+    colour["value"] = "red"
+    again = _agent(cache, reuse=False).generate_character_image("Bram", "a smith", {}, "burly smith")
+    assert again == first
+
+    with Image.open(archived) as img:
+        assert img.getpixel((0, 0))[:3] == (0, 0, 128)
+    with Image.open(again) as img:
+        assert img.getpixel((0, 0))[:3] == (255, 0, 0)
+    assert cache.refcount(key) >= 1
@@ -0,0 +1,97 @@
+# test_premise_pool.py
+
+import os
+import threading
+import time
+
+import pytest
+
+from agents.premise_pool import PremisePool
+
+
+class FakePremiseAgent:
+    """Stands in for PremiseAgent; tracks how many generations run at once."""
+    lock = threading.Lock()
+    running = peak = calls = 0
+
+    def __init__(self, api_key=None, state=None):
+        self.state = state
+
+    def generate_premise(self, fallback=True):
+        cls = FakePremiseAgent
+        with cls.lock:
+            cls.calls += 1
+            cls.running += 1
+            cls.peak = max(cls.peak, cls.running)
+        try:
+            time.sleep(0.02)
+            return {"title": f"A {self.state.selected_genre} tale", "genre": self.state.selected_genre}
+        finally:
+            with cls.lock:
+                cls.running -= 1
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    monkeypatch.setattr("agents.premise_pool.PremiseAgent", FakePremiseAgent)
+    FakePremiseAgent.running = FakePremiseAgent.peak = FakePremiseAgent.calls = 0
+    return FakePremiseAgent
+
+
+def _wait_for(pool, genre, count):
+    deadline = time.time() + 5
+    while pool.available(genre) < count or pool._inflight.get(pool.normalize_genre(genre)):
+        assert time.time() < deadline, "refill did not finish"
+        time.sleep(0.01)
+
+
+def test_refill_respects_size_and_concurrency(tmp_path, fake_agent):
+    pool = PremisePool(library_dir=str(tmp_path), size=3, concurrency=2)
+    pool.refill(["Fantasy", "sci-fi"])
+    pool.refill("fantasy")                       # in-flight work counts toward the size
+    _wait_for(pool, "fantasy", 3)
+    _wait_for(pool, "sci-fi", 3)
+    assert fake_agent.calls == 6 and fake_agent.peak <= 2
+
+    pool.refill("fantasy")                       # already full
+    time.sleep(0.05)
+    assert fake_agent.calls == 6 and pool.available("fantasy") == 3
+
+
+def test_take_hands_out_and_removes_a_premise(tmp_path, fake_agent):
+    pool = PremisePool(library_dir=str(tmp_path), size=1)
+    assert pool.take("horror") is None
+    pool.refill("Horror")
+    _wait_for(pool, "horror", 1)
+    stored = os.path.join(str(tmp_path), pool._index["horror"][0]["file"])
+
+    premise = pool.take(" HORROR ")
+    assert premise == {"title": "A horror tale", "genre": "horror"}
+    assert not os.path.exists(stored) and pool.available("horror") == 0
+    assert pool.take("horror") is None
+
+
+def test_index_round_trip(tmp_path, fake_agent):
+    pool = PremisePool(library_dir=str(tmp_path), size=2)
+    pool.refill("mystery", artstyle="noir")
+    _wait_for(pool, "mystery", 2)
+
+    again = PremisePool(library_dir=str(tmp_path))
+    assert again.available("mystery") == 2
+    assert [e["artstyle"] for e in again._index["mystery"]] == ["noir", "noir"]
+    os.remove(os.path.join(str(tmp_path), again._index["mystery"][0]["file"]))
+    assert PremisePool(library_dir=str(tmp_path)).available("mystery") == 1   # missing file dropped
+    assert again.take("mystery")["genre"] == "mystery"
+
+
+def test_genre_cannot_escape_the_library(tmp_path, fake_agent):
+    library = tmp_path / "library"
+    pool = PremisePool(library_dir=str(library), size=1)
+    for genre in ("../../etc", "a/b\\c", "c:drive"):
+        pool.refill(genre)
+        _wait_for(pool, genre, 1)
+        rel = pool._index[pool.normalize_genre(genre)][0]["file"]
+        path = os.path.realpath(os.path.join(str(library), rel))
+        assert os.path.dirname(path) != str(library.resolve())
+        assert os.path.dirname(os.path.dirname(path)) == str(library.resolve())
+        assert pool.take(genre)["genre"] == pool.normalize_genre(genre)
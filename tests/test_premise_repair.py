@@ -0,0 +1,52 @@
+# test_premise_repair.py
+
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from agents.premise_agent import PremiseAgent
+
+from conftest import FakeChat
+
+
+@pytest.fixture
+def agent():
+    state = SimpleNamespace(selected_genre="fantasy", story_outline=None)
+    ag = PremiseAgent(api_key="test", state=state)
+    return ag
+
+
+def _broken(agent):
+    outline = copy.deepcopy(agent._load_default())
+    outline["player_backstory"]["starting_traits"]["bravery"] = 9        # > maximum
+    outline["plot_outline"]["five_act_plan"][0]["scenes_count"] = "20"   # string for int
+    outline["plot_outline"]["five_act_plan"][1]["tie_npc"] = "NPC2"       # wrong casing
+    del outline["npcs"][2]["goal"]                                        # needs the model
+    return outline
+
+
+def test_local_fixes_leave_only_model_errors(agent):
+    outline = _broken(agent)
+    errors = agent._local_fix(outline, list(agent._validator().iter_errors(outline)))
+    assert [list(e.absolute_path) for e in errors] == [["npcs", 2]]
+    assert outline["player_backstory"]["starting_traits"]["bravery"] == 5
+    assert outline["plot_outline"]["five_act_plan"][0]["scenes_count"] == 20
+    assert outline["plot_outline"]["five_act_plan"][1]["tie_npc"] == "npc2"
+    assert agent._repair_targets(errors) == [["npcs", 2]]
+
+
+def test_generate_premise_repairs_only_failing_subtree(agent, monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    broken = _broken(agent)
+    fixed_npc = dict(agent._load_default()["npcs"][2])
+    agent.client = SimpleNamespace(ChatCompletion=FakeChat([broken, {"fix_0": fixed_npc}]))
+
+    outline = agent.generate_premise()
+
+    calls = agent.client.ChatCompletion.calls
+    assert len(calls) == 2
+    assert calls[1]["function_call"] == {"name": "repair_story_premise"}
+    assert list(calls[1]["functions"][0]["parameters"]["properties"]) == ["fix_0"]
+    assert outline["npcs"][2] == fixed_npc
+    assert not list(agent._validator().iter_errors(outline))
@@ -0,0 +1,119 @@
+# test_premise_sectioned.py
+
+import copy
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agents.premise_agent import PremiseAgent
+
+from conftest import FakeChat
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    state = SimpleNamespace(selected_genre="fantasy", story_outline=None, current_location=None)
+    return PremiseAgent(api_key="test", state=state)
+
+
+def _answers(default):
+    world = default["world_data"]
+    answers = {
+        "generate_premise_skeleton": {
+            "world_name": world["world_name"],
+            "world_overview": world["world_overview"],
+            "locations": [{"location_name": l["location_name"],
+                           "subarea_names": [s["name"] for s in l["subareas"]]} for l in world["key_locations"]],
+            "factions": [f["name"] for f in world["factions"]],
+            "mysteries": [{"id": m["id"], "summary": m["prompt"]} for m in default["mysteries"]],
+            "npcs": [{"id": n["id"], "name": n["name"], "role": n["role"]} for n in default["npcs"]],
+            "player_name": default["player_backstory"]["name"],
+        }
+    }
+    for name, (path, _) in PremiseAgent.SECTIONS.items():
+        value = default
+        for key in path:
+            value = value[key]
+        answers[f"write_{name}"] = {name: copy.deepcopy(value)}
+    return answers
+
+
+def test_skeleton_then_sections_assemble_a_valid_premise(agent):
+    default = agent._load_default()
+    agent.client = SimpleNamespace(ChatCompletion=FakeChat(_answers(default)))
+    seen = []
+
+    outline = agent.generate_premise_sectioned(on_section=lambda name, data: seen.append(name))
+
+    names = [c["function_call"]["name"] for c in agent.client.ChatCompletion.calls]
+    assert names[0] == "generate_premise_skeleton" and len(names) == 7
+    assert seen[0] == "skeleton" and sorted(seen[1:]) == sorted(PremiseAgent.SECTIONS)
+    assert outline["npcs"] == default["npcs"]
+    assert outline["plot_outline"]["five_act_plan"] == default["plot_outline"]["five_act_plan"]
+    assert outline["world_data"]["world_name"] == default["world_data"]["world_name"]
+    assert agent.state.story_outline is outline and agent.state.current_location
+    assert not list(agent._validator().iter_errors(outline))
+
+
+def test_invalid_section_is_repaired_in_place(agent):
+    default = agent._load_default()
+    answers = _answers(default)
+    del answers["write_npcs"]["npcs"][2]["goal"]
+    answers["repair_story_premise"] = {"fix_0": default["npcs"][2]}
+    agent.client = SimpleNamespace(ChatCompletion=FakeChat(answers))
+
+    outline = agent.generate_premise_sectioned()
+
+    calls = agent.client.ChatCompletion.calls
+    assert [c["function_call"]["name"] for c in calls].count("repair_story_premise") == 1
+    assert list(calls[-1]["functions"][0]["parameters"]["properties"]) == ["fix_0"]
+    assert outline["npcs"][2] == default["npcs"][2]
+    assert not list(agent._validator().iter_errors(outline))
+
+
+def test_failed_section_falls_back_to_full_generation(agent, monkeypatch):
+    answers = _answers(agent._load_default())
+
+    def broken(kwargs):
+        raise ValueError("bad arguments")
+    answers["write_factions"] = broken
+    agent.client = SimpleNamespace(ChatCompletion=FakeChat(answers))
+    monkeypatch.setattr(agent, "generate_premise", lambda **kw: {"full": kw})
+
+    assert agent.generate_premise_sectioned(fallback=False) == {"full": {"fallback": False, "deadline": 0}}
+    names = [c["function_call"]["name"] for c in agent.client.ChatCompletion.calls]
+    assert names.count("write_factions") == 2
+
+
+def test_deadline_caps_sections_and_falls_back_to_procedural(agent, monkeypatch):
+    release = threading.Event()
+    answers = _answers(agent._load_default())
+    npcs = answers["write_npcs"]
+
+    def stuck(kwargs):
+        release.wait(5)
+        return npcs
+    answers["write_npcs"] = stuck
+    agent.client = SimpleNamespace(ChatCompletion=FakeChat(answers))
+    monkeypatch.setattr(agent, "generate_premise", lambda **kw: pytest.fail("full generation past the deadline"))
+    monkeypatch.setattr(agent, "generate_procedural", lambda: {"procedural": True})
+
+    started = time.monotonic()
+    try:
+        outline = agent.generate_premise_sectioned(deadline=1.5)
+    finally:
+        release.set()
+    assert outline == {"procedural": True}
+    assert time.monotonic() - started < 3
+    assert all(c["request_timeout"] <= 1.5 for c in agent.client.ChatCompletion.calls)
+
+
+def test_deadline_defaults_to_the_environment(agent, monkeypatch):
+    monkeypatch.setenv("PREMISE_DEADLINE_SECONDS", "30")
+    agent.client = SimpleNamespace(ChatCompletion=FakeChat(_answers(agent._load_default())))
+    agent.generate_premise_sectioned()
+    timeouts = [c["request_timeout"] for c in agent.client.ChatCompletion.calls]
+    assert len(timeouts) == 7 and all(t <= 30 for t in timeouts)
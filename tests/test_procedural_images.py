@@ -0,0 +1,93 @@
+# test_procedural_images.py
+
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from agents.asset_manifest import AssetManifest
+from agents.character_image_agent import CharacterImageAgent
+from agents.image_agent import ImageAgent
+from agents.image_cache import ImageCache
+from agents.image_pool import ImageProcessPool
+from agents.portrait_cache import PortraitCache
+from agents.procedural_images import background, palette, portrait
+from game.game_state import GameState
+
+
+def test_renders_are_deterministic_and_input_dependent():
+    assert palette("Rain over the harbor docks", "Docks") == palette("Rain over the harbor docks", "Docks")
+    dark, light = palette("the crypt at midnight"), palette("a sunny meadow")
+    assert sum(map(sum, dark)) < sum(map(sum, light))
+
+    a = np.asarray(background("Rain over the harbor", "Docks", (640, 360)))
+    assert a.shape == (360, 640, 3)
+    assert np.array_equal(a, np.asarray(background("Rain over the harbor", "Docks", (640, 360))))
+    assert not np.array_equal(a, np.asarray(background("Rain over the harbor", "Citadel", (640, 360))))
+
+    mara, corwin = portrait("Mara Stormwind", size=128), portrait("Corwin Ashdown", size=128)
+    assert mara.size == (128, 128) and mara.tobytes() != corwin.tobytes()
+
+
+def test_failed_generation_falls_back_without_caching(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def create(**kwargs):
+        raise RuntimeError("service unavailable")
+
+    monkeypatch.setattr("openai.Image.create", create)
+    cache = ImageCache(root=str(tmp_path / "cache"))
+    manifest = AssetManifest(str(tmp_path / "generated_images"))
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), output_profile="compact",
+                       cache=cache, premise="p", manifest=manifest)
+
+    path = agent.generate_scene_image("Rain over the harbor docks.", location="Docks", prompt="docks", turn=4)
+    assert os.path.isfile(path) and path.endswith("1.jpg")
+    assert manifest.by_turn(4)[0]["timings"]["mode"] == "procedural"
+    assert cache.stats()["entries"] == 0
+
+    portrait_cache = PortraitCache(str(tmp_path / "portrait_cache"))
+    portraits = CharacterImageAgent(api_key="test", pool=ImageProcessPool(workers=0), cache=portrait_cache)
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    portrait_path = portraits.generate_character_image("Mara Stormwind", "a sailor", {})
+    stem = portrait_path[:-len(".png")]
+    assert stem.startswith(os.path.join("character_portraits", "mara_stormwind_"))
+    assert os.path.isfile(portrait_path) and os.path.isfile(f"{stem}@240w.png")
+    assert portrait_cache.stats()["entries"] == 0
+
+
+def test_offline_backend_makes_no_api_calls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("IMAGE_BACKEND", "procedural")
+    monkeypatch.setattr("openai.Image.create", lambda **kw: pytest.fail("API called"))
+    monkeypatch.setattr("openai.ChatCompletion.create", lambda **kw: pytest.fail("API called"))
+
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0))
+    started = time.perf_counter()
+    assert os.path.isfile(agent.generate_scene_image("A quiet inn.", location="Inn"))
+    assert os.path.isfile(CharacterImageAgent(api_key="test").generate_character_image("Bram", "a smith", {}))
+    assert time.perf_counter() - started < 5
+
+
+def test_engine_deadline_serves_a_procedural_background(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("IMAGE_CACHE_MB", "0")
+    monkeypatch.setenv("IMAGE_DEADLINE_SECONDS", "0.2")
+    from main import GameEngine
+    engine = GameEngine()
+    engine.state = GameState()
+    engine.state.last_scene_text = "Fog rolls across the empty docks."
+
+    release = threading.Event()
+    real = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), output_profile="compact")
+    real.generate_scene_image = lambda text, location=None, turn=None: release.wait(5) and "late.jpg"
+    engine._image_agent = real
+
+    started = time.perf_counter()
+    path = engine.get_current_image_path()
+    release.set()
+    assert time.perf_counter() - started < 3
+    assert os.path.isfile(path) and engine._asset_manifest.latest()["timings"]["mode"] == "procedural"
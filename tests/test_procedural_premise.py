@@ -0,0 +1,68 @@
+# test_procedural_premise.py
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agents.premise_agent import PremiseAgent
+from agents.procedural_premise import GENRE_TABLES, ProceduralPremiseGenerator, match_genre
+
+
+@pytest.fixture
+def agent():
+    state = SimpleNamespace(selected_genre="sci-fi", story_outline=None, current_location=None)
+    return PremiseAgent(api_key="test", state=state)
+
+
+@pytest.mark.parametrize("genre", ["fantasy", "Sci-Fi", "noir mystery", "gothic horror", "romance", None])
+def test_premises_validate_for_many_seeds(agent, genre):
+    validator = agent._validator()
+    for seed in range(50):
+        outline = ProceduralPremiseGenerator(genre, seed).generate()
+        errors = list(validator.iter_errors(outline))
+        assert not errors, f"{genre}/{seed}: {errors[0].message}"
+
+        npc_ids = {n["id"] for n in outline["npcs"]}
+        origin = outline["player_backstory"]["origin_story"]
+        assert any(i in origin for i in npc_ids)
+        assert any(m["id"] in origin for m in outline["mysteries"])
+        subareas = [s["name"] for kl in outline["world_data"]["key_locations"] for s in kl["subareas"]]
+        assert len(subareas) == len(set(subareas))
+
+
+def test_same_seed_same_world_and_genre_matching():
+    a = ProceduralPremiseGenerator("fantasy", 7).generate()
+    assert a == ProceduralPremiseGenerator("fantasy", 7).generate()
+    assert a != ProceduralPremiseGenerator("fantasy", 8).generate()
+    assert match_genre("Cyberpunk thriller") == "scifi"
+    assert match_genre("Victorian detective") == "mystery"
+    assert match_genre("something else") == "fantasy"
+    assert set(GENRE_TABLES) == {"fantasy", "scifi", "mystery", "horror"}
+
+
+def test_generation_takes_milliseconds():
+    started = time.perf_counter()
+    for seed in range(20):
+        ProceduralPremiseGenerator("horror", seed).generate()
+    assert (time.perf_counter() - started) / 20 < 0.05
+
+
+def test_generate_procedural_sets_state(agent):
+    outline = agent.generate_procedural(seed=3)
+    assert agent.state.story_outline is outline
+    assert agent.state.current_location == outline["current_location"]
+
+
+def test_exhausted_deadline_falls_back_to_procedural(agent):
+    class Unreachable:
+        @staticmethod
+        def create(**kwargs):
+            raise AssertionError("no request should start past the deadline")
+
+    agent.client = SimpleNamespace(ChatCompletion=Unreachable)
+    outline = agent.generate_premise(deadline=0.5)
+
+    assert outline["world_data"]["world_name"] != agent._load_default()["world_data"]["world_name"]
+    assert not list(agent._validator().iter_errors(outline))
+    assert agent.generate_premise(deadline=0.5, fallback=False) is None
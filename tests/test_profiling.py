@@ -0,0 +1,123 @@
+# test_profiling.py
+
+import threading
+
+from agents.profiling_agent import PlayerProfilingAgent
+from game.game_state import GameState
+from game.scheduler import JobScheduler
+
+from conftest import FakeChat
+
+
+class FakeAnalyst(FakeChat):
+    """Answers every analysis request with "analysis N"; optionally blocks or fails."""
+    def __init__(self, gate=None, fail=False):
+        super().__init__(self._analyse)
+        self.gate, self.fail = gate, fail
+
+    def _analyse(self, request):
+        if self.gate:
+            self.gate.wait(5)
+        if self.fail:
+            raise TimeoutError("no answer")
+        return f"analysis {len(self.calls)}"
+
+
+def _agent(monkeypatch, every, chat, state=None):
+    monkeypatch.setenv("PERSONALITY_ANALYSIS_EVERY", str(every))
+    monkeypatch.setattr("openai.ChatCompletion.create", chat)
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    if state is None:
+        state = GameState()
+        state.player_profile = {"bravery": 5.0, "empathy": 5.0}
+    agent = PlayerProfilingAgent(state)
+    agent._scheduler = JobScheduler(workers=2, reserve=0)
+    return agent
+
+
+def _choose(agent, text):
+    agent.update_profile(0, [text], f"Scene before '{text}'", deltas={"bravery": 0.1})
+
+
+def test_pending_choices_collapse_into_one_call(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chat = FakeAnalyst()
+    agent = _agent(monkeypatch, 3, chat)
+    _choose(agent, "Open the door")
+    _choose(agent, "Draw your sword")
+    assert agent.schedule_analysis() is None
+    _choose(agent, "Step inside")
+
+    assert agent.schedule_analysis().result(timeout=5) == "analysis 1"
+    assert len(chat.prompts) == 1
+    assert all(c in chat.prompts[0] for c in ("Open the door", "Draw your sword", "Step inside"))
+    assert "'bravery': 5.0" in chat.prompts[0]          # profile from before the first choice
+    assert agent.state.last_personality_analysis == "analysis 1"
+    assert not agent.has_pending_analysis()
+
+
+def test_zero_means_on_demand_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chat = FakeAnalyst()
+    agent = _agent(monkeypatch, 0, chat)
+    for text in ("Open the door", "Draw your sword", "Step inside"):
+        _choose(agent, text)
+        assert agent.schedule_analysis() is None
+    assert chat.prompts == [] and agent.has_pending_analysis()
+
+    assert agent.refresh_analysis().result(timeout=5) == "analysis 1"
+    assert len(chat.prompts) == 1 and agent.refresh_analysis() is None
+
+
+def test_refresh_reuses_the_request_in_flight(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    gate = threading.Event()
+    chat = FakeAnalyst(gate)
+    agent = _agent(monkeypatch, 0, chat)
+    _choose(agent, "Open the door")
+    first = agent.refresh_analysis()
+    _choose(agent, "Draw your sword")
+    assert agent.refresh_analysis() is first
+    gate.set()
+    first.result(timeout=5)
+
+    assert len(chat.prompts) == 1 and agent.has_pending_analysis()
+    second = agent.refresh_analysis()
+    assert second is not first and second.result(timeout=5) == "analysis 2"
+    assert "Draw your sword" in chat.prompts[1] and "Open the door" not in chat.prompts[1]
+
+
+def test_failed_analysis_requeues_its_choices(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chat = FakeAnalyst(fail=True)
+    agent = _agent(monkeypatch, 2, chat)
+    agent.state.last_personality_analysis = "earlier"
+    _choose(agent, "Open the door")
+    _choose(agent, "Draw your sword")
+
+    assert agent.schedule_analysis().result(timeout=5) == ""
+    assert agent.state.last_personality_analysis == "earlier"
+    assert [c for c, _ in agent.state.pending_analysis] == ["Open the door", "Draw your sword"]
+
+    chat.fail = False
+    _choose(agent, "Step inside")
+    assert agent.schedule_analysis().result(timeout=5)
+    assert all(c in chat.prompts[-1] for c in ("Open the door", "Draw your sword", "Step inside"))
+    assert "'bravery': 5.0" in chat.prompts[-1]
+
+
+def test_pending_choices_survive_a_save_and_resume(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chat = FakeAnalyst()
+    agent = _agent(monkeypatch, 0, chat)
+    _choose(agent, "Open the door")
+    _choose(agent, "Draw your sword")         # update_profile() saves the game
+
+    resumed = _agent(monkeypatch, 0, chat, state=GameState())
+    assert resumed.has_pending_analysis()
+    assert resumed.refresh_analysis().result(timeout=5) == "analysis 1"
+    assert all(c in chat.prompts[0] for c in ("Open the door", "Draw your sword"))
+    assert "'bravery': 5.0" in chat.prompts[0]
+    resumed.state.save_game()
+    again = GameState()
+    assert again.pending_analysis == [] and again.last_personality_analysis == "analysis 1"
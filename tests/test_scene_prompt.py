@@ -0,0 +1,48 @@
+# test_scene_prompt.py
+
+from agents.image_agent import ImageAgent
+from agents.image_pool import ImageProcessPool
+from agents.scene_prompt import MAX_PROMPT_CHARS, ScenePromptExtractor
+from game.game_state import GameState
+
+from conftest import FakeChat
+
+HALL = ('The great hall is lit by torches. Long oak tables stretch beneath faded banners.\n'
+        'Mara: "We should leave before the storm."')
+
+
+def test_phrases_come_from_narration_only():
+    extractor = ScenePromptExtractor(min_confidence=0.5)
+    result = extractor.extract(HALL, "Great Hall", "A vaulted hall with a cold hearth.", ["Mara Stormwind"])
+    assert result["phrases"] == ["cold hearth", "great hall", "torches", "long oak tables", "faded banners"]
+    assert result["atmosphere"]["weather"] == []            # "storm" was only in dialogue
+    assert result["prompt"].startswith("Close-up view of Great Hall:")
+    assert result["prompt"].endswith("--ar 16:9") and result["confidence"] == 1.0
+
+    docks = extractor.extract("Rain lashes the harbor docks in the eerie moonlight.", "Docks")
+    assert docks["phrases"] == ["harbor docks"]
+    assert "moonlight lighting; rain; eerie mood" in docks["prompt"]
+
+
+def test_prompt_stays_under_the_limit():
+    text = ". ".join(f"A {adj} {noun}" for adj in ("dusty", "cracked", "ornate", "carved", "rusty")
+                     for noun in ("table", "chair", "door", "window", "pillar", "statue", "barrel",
+                                  "crate", "lantern", "banner", "mirror", "carpet", "fountain", "altar"))
+    result = ScenePromptExtractor().extract(text, "Storeroom", "A cramped storeroom with shelves and crates.")
+    assert len(result["prompt"]) < MAX_PROMPT_CHARS and result["prompt"].endswith("--ar 16:9")
+
+
+def test_agent_uses_the_model_only_on_low_confidence(monkeypatch):
+    chat = FakeChat(["Dim tavern interior with a worn bar counter --ar 16:9"])
+    monkeypatch.setattr("openai.ChatCompletion.create", chat)
+    state = GameState()
+    state.world_map_hierarchy = {"Hall": {"name": "Hall", "description": "A vaulted hall with a cold hearth.",
+                                          "type": "subarea", "region": "Citadel"}}
+    state.companion_name = "Mara Stormwind"
+    agent = ImageAgent(api_key="test", pool=ImageProcessPool(workers=0), state=state)
+
+    prompt = agent._generate_image_prompt(HALL, "Hall")
+    assert chat.calls == [] and "cold hearth" in prompt and "mara" not in prompt.lower()
+
+    prompt = agent._generate_image_prompt('Mara: "Where were you?"\nMara shrugs in the tavern.', "Tavern")
+    assert len(chat.calls) == 1 and prompt.startswith("Dim tavern")
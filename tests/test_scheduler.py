@@ -0,0 +1,107 @@
+# test_scheduler.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from game.scheduler import BACKGROUND, INTERACTIVE, PREFETCH, JobScheduler, current_priority, inherit_priority
+
+
+def _blocker(gate, log, name):
+    def run():
+        gate.wait(5)
+        log.append(name)
+        return name
+    return run
+
+
+def test_interactive_jobs_skip_the_queue_and_keep_a_worker():
+    sched = JobScheduler(workers=2, reserve=1)
+    gate, log = threading.Event(), []
+    background = sched.submit_as(BACKGROUND, _blocker(gate, log, "background"))
+    prefetch = sched.submit_as(PREFETCH, _blocker(gate, log, "prefetch"))
+    time.sleep(0.05)
+    assert sched.metrics()["classes"][PREFETCH]["queued"] == 1     # the last worker is held back
+
+    scene = sched.submit_as(INTERACTIVE, lambda: log.append("scene") or "scene")
+    assert scene.result(timeout=2) == "scene" and not prefetch.done()
+    gate.set()
+    assert background.result(timeout=2) and prefetch.result(timeout=2)
+    assert log[0] == "scene"
+
+    classes = sched.metrics()["classes"]
+    assert classes[PREFETCH]["preempted"] == 1 and classes[PREFETCH]["max_queue_wait"] > 0
+    assert classes[INTERACTIVE]["completed"] == 1 and classes[BACKGROUND]["queued"] == 0
+    sched.shutdown()
+
+
+def test_promote_and_cancel_queued_jobs():
+    sched = JobScheduler(workers=2, reserve=1)
+    gate, log = threading.Event(), []
+    sched.submit_as(BACKGROUND, _blocker(gate, log, "busy"))
+    dropped = sched.submit_as(BACKGROUND, lambda: log.append("dropped"))
+    portrait = sched.submit_as(PREFETCH, lambda: log.append("portrait") or "portrait")
+    assert dropped.cancel()
+    assert sched.promote(portrait, INTERACTIVE)
+    assert portrait.result(timeout=2) == "portrait"
+    gate.set()
+    sched.shutdown()
+    assert "dropped" not in log and sched.metrics()["classes"][BACKGROUND]["cancelled"] == 1
+
+
+def test_endpoint_slots_go_to_interactive_callers_first():
+    sched = JobScheduler(workers=4, endpoints={"image": {"concurrency": 1}})
+    holding, release, order = threading.Event(), threading.Event(), []
+
+    def call(priority, name, hold=False):
+        with sched.priority(priority), sched.endpoint("image"):
+            order.append(name)
+            if hold:
+                holding.set()
+                release.wait(5)
+
+    first = threading.Thread(target=call, args=(BACKGROUND, "first", True))
+    first.start()
+    assert holding.wait(2)
+    waiting = threading.Thread(target=call, args=(BACKGROUND, "background"))
+    waiting.start()
+    time.sleep(0.05)
+    urgent = threading.Thread(target=call, args=(INTERACTIVE, "interactive"))
+    urgent.start()
+    time.sleep(0.05)
+    assert sched.metrics()["endpoints"]["image"]["waiting"] == 2
+    release.set()
+    for t in (first, waiting, urgent):
+        t.join(5)
+
+    assert order == ["first", "interactive", "background"]
+    assert sched.metrics()["classes"][BACKGROUND]["preempted"] == 1
+    sched.shutdown()
+
+
+def test_token_bucket_spaces_out_calls():
+    sched = JobScheduler(endpoints={"chat": {"concurrency": 4, "rpm": 600, "burst": 1}})
+    started = time.perf_counter()
+    for _ in range(3):
+        with sched.endpoint("chat"):
+            pass
+    assert time.perf_counter() - started >= 0.15          # 10 calls/s after the first
+    assert sched.metrics()["classes"][INTERACTIVE]["max_slot_wait"] > 0
+    sched.shutdown()
+
+
+def test_spawned_threads_keep_the_submitting_class():
+    sched = JobScheduler(workers=2, reserve=0)
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        with sched.priority(BACKGROUND):
+            plain = pool.submit(current_priority).result(timeout=5)
+            inherited = pool.submit(inherit_priority(current_priority)).result(timeout=5)
+            nested = pool.submit(inherit_priority(lambda: sched.submit(current_priority).result(timeout=5)))
+            assert nested.result(timeout=5) == BACKGROUND
+        assert (plain, inherited) == (INTERACTIVE, BACKGROUND)
+        assert pool.submit(current_priority).result(timeout=5) == INTERACTIVE   # reset afterwards
+        assert sched.metrics()["classes"][BACKGROUND]["completed"] == 1
+    finally:
+        pool.shutdown()
+        sched.shutdown()
@@ -0,0 +1,60 @@
+# test_task_graph.py
+
+import threading
+import time
+
+import pytest
+
+from game.scheduler import BACKGROUND, INTERACTIVE, JobScheduler, current_priority
+from game.task_graph import TaskGraph
+
+
+def test_dependents_run_concurrently_after_their_dependency():
+    events = []
+    graph = TaskGraph(max_workers=4, on_event=events.append)
+    barrier = threading.Barrier(2, timeout=5)
+
+    graph.add("premise", lambda: {"npcs": ["a", "b"]})
+    graph.add("left", lambda p: (barrier.wait(), len(p["npcs"]))[1], deps=["premise"])
+    graph.add("right", lambda p: (barrier.wait(), "ok")[1], deps=["premise"])
+    graph.add("join", lambda l, r: (l, r), deps=["left", "right"])
+
+    assert graph.result("join", timeout=5) == (2, "ok")
+    graph.wait()
+    assert graph.done()
+    assert graph.progress() == {"done": 4, "total": 4, "running": [], "failed": []}
+    assert [e["task"] for e in events if e["status"] == "done"][0] == "premise"
+    graph.shutdown()
+
+
+def test_failure_propagates_and_late_tasks_start_immediately():
+    graph = TaskGraph(max_workers=2)
+
+    def boom():
+        raise ValueError("no premise")
+
+    graph.add("premise", boom)
+    graph.add("child", lambda p: p, deps=["premise"])
+    graph.wait()
+    with pytest.raises(RuntimeError):
+        graph.result("child")
+    assert graph.progress()["failed"] == ["child", "premise"]
+
+    graph.add("ok", lambda: time.sleep(0.01) or 1)
+    graph.add("late", lambda v: v + 1, deps=["ok"])
+    assert graph.result("late", timeout=5) == 2
+
+    with pytest.raises(ValueError):
+        graph.add("late", lambda: None)
+    graph.shutdown()
+
+
+def test_tasks_run_as_the_class_of_the_thread_that_added_them():
+    graph = TaskGraph(max_workers=2)
+    with JobScheduler(workers=1).priority(BACKGROUND):
+        graph.add("analysis", current_priority)
+        graph.add("follow_up", lambda prev: (prev, current_priority()), deps=["analysis"])
+    graph.add("scene", current_priority)
+    assert graph.result("follow_up", timeout=5) == (BACKGROUND, BACKGROUND)
+    assert graph.result("scene", timeout=5) == INTERACTIVE
+    graph.shutdown()
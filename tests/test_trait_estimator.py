@@ -0,0 +1,77 @@
+# test_trait_estimator.py
+
+import json
+import threading
+
+from agents.trait_estimator import (
+    TraitEstimator, COMPANION_TRAITS, PLAYER_TRAITS, agreement, load_labels, record_label
+)
+
+
+EXAMPLES = [
+    ("Charge at the guards with your sword drawn", "", {"bravery": 0.4, "empathy": -0.1}),
+    ("Charge into the burning hall", "", {"bravery": 0.5, "curiosity": 0.1}),
+    ("Comfort the crying child", "", {"empathy": 0.4, "communication": 0.2}),
+    ("Comfort the wounded stranger", "", {"empathy": 0.5, "trust": 0.1}),
+]
+
+
+def test_untrained_estimator_has_no_confidence():
+    est = TraitEstimator(PLAYER_TRAITS)
+    deltas, conf = est.predict("Charge at the guards")
+    assert conf == 0.0
+    assert set(deltas) == set(PLAYER_TRAITS)
+
+
+def test_fitted_estimator_learns_direction_and_clamps():
+    est = TraitEstimator(PLAYER_TRAITS).fit(EXAMPLES)
+    brave, brave_conf = est.predict("Charge forward")
+    kind, _ = est.predict("Comfort them")
+    assert brave["bravery"] > kind["bravery"]
+    assert kind["empathy"] > brave["empathy"]
+    assert brave_conf > 0.0
+    for v in list(brave.values()) + list(kind.values()):
+        assert -0.5 <= v <= 0.5 and round(v, 1) == v
+
+
+def test_roundtrip_and_agreement(tmp_path):
+    est = TraitEstimator(PLAYER_TRAITS).fit(EXAMPLES)
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({"player": est.to_dict()}))
+    loaded = TraitEstimator.load(str(path), "player", PLAYER_TRAITS)
+    assert loaded.predict("Charge forward") == est.predict("Charge forward")
+
+    missing = TraitEstimator.load(str(tmp_path / "nope.json"), "companion", COMPANION_TRAITS)
+    assert missing.traits == COMPANION_TRAITS
+
+    report = agreement(est, EXAMPLES)
+    assert report["answered"] == len(EXAMPLES)
+    assert report["sign_agree"]["bravery"] >= 0.5
+
+
+def test_label_log_roundtrip(tmp_path):
+    log = str(tmp_path / "labels.jsonl")
+    record_label("companion", "Hug them", "scene", {"trust": 0.2, "fear": 0.0, "affection": 0.3}, path=log)
+    labels = load_labels([log])
+    assert labels["companion"] == [("Hug them", "scene", {"trust": 0.2, "fear": 0.0, "affection": 0.3})]
+
+
+def test_label_log_is_opt_in_and_kept_in_the_data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("TRAIT_LABEL_LOG", raising=False)
+    monkeypatch.delenv("TRAIT_LABELS", raising=False)
+    monkeypatch.setenv("GAME_DATA_DIR", str(tmp_path / "data"))
+    record_label("player", "Run", "scene", {"bravery": 0.1})
+    assert not list(tmp_path.rglob("*.jsonl"))
+
+    monkeypatch.setenv("TRAIT_LABELS", "1")
+    threads = [threading.Thread(target=lambda i=i: [record_label("player", f"choice {i}-{n}", "x" * 5000,
+                                                                 {"bravery": 0.1}) for n in range(20)])
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log = tmp_path / "data" / "trait_labels.jsonl"
+    assert len(load_labels([str(log)])["player"]) == 160
+    assert [p.name for p in tmp_path.glob("*.jsonl")] == []
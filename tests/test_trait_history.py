@@ -0,0 +1,74 @@
+# test_trait_history.py
+
+import numpy as np
+
+from game.trait_history import TraitHistory, COLUMNS, load_archived_histories
+
+
+def _filled(n=100):
+    hist = TraitHistory(capacity=4)
+    bravery = 3.0
+    for turn in range(1, n + 1):
+        delta = 0.5 if turn == 40 else 0.1
+        bravery += delta
+        hist.append(
+            turn, act=turn // 30,
+            player_profile={"bravery": bravery, "trust": 2.0},
+            companion_profile={"trust": 5.0, "affection": 4.0},
+            player_deltas={"bravery": delta},
+            companion_deltas={"affection": -0.2 if turn == 10 else 0.0},
+        )
+    return hist
+
+
+def test_append_grows_and_views_have_fixed_width():
+    hist = _filled()
+    assert len(hist) == 100
+    assert hist.values.shape == (100, len(COLUMNS))
+    assert hist.values[0, TraitHistory.column("companion_trust")] == 5.0
+    assert hist.values[0, TraitHistory.column("trust")] == 2.0
+
+
+def test_rolling_average_matches_naive():
+    hist = _filled(20)
+    col = hist.values[:, TraitHistory.column("bravery")]
+    roll = hist.rolling_average(window=3, trait="bravery")
+    expected = [col[max(0, i - 2):i + 1].mean() for i in range(len(col))]
+    assert np.allclose(roll, expected, atol=1e-4)
+
+
+def test_act_summary_and_largest_swings():
+    hist = _filled()
+    summary = hist.act_summary()
+    assert sorted(summary) == [0, 1, 2, 3]
+    assert summary[1]["bravery"]["net_change"] == round(0.1 * 29 + 0.5, 1)
+
+    swings = hist.largest_swings(2)
+    assert swings[0] == {"turn": 40, "act": 1, "trait": "bravery", "delta": 0.5}
+    assert swings[1]["trait"] == "companion_affection" and swings[1]["delta"] == -0.2
+
+
+def test_sidecar_roundtrip(tmp_path):
+    hist = _filled(10)
+    story = tmp_path / "archive" / "save1" / "story"
+    story.mkdir(parents=True)
+    hist.save(str(story / "trait_history.npz"))
+
+    loaded = load_archived_histories(str(tmp_path / "archive"))["save1"]
+    assert len(loaded) == 10
+    assert np.array_equal(loaded.values, hist.values)
+    assert np.array_equal(loaded.turns[:10], hist.turns[:10])
+
+
+def test_failed_save_keeps_the_previous_sidecar(tmp_path, monkeypatch):
+    path = tmp_path / "trait_history.npz"
+    _filled(10).save(str(path))
+
+    def broken_savez(f, **arrays):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "savez", broken_savez)
+    _filled(20).save(str(path))
+    assert len(TraitHistory.load(str(path))) == 10
+    assert [p.name for p in tmp_path.iterdir()] == ["trait_history.npz"]
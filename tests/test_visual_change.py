@@ -0,0 +1,45 @@
+# test_visual_change.py
+
+import numpy as np
+
+from agents.visual_change import VisualChangeScorer, present_characters
+
+HALL = ('The great hall is lit by torches. Long oak tables stretch beneath faded banners.\n'
+        'Mara: "We should leave before dawn."')
+HALL_AGAIN = ('Mara leans against one of the long oak tables under the faded banners, torches crackling.\n'
+              'Mara: "Tell me what you saw."')
+DOCKS = 'Rain lashes the harbor docks as fishing boats strain against their ropes.'
+NAMES = ["Mara Stormwind", "Corwin Ashdown"]
+
+
+def test_same_setting_reuses_and_new_setting_does_not():
+    scorer = VisualChangeScorer(threshold=0.5)
+    same = scorer.score(HALL, HALL_AGAIN, "Hall", "Hall", NAMES)
+    assert not same["new_image"]
+    assert same["components"]["location"] == 0.0 and same["components"]["cues"] == 0.0
+
+    storm = scorer.score(HALL, DOCKS, "Hall", "Hall", NAMES)
+    assert storm["new_image"] and storm["inputs"]["new_cues"] == ["rain"]
+
+    moved = scorer.score(HALL, HALL_AGAIN, "Hall", "Docks", NAMES)
+    assert moved["new_image"] and moved["score"] == 1.0
+
+    assert scorer.score(None, HALL)["new_image"]
+
+
+def test_new_characters_raise_the_score():
+    scorer = VisualChangeScorer(threshold=0.5)
+    text = HALL_AGAIN + "\nCorwin strides in."
+    result = scorer.score(HALL, text, "Hall", "Hall", NAMES)
+    assert result["inputs"]["new_characters"] == ["Corwin Ashdown"]
+    assert result["components"]["npcs"] == 0.5
+    assert present_characters("mara smiles.", NAMES) == {"Mara Stormwind"}
+
+
+def test_environment_vectors_ignore_dialogue_and_names():
+    scorer = VisualChangeScorer()
+    words = scorer.environment_words(HALL, NAMES)
+    assert "dawn" not in words and "mara" not in words and "torches" in words
+    vec = scorer.vectorize(words)
+    assert vec.shape == (1024,) and np.isclose(np.linalg.norm(vec), 1.0)
+    assert np.allclose(vec, scorer.vectorize(words))
@@ -1,15 +1,19 @@
 import os
 import re
 import sys
+import threading
+import multiprocessing
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QPushButton, QVBoxLayout, QHBoxLayout,
     QGridLayout, QInputDialog, QLabel, QStackedLayout, QListWidget, QListWidgetItem,
-    QLineEdit, QCheckBox, QMessageBox, QSpacerItem, QSizePolicy, QFrame, QScrollArea, QProgressBar, QGraphicsDropShadowEffect
+    QLineEdit, QCheckBox, QMessageBox, QSpacerItem, QSizePolicy, QFrame, QScrollArea, QProgressBar, QGraphicsDropShadowEffect,
+    QGraphicsOpacityEffect
 )
 from PySide6.QtGui import QPixmap, QFont, QColor, QLinearGradient, QPainter, QIcon
 from PySide6.QtCore import Qt, QTimer, Slot, QPropertyAnimation, QEasingCurve, QPoint
 from main import GameEngine
+from agents.image_profiles import pick_variant
 
 
 class Style:
@@ -533,6 +537,13 @@ class MainWindow(QMainWindow):
         self.custom_cb.setFont(Style.BODY_FONT)
         self.custom_cb.setStyleSheet(Style.CHECKBOX_STYLE)
 
+        self.instant_cb = QCheckBox("Instant offline world (procedural)")
+        self.instant_cb.setFont(Style.BODY_FONT)
+        self.instant_cb.setStyleSheet(Style.CHECKBOX_STYLE)
+        # the two premise modes are mutually exclusive
+        self.custom_cb.toggled.connect(lambda on: on and self.instant_cb.setChecked(False))
+        self.instant_cb.toggled.connect(lambda on: on and self.custom_cb.setChecked(False))
+
         lbl_genre = QLabel("Genre:")
         lbl_genre.setFont(Style.BODY_FONT)
         lbl_genre.setStyleSheet(f"color: {Style.TEXT};")
@@ -553,10 +564,11 @@ class MainWindow(QMainWindow):
 
         # Add to form
         form_layout.addWidget(self.custom_cb, 0, 0, 1, 2)
-        form_layout.addWidget(lbl_genre, 1, 0)
-        form_layout.addWidget(self.genre_input, 1, 1)
-        form_layout.addWidget(lbl_art, 2, 0)
-        form_layout.addWidget(self.art_input, 2, 1)
+        form_layout.addWidget(self.instant_cb, 1, 0, 1, 2)
+        form_layout.addWidget(lbl_genre, 2, 0)
+        form_layout.addWidget(self.genre_input, 2, 1)
+        form_layout.addWidget(lbl_art, 3, 0)
+        form_layout.addWidget(self.art_input, 3, 1)
 
         layout.addWidget(form_container)
 
@@ -675,7 +687,16 @@ class MainWindow(QMainWindow):
         self.loading_label.setStyleSheet(f"color: {Style.PRIMARY};")
         self.loading_label.setAlignment(Qt.AlignCenter)
 
+        # Early premise preview (world overview) while setup is still running
+        self.loading_detail = QLabel()
+        self.loading_detail.setFont(Style.BODY_FONT)
+        self.loading_detail.setStyleSheet(f"color: {Style.TEXT};")
+        self.loading_detail.setAlignment(Qt.AlignCenter)
+        self.loading_detail.setWordWrap(True)
+        self.loading_detail.setMaximumWidth(800)
+
         layout.addWidget(self.loading_label)
+        layout.addWidget(self.loading_detail, alignment=Qt.AlignCenter)
         self.stack.addWidget(page)
 
     def _build_premise_page(self):
@@ -796,6 +817,22 @@ class MainWindow(QMainWindow):
         self.background_label.setScaledContents(True)
         layout.addWidget(self.background_label, 0, 0, 1, 1)
 
+        # Incoming background, faded in over the current one when a late image lands
+        self.background_next = QLabel()
+        self.background_next.setScaledContents(True)
+        self._bg_opacity = QGraphicsOpacityEffect(self.background_next)
+        self.background_next.setGraphicsEffect(self._bg_opacity)
+        self.background_next.hide()
+        layout.addWidget(self.background_next, 0, 0, 1, 1)
+        self._bg_fade = QPropertyAnimation(self._bg_opacity, b"opacity")
+        self._bg_fade.setDuration(450)
+        self._bg_fade.setStartValue(0.0)
+        self._bg_fade.setEndValue(1.0)
+        self._bg_fade.setEasingCurve(QEasingCurve.InOutQuad)
+        self._bg_fade.finished.connect(self._finish_background_fade)
+        self._scene_token = 0
+        self._portrait_token = 0   # bumped per paragraph; late portraits for older lines are dropped
+
         # Create the profile sidebar and overlay (but don't show them yet)
         self._create_profile_sidebar()
         self.sidebar.hide()
@@ -977,17 +1014,59 @@ class MainWindow(QMainWindow):
         self.genre_input.clear()
         self.art_input.clear()
         self.custom_cb.setChecked(False)
+        self.instant_cb.setChecked(False)
         self.setup_next.setEnabled(False)
         self.stack.setCurrentIndex(1)
 
     def _start_new_game(self):
         genre = self.genre_input.text().strip().lower()
         art_style = self.art_input.text().strip()
-        choice = "custom" if self.custom_cb.isChecked() else "default"
+        if self.instant_cb.isChecked():
+            choice = "procedural"
+        else:
+            choice = "custom" if self.custom_cb.isChecked() else "default"
 
         self.engine = GameEngine()
-        self._companion_options = self.engine.start_new_game(genre, art_style, choice)
+        self._new_game_result = None
+        self._show_loading("Building your world...")
+
+        # premise generation can take a while: run it off the GUI thread and poll,
+        # so the world overview can be shown as soon as it exists
+        threading.Thread(
+            target=self._run_new_game, args=(self.engine, genre, art_style, choice), daemon=True
+        ).start()
+        QTimer.singleShot(250, self._poll_new_game)
+
+    def _run_new_game(self, engine, genre, art_style, choice):
+        try:
+            self._new_game_result = (engine, engine.start_new_game(genre, art_style, choice), None)
+        except Exception as e:
+            self._new_game_result = (engine, None, e)
+
+    def _poll_new_game(self):
+        if self._new_game_result is None:
+            preview = self.engine.get_premise_preview() if self.engine else None
+            if preview and not self.loading_detail.text():
+                self.loading_detail.setText(
+                    f"<h3 style='color:{Style.PRIMARY};'>{preview['world_name']}</h3>"
+                    f"{preview['world_overview']}"
+                )
+            QTimer.singleShot(250, self._poll_new_game)
+            return
+
+        engine, companions, error = self._new_game_result
+        self._new_game_result = None
+        self._loading_timer.stop()
+        self._is_generating = False
+        self.loading_detail.clear()
+        if engine is not self.engine:
+            return
+        if error is not None:
+            QMessageBox.warning(self, "New Game Failed", f"Could not set up the game: {error}")
+            self.stack.setCurrentIndex(1)
+            return
 
+        self._companion_options = companions
         self._populate_companion_list()
         self.stack.setCurrentIndex(2)
                         
@@ -1054,9 +1133,23 @@ class MainWindow(QMainWindow):
     
     def _select_companion(self):
         idx = self._chosen_companion or 0
-        self.engine.select_companion(idx, self._companion_options)
-        self._show_loading("Generating story premise...")
-        QTimer.singleShot(2000, self._show_premise)
+        self.engine.select_companion(idx, self._companion_options, wait=False)
+        self._show_loading("Generating character portraits...")
+        QTimer.singleShot(250, self._poll_setup)
+
+    def _poll_setup(self):
+        """Waits for the new-game setup graph without blocking the event loop."""
+        if not self.engine:
+            return
+        if self.engine.setup_done():
+            self.engine.finish_setup()
+            self._show_premise()
+            return
+        prog = self.engine.get_setup_progress()
+        self.loading_label.setText(
+            f"Generating character portraits ({prog['done']}/{prog['total']} ready)"
+        )
+        QTimer.singleShot(250, self._poll_setup)
 
     def _show_loading(self, message="Loading"):
         self._is_generating = True
@@ -1120,20 +1213,101 @@ class MainWindow(QMainWindow):
         ]
         self.current_par = 0
 
-        # Set background image
-        img = self.engine.get_current_image_path()
-        if img and os.path.isfile(img):
-            pix = QPixmap(img).scaled(
-                self.width(), self.height(),
-                Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation
-            )
-            self.background_label.setPixmap(pix)
+        # Set background image (rendered for this window's device-pixel size).
+        # The text never waits for it: show what we already have and fade the
+        # scene's own image in when its job finishes.
+        dpr = self.devicePixelRatioF()
+        self.engine.set_display_size(round(self.width() * dpr), round(self.height() * dpr))
+        self._scene_token += 1
+        future = self.engine.request_scene_image()
+        path = None
+        if future.done():
+            try:
+                path = self.engine.get_current_image_path()
+            except Exception as e:
+                print(f"[ERROR] Scene image failed: {e}")
+        if path:
+            self._set_background(path)
         else:
-            self.background_label.clear()
+            placeholder = self.engine.get_placeholder_image_path()
+            if placeholder:
+                self._set_background(placeholder)
+            if not future.done():
+                self._watch_scene_image(future, self._scene_token)
 
         self.choices_container.hide()
         self.custom_choice_container.hide()
         self._show_paragraph()
+        self.engine.on_scene_shown()
+
+    def _fitted_pixmap(self, path, size, mode):
+        """
+        Loads the smallest pre-scaled variant of `path` that still covers
+        `size` on this screen (see image_profiles.pick_variant), then scales it.
+        """
+        dpr = self.devicePixelRatioF()
+        source = pick_variant(
+            path, round(size.width() * dpr), round(size.height() * dpr),
+            cover=(mode == Qt.KeepAspectRatioByExpanding)
+        )
+        return QPixmap(source).scaled(size, mode, Qt.SmoothTransformation)
+
+    def _scaled_background(self, path):
+        return self._fitted_pixmap(path, self.size(), Qt.KeepAspectRatioByExpanding)
+
+    def _set_background(self, path, fade=False):
+        if not (path and os.path.isfile(path)):
+            if not fade:   # a failed late image keeps the placeholder
+                self.background_label.clear()
+            return
+        pix = self._scaled_background(path)
+        if not fade or self.background_label.pixmap().isNull():
+            self._bg_fade.stop()
+            self.background_next.hide()
+            self.background_label.setPixmap(pix)
+            return
+        self.background_next.setPixmap(pix)
+        self._bg_opacity.setOpacity(0.0)
+        self.background_next.show()
+        self._bg_fade.start()
+
+    def _finish_background_fade(self):
+        self.background_label.setPixmap(self.background_next.pixmap())
+        self.background_next.hide()
+
+    def _set_portrait(self, path):
+        if path and os.path.isfile(path):
+            pix = self._fitted_pixmap(path, self.portrait_label.size(), Qt.KeepAspectRatio)
+            self.portrait_label.setPixmap(pix)
+            self.portrait_label.show()
+        else:
+            self.portrait_label.hide()
+
+    def _watch_portrait(self, future, token):
+        """Polls a speaker's portrait job; shows it if that line is still on screen."""
+        if token != self._portrait_token or not self.engine:
+            return   # stale: the player has moved to another paragraph
+        if not future.done():
+            QTimer.singleShot(200, lambda: self._watch_portrait(future, token))
+            return
+        try:
+            self._set_portrait(future.result())
+        except Exception as e:
+            print(f"[ERROR] Portrait failed: {e}")
+
+    def _watch_scene_image(self, future, token):
+        """Polls a scene image job; swaps it in unless the player has moved on."""
+        if token != self._scene_token or not self.engine:
+            return   # stale: a newer scene is on screen
+        if not future.done():
+            QTimer.singleShot(200, lambda: self._watch_scene_image(future, token))
+            return
+        try:
+            path = self.engine.get_current_image_path()
+        except Exception as e:
+            print(f"[ERROR] Scene image failed: {e}")
+            return
+        self._set_background(path, fade=True)
 
     def _show_paragraph(self):
         self.choices_container.hide()
@@ -1144,6 +1318,7 @@ class MainWindow(QMainWindow):
         self.speaker_label.show()
         self.portrait_label.show()
 
+        self._portrait_token += 1
         para = self.paragraphs[self.current_par]
         m = re.match(r'^([^:]+):\s*"(.*)"$', para)
         
@@ -1151,23 +1326,15 @@ class MainWindow(QMainWindow):
             speaker, spoken = m.groups()
             self.speaker_label.setText(speaker)
 
-            # ── try exact match, then fall back to first name ──
-            url = self.engine.state.character_image_urls.get(speaker)
-            if not url and " " in speaker:
-                first = speaker.split()[0]
-                url = self.engine.state.character_image_urls.get(first)
-
-            if url and os.path.isfile(url):
-                pix = QPixmap(url).scaled(
-                    self.portrait_label.size(),
-                    Qt.KeepAspectRatio, Qt.SmoothTransformation
-                )
-                self.portrait_label.setPixmap(pix)
-                self.portrait_label.show()
+            # ── known portrait (exact or first name), else generated on first appearance ──
+            future = self.engine.request_portrait(speaker)
+            if future is not None and future.done():
+                self._set_portrait(future.result())
             else:
                 self.portrait_label.hide()
+                if future is not None:
+                    self._watch_portrait(future, self._portrait_token)
 
-                
             self._start_anim(spoken, section=None)
         else:
             self.speaker_label.hide()
@@ -1251,6 +1418,7 @@ class MainWindow(QMainWindow):
 
     def _show_choices(self):
         # hide prose & portrait
+        self._portrait_token += 1
         self.paragraph_label.hide()
         self.speaker_label.hide()
         self.portrait_label.hide()
@@ -1607,6 +1775,7 @@ class MainWindow(QMainWindow):
             self.stack.currentWidget().layout().addWidget(self.sidebar)
             
         self._update_profile_data()
+        self._watch_personality_analysis(self.engine.refresh_personality_analysis())
         
         # Position sidebar off-screen to the right
         self.sidebar.move(self.width(), 0)
@@ -1639,6 +1808,20 @@ class MainWindow(QMainWindow):
         ))
 
 
+    def _watch_personality_analysis(self, future):
+        """Polls a background analysis and refreshes the sidebar once it lands."""
+        if future is None or not self.engine:
+            return
+        if future.done():
+            if self.sidebar.isVisible():
+                self._update_profile_data()
+            return
+        self.personality_analysis.setText(
+            (self.engine.state.last_personality_analysis or "").strip()
+            or "Analysing your latest choices..."
+        )
+        QTimer.singleShot(250, lambda: self._watch_personality_analysis(future))
+
     def _update_profile_data(self):
         """Updates the profile sidebar with current game data, including personality analysis."""
         if not hasattr(self, 'engine') or not self.engine.state:
@@ -1651,10 +1834,7 @@ class MainWindow(QMainWindow):
         self.player_name.setText(f"{name} — You")
         img = state.character_image_urls.get(name)
         if img and os.path.isfile(img):
-            pix = QPixmap(img).scaled(
-                self.player_portrait.size(),
-                Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation
-            )
+            pix = self._fitted_pixmap(img, self.player_portrait.size(), Qt.KeepAspectRatioByExpanding)
             self.player_portrait.setPixmap(pix)
 
         # Personality analysis
@@ -1677,10 +1857,7 @@ class MainWindow(QMainWindow):
 
             cimg = state.character_image_urls.get(state.companion_name)
             if cimg and os.path.isfile(cimg):
-                pix = QPixmap(cimg).scaled(
-                    self.companion_portrait.size(),
-                    Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation
-                )
+                pix = self._fitted_pixmap(cimg, self.companion_portrait.size(), Qt.KeepAspectRatioByExpanding)
                 self.companion_portrait.setPixmap(pix)
 
             # Companion stats (also one-decimal)
@@ -1691,6 +1868,8 @@ class MainWindow(QMainWindow):
                     bar.setFormat(f"{val:.1f}")
 
 if __name__ == "__main__":
+    # image post-processing runs in worker processes (agents/image_pool.py)
+    multiprocessing.freeze_support()
     if getattr(sys, 'frozen', False):
         os.chdir(os.path.dirname(sys.executable))
     app = QApplication(sys.argv)